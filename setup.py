@@ -18,9 +18,15 @@ setup(
         'treelib >= 1.5.5',
         'matplotlib >= 2.2.2',
         'numpy >= 1.14.3',
-        'dubins >= 1.0.1'
+        'dubins >= 1.0.1',
+        'sympy',
+        'tomli; python_version < "3.11"'
     ],
       
+    entry_points = {
+        'console_scripts': ['rufus = rufus.cli:main']
+    },
+
     test_suite='rufus.test',
       
     author = 'Jeffrey Wallace',
@@ -0,0 +1,72 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module defers imports of heavy, optional dependencies until they are used.
+
+    plt = lazy_import('matplotlib.pyplot')
+
+binds plt to a proxy. The module is imported the first time one of its
+attributes is accessed, so importing rufus (e.g. in a worker process) does not
+pay for matplotlib, sympy, dubins or Dubins Airplane unless the feature that
+needs them is used.
+'''
+
+# Standard Imports
+import importlib
+
+# External Imports
+
+# Local Imports
+
+
+class LazyModule:
+    '''A proxy for a module that is imported on first attribute access.'''
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+    # end __init__
+
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+
+        return module
+    # end _load
+
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+    # end __getattr__
+
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+    # end __setattr__
+
+
+    def __dir__(self):
+        return dir(self._load())
+    # end __dir__
+
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return '<lazy module %r (%s)>' % (self.__dict__['_name'], state)
+    # end __repr__
+
+# end LazyModule
+
+
+def lazy_import(name):
+    '''Get a proxy for module name that imports it on first use.'''
+    return LazyModule(name)
+# end lazy_import
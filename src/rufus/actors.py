@@ -12,12 +12,17 @@ This module contains actors with complex dynamics.
 # Standard Imports
 
 # External Imports
-import dubins
 import numpy as np
 
 # Local Imports
+from rufus import dubins_car
+from rufus._lazy import lazy_import
 from rufus.game import Actor
-from rufus.third_party import dubins_airplane
+from rufus.integrate import rk4
+
+# only imported when a Dubins actor steers
+dubins = lazy_import('dubins')
+dubins_airplane = lazy_import('rufus.third_party.dubins_airplane')
 
 class LinearActor(Actor):
     '''A simple actor for test purposes.
@@ -63,17 +68,20 @@ class LinearActor(Actor):
 class DubinsCar(Actor):
     '''Represents a Dubins Car with unit speed and turning radius w'''
 
-    def __init__(self, dt, w):
+    def __init__(self, dt, w, table=None):
         '''Constructor.
 
         Arguments:
-            dt: time increment
-            w:  turning radius
+            dt:     time increment
+            w:      turning radius
+            table:  an optional rufus.dubins_car.DubinsCostTable. If provided,
+                    it is used to estimate path lengths in time()
         '''
         super().__init__(dt)
         assert w > 0
 
         self._w = w
+        self._table = table
     # end __init__
 
 
@@ -89,19 +97,33 @@ class DubinsCar(Actor):
         q1 = (end[0], end[1], state)
 
         path = dubins.shortest_path(q0, q1, self._w)
-        cfg, _ = path.sample_many(self._dt)
-        cfg = np.array(cfg)
+        cfg = dubins_car.sample_path(
+                q0,
+                path.path_type(),
+                [path.segment_length_normalized(i) for i in range(3)],
+                self._w,
+                self._dt
+        )
 
         return cfg[-1, -1], cfg[:, :2]
     # end steer
 
 
     def time(self, start, end, state):
-        '''We use euclidean distance as a heuristic to improve runtime.
+        '''If a cost table was provided, the length of the Dubins path is looked
+        up in the table. Otherwise, we use euclidean distance as a heuristic to
+        improve runtime.
 
         This method is used to find candidate vertices to merge with,
         so a heuristic is acceptable.
         '''
+        if self._table is not None:
+            return self._table.path_length(
+                    np.array([start[0], start[1], state]),
+                    np.array([end[0], end[1], state]),
+                    self._w
+            )
+
         return np.sqrt(np.sum((start - end)**2))
     # end time
 
@@ -165,3 +187,146 @@ class DubinsAirplane(Actor):
 
 # end DubinsAirplane
 
+
+class PiecewiseConstantControls:
+    '''A control parameterization for ODEActor.
+
+    Control sequences are split into a fixed number of pieces of equal
+    duration. Each piece holds a control drawn uniformly from [lower, upper].
+    '''
+
+    def __init__(self, lower, upper, pieces=1):
+        '''Constructor.
+
+        Arguments:
+            lower:  the lower bound of each control component
+            upper:  the upper bound of each control component
+            pieces: the number of constant pieces in each control sequence
+        '''
+        lower = np.atleast_1d(np.asarray(lower, dtype=float))
+        upper = np.atleast_1d(np.asarray(upper, dtype=float))
+        assert lower.shape == upper.shape
+        assert np.all(upper >= lower)
+        assert pieces >= 1
+
+        self.lower = lower
+        self.upper = upper
+        self.pieces = pieces
+    # end __init__
+
+
+    def sample(self, batch, steps):
+        '''Sample control sequences.
+
+        Arguments:
+            batch:  the number of control sequences
+            steps:  the number of steps in each sequence
+
+        Returns:
+            np.ndarray of shape (batch, steps, m)
+        '''
+        values = self.lower + (self.upper - self.lower) * np.random.sample((batch, self.pieces, len(self.lower)))
+        piece = np.minimum(np.arange(steps) * self.pieces // max(steps, 1), self.pieces - 1)
+        return values[:, piece]
+    # end sample
+
+# end PiecewiseConstantControls
+
+
+class ODEActor(Actor):
+    '''An actor whose kinematics are given by an ordinary differential equation.
+
+    The full state of the actor is x = [location, state], where the first ndim
+    components are the location of the actor in game space and the remaining
+    components are the actor state that is stored in each Vertex (e.g. heading,
+    speed). The dynamics are
+
+        xdot = f(x, u)
+
+    There is no closed form steering function. Instead, many candidate control
+    sequences are integrated at once (shooting) and the candidate that reaches
+    the end location first is used.
+
+    For example, a car with limited acceleration and turn rate:
+
+        def f(x, u):
+            # x = [px, py, heading, speed], u = [turn rate, acceleration]
+            return np.column_stack([
+                x[:, 3] * np.cos(x[:, 2]),
+                x[:, 3] * np.sin(x[:, 2]),
+                u[:, 0],
+                u[:, 1]
+            ])
+
+        car = ODEActor(0.1, f, PiecewiseConstantControls([-1, -0.5], [1, 0.5], 3), 2, 300)
+    '''
+
+    def __init__(self, dt, dynamics, controls, ndim, horizon, candidates=256, tolerance=None):
+        '''Constructor.
+
+        Arguments:
+            dt:         the time increment
+            dynamics:   the vectorized dynamics, f(x, u) -> xdot, where x has
+                        shape (batch, dim) and u has shape (batch, m)
+            controls:   the control parameterization. Must provide
+                        sample(batch, steps) -> (batch, steps, m)
+            ndim:       the number of leading state components that hold the
+                        location of the actor
+            horizon:    the maximum number of steps in a trajectory
+            candidates: the number of control sequences tried by each steer
+            tolerance:  the maximum distance between the end of a trajectory
+                        and the requested end location. If None, the closest
+                        approach of any candidate is accepted.
+        '''
+        super().__init__(dt)
+        assert ndim > 0
+        assert horizon > 0
+        assert candidates > 0
+        assert tolerance is None or tolerance > 0
+
+        self._dynamics = dynamics
+        self._controls = controls
+        self._ndim = ndim
+        self._horizon = horizon
+        self._candidates = candidates
+        self._tolerance = tolerance
+    # end __init__
+
+
+    def steer(self, start, end, state):
+        '''Returns (None, None) if no candidate gets within tolerance of end.'''
+        extra = np.array([]) if state is None else np.atleast_1d(state)
+        x0 = np.concatenate([np.atleast_1d(start), extra])
+
+        u = self._controls.sample(self._candidates, self._horizon)
+        x = rk4(self._dynamics, np.tile(x0, (self._candidates, 1)), u, self._dt)
+
+        # distance to the end location after each step, shape (candidates, horizon)
+        dist = np.sqrt(np.sum((x[:, 1:, :self._ndim] - end)**2, axis=-1))
+
+        if self._tolerance is None:
+            i, k = np.unravel_index(np.argmin(dist), dist.shape)
+        else:
+            within = dist <= self._tolerance
+            if not np.any(within):
+                return None, None
+
+            # earliest arrival, breaking ties by distance
+            k = np.min(np.nonzero(np.any(within, axis=0))[0])
+            i = np.argmin(np.where(within[:, k], dist[:, k], np.inf))
+
+        # the trajectory ends just short of the arrival at step k + 1
+        return x[i, k + 1, self._ndim:], x[i, :k + 1, :self._ndim]
+    # end steer
+
+
+    def time(self, start, end, state):
+        '''We use euclidean distance as a heuristic to improve runtime.
+
+        This method is used to find candidate vertices to merge with,
+        so a heuristic is acceptable.
+        '''
+        return np.sqrt(np.sum((start - end)**2))
+    # end time
+
+# end ODEActor
@@ -15,23 +15,63 @@ This module contains utilities for analyzing games.
 import numpy as np
 
 # Local Imports
+from rufus.game import BoxRegion, intersects_boxes
+from rufus.spatial import EdgeIndex
+from rufus.trajectory import segments
+from rufus.tree import CostToCome
+
+
+# the fields of the table returned by GameSolution.query_targets
+TARGET_QUERY_DTYPE = np.dtype([
+    ('reachable', bool),
+    ('min_time', float),
+    ('count', np.int64),
+    ('node', object)
+])
 
 
 class GameSolution:
-    '''Represents a sampled solution to a pursuit-evasion game.'''
+    '''Represents a sampled solution to a pursuit-evasion game.
 
-    def __init__(self, g_e, g_p):
+    Spatial queries are answered with an EdgeIndex over each tree, which is
+    built on first use. If the trees are modified after a query, invalidate()
+    must be called before the next one.
+    '''
+
+    def __init__(self, g_e, g_p, costs=None):
         '''Constructor.
 
         Arguments:
-            g_e: the evader trajectory graph
-            g_p: the pursuer trajectory graph
+            g_e:    the evader trajectory graph
+            g_p:    the pursuer trajectory graph
+            costs:  an optional CostToCome that is kept up to date with g_e.
+                    If None, one is computed on first use.
         '''
         self._g_e = g_e
         self._g_p = g_p
+        self._indexes = {}
+        self._tracked = costs is not None
+        self._costs = costs
     # end __init__
 
 
+    def __getstate__(self):
+        # the caches are rebuilt on demand after unpickling
+        state = self.__dict__.copy()
+        state.update(_indexes={}, _tracked=False, _costs=None)
+        return state
+    # end __getstate__
+
+
+    def __setstate__(self, state):
+        # solutions pickled before the indexes and costs were cached
+        self.__dict__.update(state)
+        self.__dict__.setdefault('_indexes', {})
+        self.__dict__.setdefault('_tracked', False)
+        self.__dict__.setdefault('_costs', None)
+    # end __setstate__
+
+
     def pursuer_tree(self):
         '''Get the pursuer's trajectory graph.'''
         return self._g_p
@@ -44,6 +84,52 @@ class GameSolution:
     # end evader_graph
 
 
+    def edge_index(self, pursuer=False):
+        '''Get the spatial index over the edges of a trajectory graph.
+
+        Arguments:
+            pursuer:    if True, index the pursuer graph instead of the evader's
+
+        Returns:
+            EdgeIndex keyed by node identifier
+        '''
+        if pursuer not in self._indexes:
+            g = self._g_p if pursuer else self._g_e
+            self._indexes[pursuer] = EdgeIndex.from_tree(g)
+
+        return self._indexes[pursuer]
+    # end edge_index
+
+
+    def invalidate(self):
+        '''Discard the cached indexes and costs after the trajectory graphs
+        change.
+        '''
+        self._indexes = {}
+        if not self._tracked:
+            self._costs = None
+    # end invalidate
+
+
+    def query_edges(self, lower, upper, pursuer=False):
+        '''Find the nodes whose edges may pass through a box.
+
+        The test is against the bounding boxes of the edges, so the result may
+        contain edges that do not actually enter the box.
+
+        Arguments:
+            lower:      the lower corner of the box
+            upper:      the upper corner of the box
+            pursuer:    if True, query the pursuer graph instead of the evader's
+
+        Returns:
+            list of the nodes whose edge bounding boxes overlap the box
+        '''
+        g = self._g_p if pursuer else self._g_e
+        return [g[k] for k in self.edge_index(pursuer).query(lower, upper)]
+    # end query_edges
+
+
     def can_reach(self, target):
         '''Check if the evader can reach the given target region.
 
@@ -53,10 +139,162 @@ class GameSolution:
         Returns:
             True, if there is a path for the evader to reach the target
         '''
-        return bool(self._reachable_nodes(target))
+        return next(self._iter_reachable_nodes(target), None) is not None
     # end can_reach
 
    
+    def query_targets(self, targets):
+        '''Answer reachability and minimum time for many target regions.
+
+        All targets are answered together rather than one traversal per
+        target. The edge index finds the edges whose bounding boxes overlap
+        each target, and only those (edge, target) pairs get an exact segment
+        test: one vectorized call for all BoxRegion pairs, and one call per
+        other region. Only the trajectories of candidate edges are read. A
+        single pass over the levels of the tree then keeps, for each target,
+        only the first node along each branch that reaches it.
+
+        Arguments:
+            targets:    a list of Region
+
+        Returns:
+            np.ndarray, a structured array with one row per target and fields
+
+                reachable:  True if the evader can reach the target
+                min_time:   the cost-to-come of the fastest node that reaches
+                            the target, or inf
+                count:      the number of nodes returned by
+                            all_trajectories_to_target for the target
+                node:       the identifier of the fastest node, or None
+        '''
+        targets = list(targets)
+        result = np.zeros(len(targets), dtype=TARGET_QUERY_DTYPE)
+        result['min_time'] = np.inf
+        result['node'] = None
+
+        g = self._g_e
+        if not targets or g.root is None:
+            return result
+
+        # flatten the tree in breadth-first order
+        keys = list(g.expand_tree(mode=g.WIDTH))
+        index = {k: i for i, k in enumerate(keys)}
+        nodes = [g[k] for k in keys]
+        parent = np.array([-1] + [index[g.parent(k).identifier] for k in keys[1:]], dtype=np.int64)
+
+        # the candidate edges of each target. The root has no edge
+        candidates = []
+        for target in targets:
+            try:
+                found = np.array([index[k] for k in self.edge_index().query_region(target)], dtype=np.int64)
+            except NotImplementedError:
+                found = np.arange(len(nodes))
+
+            candidates.append(np.unique(found[found > 0]))
+
+        # the segments of the candidate edges only. The segments of node
+        # needed[j] are starts[offsets[j]:offsets[j + 1]]
+        needed = np.unique(np.concatenate(candidates))
+        position = np.zeros(len(nodes), dtype=np.int64)
+        position[needed] = np.arange(len(needed))
+
+        if len(needed):
+            starts, ends = zip(*[segments(nodes[i].data.trajectory, nodes[i].data.loc) for i in needed])
+            offsets = np.concatenate([[0], np.cumsum([len(a) for a in starts])])
+            starts = np.concatenate(starts)
+            ends = np.concatenate(ends)
+
+        def expand(node):
+            '''Get the indices of the segments of each node, concatenated.'''
+            j = position[node]
+            counts = offsets[j + 1] - offsets[j]
+            seg = np.repeat(offsets[j] - np.cumsum(counts) + counts, counts) + np.arange(np.sum(counts))
+            return seg, counts
+        # end expand
+
+        # hits[i, k] is True if the edge to node i passes through target k
+        hits = np.zeros((len(nodes), len(targets)), dtype=bool)
+
+        is_box = np.array([isinstance(r, BoxRegion) for r in targets])
+        boxes = np.flatnonzero(is_box)
+        pair_node = np.concatenate([np.zeros(0, dtype=np.int64)] + [candidates[k] for k in boxes])
+        if len(pair_node):
+            lower = np.array([targets[k].lower for k in boxes], dtype=float).reshape((len(boxes), -1))
+            upper = np.array([targets[k].upper for k in boxes], dtype=float).reshape((len(boxes), -1))
+            pair_box = np.repeat(np.arange(len(boxes)), [len(candidates[k]) for k in boxes])
+
+            # expand each (edge, box) pair to its segments
+            seg, counts = expand(pair_node)
+            box = np.repeat(pair_box, counts)
+
+            if len(seg):
+                seg_hits = intersects_boxes(lower[box], upper[box], starts[seg], ends[seg], pairwise=True)
+                hits[pair_node, boxes[pair_box]] = np.logical_or.reduceat(seg_hits, np.cumsum(counts) - counts)
+
+        for k in np.flatnonzero(~is_box):
+            if len(candidates[k]):
+                seg, counts = expand(candidates[k])
+                seg_hits = targets[k].intersects_segments(starts[seg], ends[seg])
+                hits[candidates[k], k] = np.logical_or.reduceat(seg_hits, np.cumsum(counts) - counts)
+
+        # the root is checked by containment, as in _enters
+        hits[0] = [nodes[0].data.loc in r for r in targets]
+
+        # a target is reached by node i if any ancestor's edge passes through
+        # it. Breadth-first order puts every parent before its children.
+        depth = np.zeros(len(nodes), dtype=np.int64)
+        for i in range(1, len(nodes)):
+            depth[i] = depth[parent[i]] + 1
+
+        reached = np.zeros_like(hits)
+        bounds = np.searchsorted(depth, np.arange(depth[-1] + 2))
+        for d in range(1, depth[-1] + 1):
+            level = slice(bounds[d], bounds[d + 1])
+            p = parent[level]
+            reached[level] = reached[p] | hits[p]
+
+        first = hits & ~reached
+        costs = self.costs_to_come()
+        times = np.where(first, np.array([costs[k] for k in keys], dtype=float)[:, np.newaxis], np.inf)
+        best = np.argmin(times, axis=0)
+
+        result['count'] = np.sum(first, axis=0)
+        result['reachable'] = result['count'] > 0
+        result['min_time'] = times[best, np.arange(len(targets))]
+        result['node'][result['reachable']] = [keys[i] for i in best[result['reachable']]]
+        return result
+    # end query_targets
+
+
+    def value_map(self, space, shape):
+        '''Rasterize the earliest arrival times of both players onto a grid.
+
+        Every stored sample of every edge is assigned a time by interpolating
+        between the cost-to-come of the edge's parent and child by arc length.
+        Each grid cell then holds the smallest time of any sample inside it.
+
+        Arguments:
+            space:  the BoxRegion covered by the grid
+            shape:  the number of cells along each axis. If shape has fewer
+                    entries than space has dimensions, the trees are projected
+                    onto the leading axes.
+
+        Returns:
+            ValueMap
+        '''
+        lower, upper = space.bounds()
+        lower = np.asarray(lower, dtype=float)[:len(shape)]
+        upper = np.asarray(upper, dtype=float)[:len(shape)]
+
+        evader = rasterize(*edge_samples(self._g_e, self.costs_to_come()), lower, upper, shape)
+        pursuer = rasterize(
+                *edge_samples(self._g_p, CostToCome.from_tree(self._g_p)), lower, upper, shape
+        )
+
+        return ValueMap(lower, upper, evader, pursuer)
+    # end value_map
+
+
     def all_trajectories_to_target(self, target):
         '''Get all of the evader's trajectories that reach the target region.
 
@@ -80,29 +318,121 @@ class GameSolution:
                 path[-1].loc in target == False
                 trajectory[-1] in target == False
 
-            but it is guaranteed that, if this is the case, then
+            but it is guaranteed that, if this is the case, then the polyline
+            through path[-1].trajectory and path[-1].loc passes through the
+            target. Containment is checked segment by segment, so a crossing
+            between two stored samples is not missed.
 
-                any([pt in target for pt in path[-1].trajectory]) == True
-                any([pt in target for pt in trajectory[-1]]) == True
+        '''
+        return list(self.iter_trajectories_to_target(target))
+    # end all_trajectories_to_target
+
+
+    def iter_trajectories_to_target(self, target, copy=True):
+        '''Lazily yield the results of all_trajectories_to_target.
+
+        Arguments:
+            target: the target region
+            copy:   see iter_trajectories
 
+        Returns:
+            generator of (path, trajectory)
         '''
-        nodes = self._reachable_nodes(target)
-        paths = list(map(self._collect_path, nodes))
-        trajectories = list(map(self._collect_trajectory, paths))
+        nodes = [n.identifier for n in self._iter_reachable_nodes(target)]
+        return self.iter_trajectories(nodes, copy=copy)
+    # end iter_trajectories_to_target
 
-        return list(zip(paths, trajectories))
-    # end all_trajectories_to_target
+
+    def iter_trajectories(self, nodes=None, copy=True):
+        '''Lazily yield the evader paths and trajectories that end at nodes.
+
+        The evader tree is walked depth-first over only the branches that lead
+        to the requested nodes. Trajectories are assembled in a single buffer
+        that holds the trajectory of the current branch, so the samples of a
+        prefix shared by several results are copied into it only once.
+
+        Arguments:
+            nodes:  identifiers of the nodes at which the trajectories end. If
+                    None, all leaves of the evader tree are used.
+            copy:   if False, each trajectory is a view into the shared buffer
+                    that is only valid until the generator is advanced. This
+                    lets thousands of trajectories be scanned without
+                    allocating any of them.
+
+        Returns:
+            generator of (path, trajectory), in depth-first order. See
+            all_trajectories_to_target.
+        '''
+        g = self._g_e
+        if nodes is None:
+            nodes = [n.identifier for n in g.leaves()]
+
+        wanted = set(nodes)
+        if not wanted:
+            return
+
+        # mark the branches that lead to the requested nodes
+        branch = set()
+        for k in wanted:
+            while k is not None and k not in branch:
+                branch.add(k)
+                k = g.parent(k).identifier if k != g.root else None
+
+        root = g[g.root]
+        loc = np.asarray(root.data.loc)
+        buf = np.empty((64,) + loc.shape, dtype=np.result_type(loc, float))
+
+        # each entry is (node, depth); path[:depth] and buf[:ends[depth - 1]]
+        # hold the path and trajectory leading to the node's parent
+        path = []
+        ends = [0]
+        stack = [(root, 0)]
+        while stack:
+            n, depth = stack.pop()
+            v = n.data
+            del path[depth:]
+            del ends[depth + 1:]
+            path.append(v)
+
+            start = ends[depth]
+            traj = v.trajectory if v.trajectory is not None and np.size(v.trajectory) else buf[:0]
+            end = start + len(traj)
+            if end >= len(buf):
+                grown = np.empty((max(2 * len(buf), end + 1),) + buf.shape[1:], dtype=buf.dtype)
+                grown[:start] = buf[:start]
+                buf = grown
+
+            buf[start:end] = traj
+            ends.append(end)
+
+            if n.identifier in wanted:
+                buf[end] = v.loc
+                trajectory = buf[:end + 1]
+                yield list(path), (trajectory.copy() if copy else trajectory)
+
+            stack.extend(
+                (c, depth + 1) for c in reversed(g.children(n.identifier)) if c.identifier in branch
+            )
+    # end iter_trajectories
 
 
     def min_trajectory_to_target(self, target):
         '''Return the fastest evader trajectory to the target.'''
-        ts = self.all_trajectories_to_target(target)
-        return (None, None) if not ts else min(ts, key=lambda p_t: p_t[1].shape[0])
+        nodes = self.reachable_nodes(target)
+        if not nodes:
+            return None, None
+
+        costs = self.costs_to_come()
+        best = min(nodes, key=lambda n: costs[n.identifier])
+        return next(self.iter_trajectories([best.identifier]))
     # end min_trajectory_to_target
 
 
     def max_time_trajectory(self):
         '''Return the evader trajectory of maximum time.
+
+        The vertex is taken from costs_to_come, so only its own path is
+        reconstructed.
         
         Arguments:
             None
@@ -116,51 +446,100 @@ class GameSolution:
             trajectory is a np.ndarray that describes the trajectory of the
             evader over time
         '''
-        nodes = self._g_e.leaves()
-        paths = list(map(self._collect_path, nodes))
-        trajectories = list(map(self._collect_trajectory, paths))
-
-        zipped = list(zip(paths, trajectories))
-        return max(zipped, key=lambda p_t: p_t[1].shape[0])
+        identifier, _ = self.costs_to_come().max()
+        return next(self.iter_trajectories([identifier]))
     # end max_time_trajectory
 
 
-    def _reachable_nodes(self, target):
-        '''Get all nodes whose trajectories pass through the target.'''
-        def _chk_pt(pt):
-            return pt in target
-        
-        def _chk_node(n):
-            if n.is_root():
-                return _chk_pt(n.data.loc)
-            else:
-                return (
-                    np.any(np.apply_along_axis(_chk_pt, 1, n.data.trajectory)) or
-                    _chk_pt(n.data.loc)
-                )
+    def max_time(self):
+        '''Return the largest cost-to-come of any evader vertex.
+
+        This is the value of the game of degree for the sampled solution.
+        '''
+        return self.costs_to_come().max()[1]
+    # end max_time
 
-        nodes = list(self._g_e.filter_nodes(lambda n: _chk_node(n)))
 
-        # filter out nodes who have an ancestor in nodes. if this happens, there is
-        # already a node earlier in the trajectory that passes through the target
+    def costs_to_come(self):
+        '''Get the CostToCome of the evader tree.'''
+        if self._costs is None:
+            self._costs = CostToCome.from_tree(self._g_e)
 
-        # this is horribly inefficient :(
-        # but, works for now
-        to_remove = []
-        for i in range(len(nodes)):
-            for j in range(len(nodes)):
-                if i == j:
-                    continue
+        return self._costs
+    # end costs_to_come
 
-                if self._g_e.is_ancestor(nodes[i].identifier, nodes[j].identifier):
-                    # i is an ancestor of j, so we should remove j
-                    to_remove.append(j)
 
-        to_remove = sorted(set(to_remove), reverse=True)
-        for idx in to_remove:
-            del nodes[idx]
-        return nodes
-    # end _reachable_nodes
+    def reachable_nodes(self, target):
+        '''Get all evader nodes whose trajectories pass through the target.
+
+        Only the first such node along each branch is returned. If a node's
+        trajectory passes through the target, there is already a node earlier
+        in the trajectory of each of its descendants that does.
+
+        Arguments:
+            target: the target region
+
+        Returns:
+            list of the nodes of the evader tree
+        '''
+        return list(self._iter_reachable_nodes(target))
+    # end reachable_nodes
+
+
+    def _iter_reachable_nodes(self, target):
+        '''Lazily find the nodes returned by reachable_nodes.
+
+        If the target has bounds, only the edges that the edge index returns
+        for them are tested, ancestors first. A hit is yielded as soon as none
+        of its ancestors is also a hit, so callers that stop at the first
+        result (e.g. can_reach) test as few edges as possible. Otherwise, the
+        evader tree is traversed depth-first, and the traversal does not
+        descend below a node whose trajectory passes through the target.
+        '''
+        try:
+            lower, upper = target.bounds()
+        except NotImplementedError:
+            yield from self._search_reachable_nodes(target)
+            return
+
+        g = self._g_e
+        candidates = {n.identifier: n for n in self.query_edges(lower, upper)}
+
+        # each candidate is tested at most once. Ancestors are shallower in
+        # the tree, so they have usually been tested already
+        tested = {}
+        def hit(n):
+            if n.identifier not in tested:
+                tested[n.identifier] = _enters(n, target)
+            return tested[n.identifier]
+        # end hit
+
+        for n in sorted(candidates.values(), key=g.depth):
+            if not hit(n):
+                continue
+
+            # edges outside the candidates cannot pass through the target
+            cur = n
+            while not cur.is_root():
+                cur = g.parent(cur.identifier)
+                if cur.identifier in candidates and hit(cur):
+                    break
+            else:
+                yield n
+    # end _iter_reachable_nodes
+
+
+    def _search_reachable_nodes(self, target):
+        '''Find the nodes returned by reachable_nodes with a depth-first search.'''
+        g = self._g_e
+        stack = [g[g.root]]
+        while stack:
+            n = stack.pop()
+            if _enters(n, target):
+                yield n
+            else:
+                stack.extend(g.children(n.identifier))
+    # end _search_reachable_nodes
 
 
     def _collect_path(self, n):
@@ -176,11 +555,197 @@ class GameSolution:
     # end _collect_path
 
 
-    def _collect_trajectory(self, path):
-        # condition in list comprehension is to ignore empty root trajectory
-        return np.vstack([v.trajectory for v in path if v.trajectory.size] + [path[-1].loc])
-    # end _collect_trajectory
+# end GameSolution
 
 
-# end GameSolution
+def _enters(n, target):
+    '''Check if the trajectory that leads to node n passes through target.'''
+    if n.is_root():
+        return n.data.loc in target
+
+    return bool(np.any(target.intersects_segments(*segments(n.data.trajectory, n.data.loc))))
+# end _enters
 
+
+class ValueMap:
+    '''The earliest arrival times of both players over a regular grid.
+
+    Cells that no sample of a tree falls in hold inf for that player. The
+    difference field is pursuer - evader. The evader reaches a cell with a
+    positive difference before the pursuer does, so the zero level set of the
+    difference is an empirical estimate of the barrier of the game of kind.
+    Cells that neither player reaches hold nan.
+    '''
+
+    def __init__(self, lower, upper, evader, pursuer):
+        '''Constructor.
+
+        Arguments:
+            lower:      the lower corner of the grid
+            upper:      the upper corner of the grid
+            evader:     the evader arrival time in each cell
+            pursuer:    the pursuer arrival time in each cell
+        '''
+        assert evader.shape == pursuer.shape
+        assert len(lower) == len(upper) == evader.ndim
+
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.shape = evader.shape
+        self.evader = evader
+        self.pursuer = pursuer
+
+        with np.errstate(invalid='ignore'):
+            self.difference = pursuer - evader
+    # end __init__
+
+
+    def cells(self, points):
+        '''Get the grid cell of each point.
+
+        Arguments:
+            points: the points, shape (n, dim). Only the leading axes of the
+                    grid are used.
+
+        Returns:
+            (index, inside), where index is a tuple of index arrays into the
+            fields and inside is True for points that lie within the grid.
+            The index of a point outside the grid is not meaningful.
+        '''
+        points = np.atleast_2d(np.asarray(points, dtype=float))[:, :len(self.shape)]
+        shape = np.array(self.shape)
+
+        cell = np.floor((points - self.lower) / (self.upper - self.lower) * shape).astype(np.int64)
+        inside = np.all((cell >= 0) & (cell < shape), axis=1)
+
+        return tuple(np.clip(cell, 0, shape - 1).T), inside
+    # end cells
+
+
+    def lookup(self, points, field='difference'):
+        '''Look up the value of a field at many points.
+
+        Arguments:
+            points: the points, shape (n, dim)
+            field:  one of 'evader', 'pursuer' or 'difference'
+
+        Returns:
+            np.ndarray of shape (n,). Points outside the grid get nan.
+        '''
+        assert field in ('evader', 'pursuer', 'difference')
+
+        index, inside = self.cells(points)
+        return np.where(inside, getattr(self, field)[index], np.nan)
+    # end lookup
+
+
+    def extent(self):
+        '''The extent of a 2D map in the order that imshow expects.'''
+        return self.lower[0], self.upper[0], self.lower[1], self.upper[1]
+    # end extent
+
+# end ValueMap
+
+
+def edge_samples(g, costs, spacing=None):
+    '''Get every stored sample of every edge of g with its arrival time.
+
+    Arguments:
+        g:          the tree
+        costs:      a CostToCome of g
+        spacing:    if not None, line segments between stored samples are
+                    subdivided so that consecutive samples are at most spacing
+                    apart
+
+    Returns:
+        (points, times), of shape (n, dim) and (n,)
+    '''
+    nodes = list(g.all_nodes_itr())
+    if not nodes:
+        return np.zeros((0, 0)), np.zeros(0)
+
+    # the polyline of each edge, from the parent to the child
+    polylines = []
+    t0 = np.empty(len(nodes))
+    t1 = np.empty(len(nodes))
+    for i, n in enumerate(nodes):
+        starts, ends = segments(n.data.trajectory, n.data.loc)
+        polylines.append(np.vstack([starts, ends[-1:]]))
+        t1[i] = costs[n.identifier]
+        t0[i] = t1[i] - (0 if n.is_root() else n.data.time())
+
+    if spacing is not None:
+        polylines = _subdivide(polylines, spacing)
+
+    counts = np.array([len(p) for p in polylines])
+    owner = np.repeat(np.arange(len(nodes)), counts)
+    first = np.cumsum(counts) - counts
+    points = np.concatenate(polylines)
+
+    # arc length along each edge
+    step = np.zeros(len(points))
+    step[1:] = np.sqrt(np.sum(np.diff(points, axis=0)**2, axis=1))
+    step[first] = 0
+    length = np.cumsum(step)
+    length -= length[first][owner]
+
+    total = length[first + counts - 1][owner]
+    position = np.arange(len(points)) - first[owner]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = np.where(total > 0, length / total, position / np.maximum(counts[owner] - 1, 1))
+
+    return points, t0[owner] + fraction * (t1 - t0)[owner]
+# end edge_samples
+
+
+def _subdivide(polylines, spacing):
+    '''Insert samples into polylines so that no segment is longer than spacing.'''
+    assert spacing > 0
+
+    counts = np.array([len(p) for p in polylines])
+    points = np.concatenate(polylines)
+    last = np.cumsum(counts) - 1
+
+    # the number of pieces that each segment is divided into. The last point
+    # of each polyline starts no segment.
+    pieces = np.ones(len(points), dtype=np.int64)
+    lengths = np.sqrt(np.sum(np.diff(points, axis=0)**2, axis=1))
+    pieces[:-1] = np.maximum(1, np.ceil(lengths / spacing)).astype(np.int64)
+    pieces[last] = 1
+
+    start = np.repeat(np.arange(len(points)), pieces)
+    step = np.arange(len(start)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    fraction = (step / pieces[start])[:, np.newaxis]
+
+    end = np.minimum(start + 1, len(points) - 1)
+    dense = points[start] + fraction * (points[end] - points[start])
+
+    return np.split(dense, np.cumsum(np.add.reduceat(pieces, np.cumsum(counts) - counts))[:-1])
+# end _subdivide
+
+
+def rasterize(points, times, lower, upper, shape):
+    '''Scatter the minimum time of the points in each cell of a grid.
+
+    Arguments:
+        points: the points, shape (n, dim). Only the leading len(shape) axes
+                are used.
+        times:  the time of each point
+        lower:  the lower corner of the grid
+        upper:  the upper corner of the grid
+        shape:  the number of cells along each axis
+
+    Returns:
+        np.ndarray of the given shape. Cells without points hold inf.
+    '''
+    grid = np.full(int(np.prod(shape)), np.inf)
+    if len(points):
+        points = points[:, :len(shape)]
+        cell = np.floor((points - lower) / (upper - lower) * np.array(shape)).astype(np.int64)
+        inside = np.all((cell >= 0) & (cell < np.array(shape)), axis=1)
+
+        index = np.ravel_multi_index(tuple(cell[inside].T), shape)
+        np.minimum.at(grid, index, times[inside])
+
+    return grid.reshape(shape)
+# end rasterize
@@ -0,0 +1,50 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module contains utilities for locating rufus' on-disk cache.
+
+Precomputed data (e.g. lookup tables) is stored in the directory named by the
+RUFUS_CACHE_DIR environment variable, or ~/.cache/rufus if it is not set.
+'''
+
+# Standard Imports
+import os
+
+# External Imports
+
+# Local Imports
+
+
+def cache_dir():
+    '''Get the cache directory, creating it if necessary.'''
+    path = os.environ.get(
+            'RUFUS_CACHE_DIR',
+            os.path.join(os.path.expanduser('~'), '.cache', 'rufus')
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+# end cache_dir
+
+
+def cache_path(name, directory=None):
+    '''Get the path of a file in the cache.
+
+    Arguments:
+        name:       the name of the file
+        directory:  the directory to use instead of the default cache directory
+
+    Returns:
+        str, the path of the cached file
+    '''
+    if directory is None:
+        directory = cache_dir()
+    else:
+        os.makedirs(directory, exist_ok=True)
+
+    return os.path.join(directory, name)
+# end cache_path
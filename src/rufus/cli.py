@@ -0,0 +1,314 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module contains the rufus command line interface.
+
+    rufus run scenario.toml -o results -j 8
+    rufus render results/runs/*.npz -o figures
+
+A scenario file (JSON, or TOML) describes one game and, optionally, a sweep
+over its parameters:
+
+    name = "chauffeur"
+    dt = 0.1
+    iterations = 2500
+    seeds = 4                       # or a list of seeds
+
+    [space]
+    lower = [0.0, 0.0]
+    upper = [100.0, 100.0]
+
+    [pursuer]
+    type = "DubinsCar"              # LinearActor, DubinsCar or DubinsAirplane
+    loc = [0.0, 0.0]
+    state = 0.785                   # the initial state, e.g. heading
+    w = 10.0                        # the remaining keys go to the Actor
+
+    [evader]
+    type = "LinearActor"
+    loc = [50.0, 50.0]
+    speed = 0.3
+
+    [capture]                       # see rufus.game.CaptureRadius
+    radius = 5.0
+    half_angle = 1.5708
+
+    [solver]                        # keyword arguments of Solver
+    gamma = 100.0
+
+    [[targets]]                     # BoxRegions the evader tries to reach
+    lower = [80.0, 80.0]
+    upper = [100.0, 100.0]
+
+    [sweep]                         # dotted keys, every combination is run
+    "pursuer.w" = [5.0, 10.0, 20.0]
+    "evader.speed" = [0.2, 0.3]
+
+Each run writes its solution to <output>/runs/<run>.npz (see rufus.storage)
+and then a <run>.json marker with its results. Runs that already have a marker
+are skipped, so an interrupted sweep resumes where it stopped. When all runs
+are done, the results are collected in <output>/summary.csv.
+'''
+
+# Standard Imports
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus import actors
+from rufus._lazy import lazy_import
+from rufus.game import BoxRegion, CaptureRadius, Vertex
+from rufus.solver import Solver
+from rufus.storage import save_solution
+
+try:
+    import tomllib
+except ImportError:
+    # python < 3.11
+    tomllib = lazy_import('tomli')
+
+
+def load_scenario(path):
+    '''Load a scenario file, see the module documentation.'''
+    if path.endswith('.toml'):
+        with open(path, 'rb') as fid:
+            return tomllib.load(fid)
+
+    with open(path) as fid:
+        return json.load(fid)
+# end load_scenario
+
+
+def _set(config, key, value):
+    '''Set a dotted key, e.g. pursuer.w, of a nested dict.'''
+    *parents, last = key.split('.')
+    for k in parents:
+        config = config.setdefault(k, {})
+
+    config[last] = value
+# end _set
+
+
+def expand(scenario):
+    '''Expand the sweep and seeds of a scenario into runs.
+
+    Returns:
+        list of (run, config, params). run is a name that identifies the
+        config, config is the scenario with the sweep applied and a single
+        seed, and params holds the swept values and the seed.
+    '''
+    base = copy.deepcopy(scenario)
+    sweep = base.pop('sweep', {})
+    seeds = base.pop('seeds', 1)
+    if isinstance(seeds, int):
+        seeds = list(range(seeds))
+
+    keys = sorted(sweep)
+    runs = []
+    for values in itertools.product(*[sweep[k] for k in keys]):
+        for seed in seeds:
+            config = copy.deepcopy(base)
+            for k, v in zip(keys, values):
+                _set(config, k, v)
+
+            config['seed'] = seed
+            params = dict(zip(keys, values))
+            params['seed'] = seed
+
+            digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:10]
+            runs.append(('%s-%s' % (config.get('name', 'run'), digest), config, params))
+
+    return runs
+# end expand
+
+
+def _actor(config, dt):
+    '''Create an Actor and its initial Vertex from its config.'''
+    config = dict(config)
+    actor_type = config.pop('type')
+    loc = np.array(config.pop('loc'), dtype=float)
+    state = config.pop('state', None)
+
+    assert actor_type in ('LinearActor', 'DubinsCar', 'DubinsAirplane'), \
+            'unsupported actor type %s' % actor_type
+
+    actor = getattr(actors, actor_type)(dt, **config)
+    return actor, Vertex(loc, state, np.array([]))
+# end _actor
+
+
+def run(config):
+    '''Solve the game of one run.
+
+    Returns:
+        (GameSolution, results), where results is a dict of the number of
+        vertices of each tree, the maximum evader time, whether the evader can
+        reach each target and the wall time of the solve
+    '''
+    dt = config['dt']
+    space = BoxRegion(np.array(config['space']['lower']), np.array(config['space']['upper']))
+    pursuer, p_init = _actor(config['pursuer'], dt)
+    evader, e_init = _actor(config['evader'], dt)
+    check_capture = CaptureRadius(**config['capture'])
+    targets = [BoxRegion(np.array(t['lower']), np.array(t['upper'])) for t in config.get('targets', [])]
+
+    np.random.seed(config['seed'])
+    solver = Solver(dt, space, pursuer, evader, check_capture, **config.get('solver', {}))
+
+    start = time.perf_counter()
+    soln = solver.solve(p_init, e_init, config['iterations'])
+
+    results = {
+        'evader_vertices': len(soln.evader_tree()),
+        'pursuer_vertices': len(soln.pursuer_tree()),
+        'max_time': float(soln.max_time()) * solver.dt
+    }
+    for i, target in enumerate(targets):
+        results['reach_%d' % i] = bool(soln.can_reach(target))
+
+    results['seconds'] = time.perf_counter() - start
+    return soln, results
+# end run
+
+
+def _run_and_save(name, config, directory):
+    '''Run one config in a worker and save its solution and marker.'''
+    try:
+        soln, results = run(config)
+    except Exception as e:
+        return name, None, '%s: %s' % (type(e).__name__, e)
+
+    save_solution(soln, os.path.join(directory, name + '.npz'))
+
+    # the marker is written last, and atomically, so that its presence means
+    # the run is complete
+    path = os.path.join(directory, name + '.json')
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as fid:
+        json.dump({'config': config, 'results': results}, fid)
+
+    os.replace(tmp, path)
+    return name, results, None
+# end _run_and_save
+
+
+def run_scenario(scenario, output_dir, jobs=None, log=None):
+    '''Run every run of a scenario that is not already done.
+
+    Arguments:
+        scenario:   the scenario, see load_scenario
+        output_dir: the directory to write solutions, markers and the summary
+        jobs:       the largest number of runs to solve at once. If None, one
+                    per CPU. If 1, runs are solved in this process.
+        log:        an optional callable that receives a line of progress
+
+    Returns:
+        (rows, failed), the summary rows of the done runs, in the order of the
+        sweep, and a dict of the error of each failed run
+    '''
+    log = log if log is not None else (lambda line: None)
+    directory = os.path.join(output_dir, 'runs')
+    os.makedirs(directory, exist_ok=True)
+
+    runs = expand(scenario)
+    done = {}
+    for name, _, _ in runs:
+        marker = os.path.join(directory, name + '.json')
+        if os.path.exists(marker):
+            with open(marker) as fid:
+                done[name] = json.load(fid)['results']
+
+    pending = [(name, config) for name, config, _ in runs if name not in done]
+    log('%d runs, %d done, %d to run' % (len(runs), len(done), len(pending)))
+
+    failed = {}
+    def finished(name, results, error):
+        if error is None:
+            done[name] = results
+            log('%s done (%d/%d)' % (name, len(done), len(runs)))
+        else:
+            failed[name] = error
+            log('%s failed: %s' % (name, error))
+    # end finished
+
+    if jobs == 1:
+        for name, config in pending:
+            finished(*_run_and_save(name, config, directory))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_run_and_save, name, config, directory) for name, config in pending]
+            for future in as_completed(futures):
+                finished(*future.result())
+
+    rows = []
+    for name, _, params in runs:
+        if name in done:
+            row = {'run': name}
+            row.update(params)
+            row.update(done[name])
+            rows.append(row)
+
+    write_summary(rows, os.path.join(output_dir, 'summary.csv'))
+    return rows, failed
+# end run_scenario
+
+
+def write_summary(rows, path):
+    '''Write summary rows to a CSV file, one column per key of any row.'''
+    columns = []
+    for row in rows:
+        columns += [k for k in row if k not in columns]
+
+    with open(path, 'w', newline='') as fid:
+        writer = csv.DictWriter(fid, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+# end write_summary
+
+
+def main(argv=None):
+    '''The rufus console entry point.'''
+    parser = argparse.ArgumentParser(prog='rufus', description='Modeling and analysis of differential games.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the games of a scenario file')
+    run_parser.add_argument('scenario', help='the scenario file (.json or .toml)')
+    run_parser.add_argument('-o', '--output-dir', default='.', help='the directory to write the results to')
+    run_parser.add_argument('-j', '--jobs', type=int, default=None, help='the number of runs to solve at once')
+
+    commands.add_parser('render', help='render figures of saved solutions', add_help=False)
+
+    args, rest = parser.parse_known_args(argv)
+    if args.command == 'render':
+        from rufus import render
+        return render.main(rest)
+
+    if rest:
+        parser.error('unrecognized arguments: %s' % ' '.join(rest))
+
+    log = lambda line: print(line, flush=True)
+    rows, failed = run_scenario(load_scenario(args.scenario), args.output_dir, args.jobs, log)
+    log('wrote %s' % os.path.join(args.output_dir, 'summary.csv'))
+
+    return 1 if failed else 0
+# end main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
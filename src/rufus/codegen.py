@@ -0,0 +1,133 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module generates NumPy code from sympy expressions.
+
+Each function is given as (args, exprs). Common subexpressions are eliminated
+with sympy.cse, and the function is written out as plain NumPy code that
+evaluates all exprs over a batch of arguments at once:
+
+    f(x) -> y
+
+where x has shape (batch, len(args)) and y has shape (batch, len(exprs)).
+
+Generated modules can be cached on disk, keyed by a digest of whatever defines
+them, so the symbolic work is only done once.
+'''
+
+# Standard Imports
+import hashlib
+import importlib.util
+import os
+import types
+
+# External Imports
+
+# Local Imports
+from rufus._lazy import lazy_import
+from rufus.cache import cache_path
+
+# only imported when code is generated
+sympy = lazy_import('sympy')
+
+
+# bump when the generated code changes, to invalidate cached modules
+VERSION = 1
+
+
+def digest(*parts):
+    '''Compute a stable digest of sympy objects (or nested lists of them).'''
+    h = hashlib.sha256(str(VERSION).encode())
+    for part in parts:
+        h.update(sympy.srepr(part).encode())
+        h.update(b'\0')
+
+    return h.hexdigest()[:16]
+# end digest
+
+
+def _generate_function(name, args, exprs):
+    '''Generate the source of one function.'''
+    from sympy.printing.numpy import NumPyPrinter
+
+    exprs = [sympy.sympify(e) for e in exprs]
+
+    # rename the arguments so they cannot clash with the cse temporaries or
+    # be invalid identifiers
+    names = {a: sympy.Symbol('_a%d' % i) for i, a in enumerate(args)}
+    exprs = [e.xreplace(names) for e in exprs]
+    temporaries, reduced = sympy.cse(exprs, symbols=sympy.numbered_symbols('_c'))
+
+    printer = NumPyPrinter({'fully_qualified_modules': True, 'inline': True})
+    lines = ['def %s(x):' % name]
+    lines += ['    _a%d = x[:, %d]' % (i, i) for i in range(len(args))]
+    lines += ['    %s = %s' % (t, printer.doprint(e)) for t, e in temporaries]
+    lines.append('    out = numpy.empty((x.shape[0], %d))' % len(reduced))
+    lines += ['    out[:, %d] = %s' % (i, printer.doprint(e)) for i, e in enumerate(reduced)]
+    lines.append('    return out')
+
+    return '\n'.join(lines)
+# end _generate_function
+
+
+def generate(functions):
+    '''Generate the source of a module.
+
+    Arguments:
+        functions:  a dict mapping the name of each function to (args, exprs)
+
+    Returns:
+        str, the source of the module
+    '''
+    source = ['# generated by rufus.codegen, do not edit', 'import numpy', '']
+    for name, (args, exprs) in functions.items():
+        source += ['', _generate_function(name, args, exprs), '']
+
+    return '\n'.join(source)
+# end generate
+
+
+def load_module(source, name='rufus_generated'):
+    '''Execute generated source as a new module.'''
+    module = types.ModuleType(name)
+    exec(compile(source, '<%s>' % name, 'exec'), module.__dict__)
+    return module
+# end load_module
+
+
+def load_or_generate(key, build, directory=None):
+    '''Load a generated module from the cache, generating it if needed.
+
+    Arguments:
+        key:        the digest of whatever defines the module, see digest
+        build:      a callable that returns the functions to generate, see
+                    generate. It is only called if the module is not cached.
+        directory:  the cache directory. If None, the default rufus cache
+                    directory is used.
+
+    Returns:
+        the module
+    '''
+    name = 'rufus_codegen_v%d_%s' % (VERSION, key)
+    path = cache_path(name + '.py', directory)
+
+    if not os.path.exists(path):
+        source = generate(build())
+
+        # concurrent readers must never import a partially written module
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as fid:
+            fid.write(source)
+
+        os.replace(tmp, path)
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+# end load_or_generate
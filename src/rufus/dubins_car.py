@@ -0,0 +1,548 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module contains vectorized utilities for Dubins car paths.
+
+The path computations mirror the reference implementation used by the dubins
+package (Andrew Walker, https://github.com/AndrewWalker/Dubins-Curves), but
+operate on arrays of configurations at once.
+
+A configuration is a (x, y, theta) triple. Path parameters are normalized by
+the turning radius, i.e. a path of normalized length l has length l * rho.
+'''
+
+# Standard Imports
+import os
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.cache import cache_path
+
+
+# path types, in the same order as dubins.DubinsPathType
+LSL = 0
+LSR = 1
+RSL = 2
+RSR = 3
+RLR = 4
+LRL = 5
+
+# segment types
+L_SEG = 0
+S_SEG = 1
+R_SEG = 2
+
+# the segment types of each path type
+SEGMENTS = np.array([
+    [L_SEG, S_SEG, L_SEG],
+    [L_SEG, S_SEG, R_SEG],
+    [R_SEG, S_SEG, L_SEG],
+    [R_SEG, S_SEG, R_SEG],
+    [R_SEG, L_SEG, R_SEG],
+    [L_SEG, R_SEG, L_SEG]
+])
+
+
+def _mod2pi(theta):
+    return theta - 2 * np.pi * np.floor(theta / (2 * np.pi))
+# end _mod2pi
+
+
+def _words(alpha, beta, d):
+    '''Compute the normalized parameters of all six path types.
+
+    Arguments:
+        alpha:  the initial heading relative to the line between endpoints
+        beta:   the final heading relative to the line between endpoints
+        d:      the normalized distance between endpoints
+
+    Returns:
+        np.ndarray of shape (m, 6, 3). Infeasible words are filled with inf.
+    '''
+    sa, sb = np.sin(alpha), np.sin(beta)
+    ca, cb = np.cos(alpha), np.cos(beta)
+    c_ab = np.cos(alpha - beta)
+    d_sq = d * d
+
+    out = np.full(alpha.shape + (6, 3), np.inf)
+
+    with np.errstate(invalid='ignore'):
+        # LSL
+        p_sq = 2 + d_sq - 2 * c_ab + 2 * d * (sa - sb)
+        tmp = np.arctan2(cb - ca, d + sa - sb)
+        ok = p_sq >= 0
+        out[ok, LSL, 0] = _mod2pi(tmp - alpha)[ok]
+        out[ok, LSL, 1] = np.sqrt(p_sq[ok])
+        out[ok, LSL, 2] = _mod2pi(beta - tmp)[ok]
+
+        # LSR
+        p_sq = -2 + d_sq + 2 * c_ab + 2 * d * (sa + sb)
+        p = np.sqrt(p_sq)
+        tmp = np.arctan2(-ca - cb, d + sa + sb) - np.arctan2(-2.0, p)
+        ok = p_sq >= 0
+        out[ok, LSR, 0] = _mod2pi(tmp - alpha)[ok]
+        out[ok, LSR, 1] = p[ok]
+        out[ok, LSR, 2] = _mod2pi(tmp - _mod2pi(beta))[ok]
+
+        # RSL
+        p_sq = -2 + d_sq + 2 * c_ab - 2 * d * (sa + sb)
+        p = np.sqrt(p_sq)
+        tmp = np.arctan2(ca + cb, d - sa - sb) - np.arctan2(2.0, p)
+        ok = p_sq >= 0
+        out[ok, RSL, 0] = _mod2pi(alpha - tmp)[ok]
+        out[ok, RSL, 1] = p[ok]
+        out[ok, RSL, 2] = _mod2pi(beta - tmp)[ok]
+
+        # RSR
+        p_sq = 2 + d_sq - 2 * c_ab + 2 * d * (sb - sa)
+        tmp = np.arctan2(ca - cb, d - sa + sb)
+        ok = p_sq >= 0
+        out[ok, RSR, 0] = _mod2pi(alpha - tmp)[ok]
+        out[ok, RSR, 1] = np.sqrt(p_sq[ok])
+        out[ok, RSR, 2] = _mod2pi(tmp - beta)[ok]
+
+        # RLR
+        tmp = (6.0 - d_sq + 2 * c_ab + 2 * d * (sa - sb)) / 8.0
+        phi = np.arctan2(ca - cb, d - sa + sb)
+        p = _mod2pi(2 * np.pi - np.arccos(tmp))
+        t = _mod2pi(alpha - phi + _mod2pi(p / 2.0))
+        ok = np.abs(tmp) <= 1
+        out[ok, RLR, 0] = t[ok]
+        out[ok, RLR, 1] = p[ok]
+        out[ok, RLR, 2] = _mod2pi(alpha - beta - t + _mod2pi(p))[ok]
+
+        # LRL
+        tmp = (6.0 - d_sq + 2 * c_ab + 2 * d * (sb - sa)) / 8.0
+        phi = np.arctan2(ca - cb, d + sa - sb)
+        p = _mod2pi(2 * np.pi - np.arccos(tmp))
+        t = _mod2pi(-alpha - phi + p / 2.0)
+        ok = np.abs(tmp) <= 1
+        out[ok, LRL, 0] = t[ok]
+        out[ok, LRL, 1] = p[ok]
+        out[ok, LRL, 2] = _mod2pi(_mod2pi(beta) - alpha - t + _mod2pi(p))[ok]
+
+    return out
+# end _words
+
+
+def _intermediate(q0, q1, rho):
+    dx = q1[:, 0] - q0[:, 0]
+    dy = q1[:, 1] - q0[:, 1]
+    d = np.sqrt(dx**2 + dy**2) / rho
+
+    theta = np.where(d > 0, _mod2pi(np.arctan2(dy, dx)), 0.0)
+    alpha = _mod2pi(q0[:, 2] - theta)
+    beta = _mod2pi(q1[:, 2] - theta)
+
+    return alpha, beta, d
+# end _intermediate
+
+
+def shortest_paths(q0, q1, rho):
+    '''Compute the shortest Dubins paths between pairs of configurations.
+
+    Arguments:
+        q0:     the initial configurations, shape (m, 3) or (3,)
+        q1:     the final configurations, shape (m, 3) or (3,)
+        rho:    the turning radius
+
+    Returns:
+        (types, params)
+
+        types is a np.ndarray of shape (m,) holding the path type of each path
+
+        params is a np.ndarray of shape (m, 3) holding the normalized length of
+        each segment of each path
+    '''
+    assert rho > 0
+    q0, q1 = np.broadcast_arrays(np.atleast_2d(q0), np.atleast_2d(q1))
+    q0 = q0.astype(float)
+    q1 = q1.astype(float)
+
+    words = _words(*_intermediate(q0, q1, rho))
+    types = np.argmin(np.sum(words, axis=-1), axis=-1)
+    params = words[np.arange(len(types)), types]
+
+    return types, params
+# end shortest_paths
+
+
+def path_lengths(q0, q1, rho):
+    '''Compute the length of the shortest Dubins paths between configurations.
+
+    Arguments:
+        q0:     the initial configurations, shape (m, 3) or (3,)
+        q1:     the final configurations, shape (m, 3) or (3,)
+        rho:    the turning radius
+
+    Returns:
+        np.ndarray of shape (m,), the path lengths
+    '''
+    _, params = shortest_paths(q0, q1, rho)
+    return rho * np.sum(params, axis=-1)
+# end path_lengths
+
+
+def _segment(t, q, segment_type):
+    '''Advance the normalized configurations q along segments of length t.'''
+    x, y, theta = q[:, 0], q[:, 1], q[:, 2]
+    st, ct = np.sin(theta), np.cos(theta)
+
+    is_l = segment_type == L_SEG
+    is_r = segment_type == R_SEG
+    is_s = segment_type == S_SEG
+
+    # the heading change is +t for left turns, -t for right turns
+    sign = is_l.astype(float) - is_r
+    turned = theta + sign * t
+
+    out = np.empty_like(q)
+    out[:, 0] = x + np.where(is_s, ct * t, sign * (np.sin(turned) - st))
+    out[:, 1] = y + np.where(is_s, st * t, sign * (ct - np.cos(turned)))
+    out[:, 2] = turned
+
+    return out
+# end _segment
+
+
+def sample_paths(qi, types, params, rho, step):
+    '''Sample many Dubins paths at a fixed step size.
+
+    The samples are identical to those of dubins.DubinsPath.sample_many: each
+    path is sampled at 0, step, 2 * step, ... up to, but excluding, its length.
+
+    Arguments:
+        qi:     the initial configurations, shape (m, 3)
+        types:  the path types, shape (m,)
+        params: the normalized segment lengths, shape (m, 3)
+        rho:    the turning radius
+        step:   the distance between samples
+
+    Returns:
+        (samples, offsets)
+
+        samples is a np.ndarray of shape (n, 3) holding the samples of all
+        paths, one after the other
+
+        offsets is a np.ndarray of shape (m + 1,). The samples of path i are
+        samples[offsets[i]:offsets[i + 1]]
+    '''
+    assert step > 0
+    qi = np.atleast_2d(np.asarray(qi, dtype=float))
+    types = np.atleast_1d(types)
+    params = np.atleast_2d(params)
+
+    counts = np.ceil(rho * np.sum(params, axis=1) / step).astype(int)
+    offsets = np.zeros(len(counts) + 1, dtype=int)
+    np.cumsum(counts, out=offsets[1:])
+
+    # the configurations at the start of each segment, in the normalized frame
+    # of each path
+    segments = SEGMENTS[types]
+    starts = np.zeros((3,) + qi.shape)
+    starts[0, :, 2] = qi[:, 2]
+    starts[1] = _segment(params[:, 0], starts[0], segments[:, 0])
+    starts[2] = _segment(params[:, 1], starts[1], segments[:, 1])
+    knots = np.column_stack([np.zeros(len(params)), params[:, 0], params[:, 0] + params[:, 1]])
+
+    # the path, segment, and normalized distance along the segment of each sample
+    path = np.repeat(np.arange(len(counts)), counts)
+    t = (np.arange(offsets[-1]) - offsets[path]) * step / rho
+    seg = (t >= knots[path, 1]).astype(int) + (t >= knots[path, 2])
+
+    samples = _segment(t - knots[path, seg], starts[seg, path], segments[path, seg])
+    samples[:, :2] = samples[:, :2] * rho + qi[path, :2]
+    samples[:, 2] = _mod2pi(samples[:, 2])
+
+    return samples, offsets
+# end sample_paths
+
+
+def sample_path(qi, path_type, params, rho, step):
+    '''Sample a single Dubins path at a fixed step size.
+
+    See sample_paths.
+
+    Returns:
+        np.ndarray of shape (n, 3), the samples of the path
+    '''
+    samples, _ = sample_paths(qi, path_type, params, rho, step)
+    return samples
+# end sample_path
+
+
+def relative_poses(q0, q1, rho):
+    '''Express q1 in the frame of q0, normalized by the turning radius.
+
+    Arguments:
+        q0:     the initial configurations, shape (m, 3) or (3,)
+        q1:     the final configurations, shape (m, 3) or (3,)
+        rho:    the turning radius
+
+    Returns:
+        np.ndarray of shape (m, 3), the relative (x, y, theta) of q1, with
+        theta in [0, 2pi)
+    '''
+    q0, q1 = np.broadcast_arrays(np.atleast_2d(q0), np.atleast_2d(q1))
+
+    dx = (q1[:, 0] - q0[:, 0]) / rho
+    dy = (q1[:, 1] - q0[:, 1]) / rho
+    c, s = np.cos(q0[:, 2]), np.sin(q0[:, 2])
+
+    return np.column_stack([
+        c * dx + s * dy,
+        -s * dx + c * dy,
+        _mod2pi(q1[:, 2] - q0[:, 2])
+    ])
+# end relative_poses
+
+
+class DubinsCostTable:
+    '''A precomputed table of normalized Dubins path lengths.
+
+    The length of the shortest Dubins path depends only on the pose of the end
+    configuration relative to the start configuration, scaled by the turning
+    radius. This table samples that function on a regular (x, y, theta) grid
+    over [-extent, extent]^2 x [0, 2pi) and evaluates it by trilinear
+    interpolation. Poses outside of the grid are computed exactly.
+
+    The shortest path length is discontinuous in places, so each cell of the
+    grid carries a conservative bound on the interpolation error: the spread of
+    the values at the cell's corners plus the interpolation error at its
+    center.
+    '''
+
+    VERSION = 1
+
+    def __init__(self, lengths, error, extent):
+        '''Constructor.
+
+        Use DubinsCostTable.build or DubinsCostTable.load_or_build instead of
+        calling this directly.
+
+        Arguments:
+            lengths:    the normalized path lengths at the grid points,
+                        shape (nx, ny, nt)
+            error:      the error bound of each grid cell,
+                        shape (nx - 1, ny - 1, nt)
+            extent:     the normalized half-width of the grid in x and y
+        '''
+        assert lengths.ndim == 3
+        assert error.shape == (lengths.shape[0] - 1, lengths.shape[1] - 1, lengths.shape[2])
+        assert extent > 0
+
+        self.lengths = lengths
+        self.error = error
+        self.extent = extent
+        self.resolution = lengths.shape
+        self.max_error = float(np.max(error))
+
+        nx, ny, nt = lengths.shape
+        self._step = np.array([2 * extent / (nx - 1), 2 * extent / (ny - 1), 2 * np.pi / nt])
+    # end __init__
+
+
+    @classmethod
+    def build(cls, resolution=(129, 129, 72), extent=10.0):
+        '''Compute a new table.
+
+        Arguments:
+            resolution: the number of grid points along (x, y, theta)
+            extent:     the normalized half-width of the grid in x and y
+
+        Returns:
+            DubinsCostTable
+        '''
+        nx, ny, nt = resolution
+        assert nx > 1 and ny > 1 and nt > 1
+
+        xs = np.linspace(-extent, extent, nx)
+        ys = np.linspace(-extent, extent, ny)
+        ts = np.arange(nt) * (2 * np.pi / nt)
+        lengths = _normalized_lengths(xs, ys, ts)
+
+        # interpolated and exact values at the cell centers
+        centers = _normalized_lengths(
+                xs[:-1] + (xs[1] - xs[0]) / 2,
+                ys[:-1] + (ys[1] - ys[0]) / 2,
+                ts + np.pi / nt
+        )
+        corners = np.stack([
+            np.roll(lengths, -k, axis=2)[i:nx - 1 + i, j:ny - 1 + j]
+            for i in (0, 1) for j in (0, 1) for k in (0, 1)
+        ])
+
+        error = (
+                np.max(corners, axis=0) - np.min(corners, axis=0) +
+                np.abs(centers - np.mean(corners, axis=0))
+        )
+
+        return cls(lengths.astype(np.float32), error.astype(np.float32), extent)
+    # end build
+
+
+    @classmethod
+    def load_or_build(cls, resolution=(129, 129, 72), extent=10.0, directory=None):
+        '''Load a table from the cache, building and caching it if needed.
+
+        Arguments:
+            resolution: the number of grid points along (x, y, theta)
+            extent:     the normalized half-width of the grid in x and y
+            directory:  the cache directory. If None, the default rufus cache
+                        directory is used.
+
+        Returns:
+            DubinsCostTable
+        '''
+        nx, ny, nt = resolution
+        path = cache_path(
+                f'dubins_table_v{cls.VERSION}_{nx}x{ny}x{nt}_{extent:g}.npz',
+                directory
+        )
+
+        if os.path.exists(path):
+            return cls.load(path)
+
+        table = cls.build(resolution, extent)
+        table.save(path)
+        return table
+    # end load_or_build
+
+
+    @classmethod
+    def load(cls, path):
+        '''Load a table saved with DubinsCostTable.save.'''
+        with np.load(path) as data:
+            return cls(data['lengths'], data['error'], float(data['extent']))
+    # end load
+
+
+    def save(self, path):
+        '''Save the table to path.
+
+        The table is written to a temporary file first, so concurrent readers
+        never observe a partially written table.
+        '''
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as fid:
+            np.savez(fid, lengths=self.lengths, error=self.error, extent=self.extent)
+
+        os.replace(tmp, path)
+    # end save
+
+
+    def lookup(self, poses, return_error=False):
+        '''Look up the normalized path length to relative poses.
+
+        Arguments:
+            poses:          the relative poses, shape (m, 3), as returned by
+                            relative_poses
+            return_error:   if True, also return the error bound
+
+        Returns:
+            lengths, or (lengths, error) if return_error is True. Both are
+            np.ndarray of shape (m,)
+        '''
+        poses = np.atleast_2d(poses)
+        lengths = np.empty(poses.shape[0])
+        error = np.zeros(poses.shape[0])
+
+        inside = np.all(np.abs(poses[:, :2]) <= self.extent, axis=1)
+
+        # trilinear interpolation within the grid
+        nx, ny, nt = self.resolution
+        f = (poses[inside] + [self.extent, self.extent, 0.0]) / self._step
+        idx = np.floor(f).astype(int)
+        idx[:, 0] = np.clip(idx[:, 0], 0, nx - 2)
+        idx[:, 1] = np.clip(idx[:, 1], 0, ny - 2)
+        frac = f - idx
+        idx[:, 2] %= nt
+
+        i, j, k = idx.T
+        k1 = (k + 1) % nt
+        fx, fy, ft = frac.T
+
+        value = 0.0
+        for di, wx in ((0, 1 - fx), (1, fx)):
+            for dj, wy in ((0, 1 - fy), (1, fy)):
+                value = value + wx * wy * (
+                        (1 - ft) * self.lengths[i + di, j + dj, k] +
+                        ft * self.lengths[i + di, j + dj, k1]
+                )
+
+        lengths[inside] = value
+        error[inside] = self.error[i, j, k]
+
+        # exact computation outside of the grid
+        outside = ~inside
+        if np.any(outside):
+            lengths[outside] = _pose_lengths(poses[outside])
+
+        return (lengths, error) if return_error else lengths
+    # end lookup
+
+
+    def path_length(self, q0, q1, rho, return_error=False):
+        '''Estimate the length of the shortest Dubins path from q0 to q1.
+
+        Arguments:
+            q0:             the initial configurations, shape (m, 3) or (3,)
+            q1:             the final configurations, shape (m, 3) or (3,)
+            rho:            the turning radius
+            return_error:   if True, also return the error bound
+
+        Returns:
+            lengths, or (lengths, error) if return_error is True. The result is
+            a float if q0 and q1 are single configurations.
+        '''
+        scalar = np.ndim(q0) == 1 and np.ndim(q1) == 1
+        lengths, error = self.lookup(relative_poses(q0, q1, rho), return_error=True)
+        lengths, error = rho * lengths, rho * error
+
+        if scalar:
+            lengths, error = float(lengths[0]), float(error[0])
+
+        return (lengths, error) if return_error else lengths
+    # end path_length
+
+
+    def lower_bound(self, q0, q1, rho):
+        '''A conservative lower bound on the length of the shortest Dubins path.
+
+        The bound is never less than the euclidean distance between the
+        endpoints, which is itself a lower bound.
+        '''
+        scalar = np.ndim(q0) == 1 and np.ndim(q1) == 1
+        poses = relative_poses(q0, q1, rho)
+        lengths, error = self.lookup(poses, return_error=True)
+        bound = rho * np.maximum(lengths - error, np.sqrt(np.sum(poses[:, :2]**2, axis=1)))
+
+        return float(bound[0]) if scalar else bound
+    # end lower_bound
+
+# end DubinsCostTable
+
+
+def _pose_lengths(poses, chunk=65536):
+    '''Normalized path lengths from the origin to relative poses.'''
+    lengths = np.empty(poses.shape[0])
+    for i in range(0, poses.shape[0], chunk):
+        q1 = poses[i:i + chunk]
+        lengths[i:i + chunk] = path_lengths(np.zeros_like(q1), q1, 1.0)
+
+    return lengths
+# end _pose_lengths
+
+
+def _normalized_lengths(xs, ys, ts):
+    '''Normalized path lengths over the grid xs x ys x ts.'''
+    grid = np.stack(np.meshgrid(xs, ys, ts, indexing='ij'), axis=-1)
+    return _pose_lengths(grid.reshape((-1, 3))).reshape(grid.shape[:-1])
+# end _normalized_lengths
@@ -10,11 +10,13 @@ This module contains the definitions for the core Game types.
 '''
 
 # Standard Imports
+import copy
 
 # External Imports
 import numpy as np
 
 # Local Imports
+from rufus.trajectory import bounds as trajectory_bounds
 
 
 class Actor:
@@ -35,6 +37,22 @@ class Actor:
     # end __init__
 
 
+    def with_dt(self, dt):
+        '''Get a copy of this Actor with a different time increment.
+
+        Arguments:
+            dt: the time increment of the copy
+
+        Returns:
+            Actor
+        '''
+        assert dt > 0
+        actor = copy.copy(self)
+        actor._dt = dt
+        return actor
+    # end with_dt
+
+
     def steer(self, start, end, state):
         '''Determine the optimal trajectory from start to end under the
         kinematics of the Actor.
@@ -91,6 +109,12 @@ class Region:
         if pt in region:
             ...
 
+    Many points can be checked at once with contains_many, and regions can be
+    combined with the |, & and - operators:
+
+        keep_out = BallRegion(center, 10.0) | BoxRegion(lower, upper)
+        allowed = space - keep_out
+
     '''
 
     def __contains__(self, pt):
@@ -99,6 +123,21 @@ class Region:
     # end __contains__
 
 
+    def __or__(self, other):
+        return UnionRegion(self, other)
+    # end __or__
+
+
+    def __and__(self, other):
+        return IntersectionRegion(self, other)
+    # end __and__
+
+
+    def __sub__(self, other):
+        return DifferenceRegion(self, other)
+    # end __sub__
+
+
     def check_containment(self, pt):
         '''Check if pt is within the region.
 
@@ -112,14 +151,113 @@ class Region:
     # end check_containment
 
 
+    def contains_many(self, points):
+        '''Check which of many points are within the region.
+
+        The default implementation calls check_containment for each point.
+        Concrete implementations should override this method with a vectorized
+        test.
+
+        Arguments:
+            points: the points to check, shape (m, dim)
+
+        Returns:
+            np.ndarray of bool, shape (m,). True if the point belongs to the
+            region.
+        '''
+        return np.array([self.check_containment(pt) for pt in points], dtype=bool)
+    # end contains_many
+
+
     def sample(self):
         '''Sample a value from the region.'''
         raise NotImplementedError()
     # end sample
 
+
+    def sample_many(self, n):
+        '''Sample n values from the region.
+
+        Returns:
+            np.ndarray of shape (n, dim)
+        '''
+        return np.array([self.sample() for _ in range(n)])
+    # end sample_many
+
+
+    def bounds(self):
+        '''Get the axis-aligned bounding box of the region.
+
+        Returns:
+            (lower, upper)
+        '''
+        raise NotImplementedError()
+    # end bounds
+
+
+    def intersects_segments(self, starts, ends):
+        '''Check which line segments pass through the region.
+
+        The default implementation only checks the endpoints of each segment.
+        Concrete implementations should override this method with an exact
+        test.
+
+        Arguments:
+            starts: the start of each segment, shape (m, dim)
+            ends:   the end of each segment, shape (m, dim)
+
+        Returns:
+            np.ndarray of bool, shape (m,). True if the segment passes through
+            the region.
+        '''
+        return self.contains_many(np.atleast_2d(starts)) | self.contains_many(np.atleast_2d(ends))
+    # end intersects_segments
+
 # end Region
 
 
+def intersects_boxes(lower, upper, starts, ends, pairwise=False):
+    '''Check which line segments pass through which of many boxes.
+
+    This is the vectorized form of BoxRegion.intersects_segments (slab method).
+
+    Arguments:
+        lower:      the lower corner of each box, shape (r, dim)
+        upper:      the upper corner of each box, shape (r, dim)
+        starts:     the start of each segment, shape (m, dim)
+        ends:       the end of each segment, shape (m, dim)
+        pairwise:   if True, r == m and the i-th segment is only tested
+                    against the i-th box
+
+    Returns:
+        np.ndarray of bool, shape (r, m), or shape (m,) if pairwise. True if
+        the segment passes through the box.
+    '''
+    lower = np.atleast_2d(lower)
+    upper = np.atleast_2d(upper)
+    if not pairwise:
+        lower = lower[:, np.newaxis]
+        upper = upper[:, np.newaxis]
+
+    starts = np.atleast_2d(starts)
+    direction = np.atleast_2d(ends) - starts
+    moving = direction != 0
+
+    # along axes where a segment is constant, it must lie within the slab
+    inside = (lower <= starts) & (starts < upper)
+    hit = np.all(inside | moving, axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t0 = (lower - starts) / direction
+        t1 = (upper - starts) / direction
+
+    t_lower = np.max(np.where(moving, np.minimum(t0, t1), -np.inf), axis=-1, initial=0.0)
+    t_upper = np.min(np.where(moving, np.maximum(t0, t1), np.inf), axis=-1, initial=1.0)
+
+    return hit & (t_lower <= t_upper)
+# end intersects_boxes
+
+
 class BoxRegion(Region):
     '''Represents an region that can be described as by an n-orthotope.'''
     
@@ -146,13 +284,428 @@ class BoxRegion(Region):
     # end check_containment
 
 
+    def contains_many(self, points):
+        points = np.atleast_2d(points)
+        return np.all(self.lower <= points, axis=1) & np.all(points < self.upper, axis=1)
+    # end contains_many
+
+
     def sample(self):
         return self._range * np.random.sample(self.ndim) + self.lower
     # end sample
 
+
+    def sample_many(self, n):
+        return self._range * np.random.sample((n, self.ndim)) + self.lower
+    # end sample_many
+
+
+    def bounds(self):
+        return self.lower, self.upper
+    # end bounds
+
+
+    def intersects_segments(self, starts, ends):
+        '''Exact segment test (slab method).
+
+        Along axes where a segment is not constant, the box is treated as
+        closed.
+        '''
+        return intersects_boxes(self.lower[np.newaxis], self.upper[np.newaxis], starts, ends)[0]
+    # end intersects_segments
+
 # end BoxRegion
 
 
+class BallRegion(Region):
+    '''Represents a region that can be described by an n-ball.'''
+
+    def __init__(self, center, radius):
+        '''Constructor.
+
+        Arguments:
+            center: the center of the ball
+            radius: the radius of the ball
+        '''
+        assert radius > 0
+
+        self.center = np.asarray(center, dtype=float)
+        self.radius = radius
+        self.ndim = len(self.center)
+    # end __init__
+
+
+    def check_containment(self, pt):
+        return np.sum((pt - self.center)**2) <= self.radius**2
+    # end check_containment
+
+
+    def contains_many(self, points):
+        return np.sum((np.atleast_2d(points) - self.center)**2, axis=1) <= self.radius**2
+    # end contains_many
+
+
+    def sample(self):
+        return self.sample_many(1)[0]
+    # end sample
+
+
+    def sample_many(self, n):
+        direction = np.random.normal(size=(n, self.ndim))
+        direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+        r = self.radius * np.random.sample((n, 1))**(1.0 / self.ndim)
+        return self.center + r * direction
+    # end sample_many
+
+
+    def bounds(self):
+        return self.center - self.radius, self.center + self.radius
+    # end bounds
+
+
+    def intersects_segments(self, starts, ends):
+        '''Exact segment test: the closest point of each segment to the center
+        must be within the ball.
+        '''
+        starts = np.atleast_2d(starts)
+        direction = np.atleast_2d(ends) - starts
+
+        length_sq = np.sum(direction**2, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.sum((self.center - starts) * direction, axis=1) / length_sq
+        t = np.where(length_sq > 0, np.clip(t, 0.0, 1.0), 0.0)
+
+        closest = starts + t[:, np.newaxis] * direction
+        return self.contains_many(closest)
+    # end intersects_segments
+
+# end BallRegion
+
+
+class PolytopeRegion(Region):
+    '''Represents a convex region described by halfspaces, A x <= b.'''
+
+    def __init__(self, A, b, lower=None, upper=None):
+        '''Constructor.
+
+        Arguments:
+            A:      the normals of the halfspaces, shape (k, dim)
+            b:      the offsets of the halfspaces, shape (k,)
+            lower:  the lower bound of a box that contains the polytope
+            upper:  the upper bound of a box that contains the polytope
+
+        The bounding box is needed to sample from the polytope.
+        '''
+        A = np.atleast_2d(np.asarray(A, dtype=float))
+        b = np.asarray(b, dtype=float)
+        assert A.shape[0] == b.shape[0]
+        assert (lower is None) == (upper is None)
+
+        self.A = A
+        self.b = b
+        self.lower = None if lower is None else np.asarray(lower, dtype=float)
+        self.upper = None if upper is None else np.asarray(upper, dtype=float)
+        self.ndim = A.shape[1]
+    # end __init__
+
+
+    @classmethod
+    def from_vertices(cls, vertices):
+        '''Create a convex polygon from its vertices.
+
+        Arguments:
+            vertices:   the vertices of the polygon in order (either clockwise
+                        or counter-clockwise), shape (k, 2)
+
+        Returns:
+            PolytopeRegion
+        '''
+        vertices = np.asarray(vertices, dtype=float)
+        assert vertices.ndim == 2 and vertices.shape[1] == 2
+        assert vertices.shape[0] >= 3
+
+        edges = np.roll(vertices, -1, axis=0) - vertices
+
+        # make the vertices counter-clockwise, so the interior is on the left
+        # of each edge
+        area = np.sum(vertices[:, 0] * edges[:, 1] - vertices[:, 1] * edges[:, 0])
+        if area < 0:
+            vertices = vertices[::-1]
+            edges = np.roll(vertices, -1, axis=0) - vertices
+
+        A = np.column_stack([edges[:, 1], -edges[:, 0]])
+        b = np.sum(A * vertices, axis=1)
+
+        return cls(A, b, np.min(vertices, axis=0), np.max(vertices, axis=0))
+    # end from_vertices
+
+
+    def check_containment(self, pt):
+        return bool(np.all(np.dot(self.A, pt) <= self.b))
+    # end check_containment
+
+
+    def contains_many(self, points):
+        return np.all(np.dot(np.atleast_2d(points), self.A.T) <= self.b, axis=1)
+    # end contains_many
+
+
+    def sample(self):
+        return self.sample_many(1)[0]
+    # end sample
+
+
+    def sample_many(self, n):
+        return _rejection_sample(self, n)
+    # end sample_many
+
+
+    def bounds(self):
+        if self.lower is None:
+            raise NotImplementedError('PolytopeRegion requires a bounding box')
+
+        return self.lower, self.upper
+    # end bounds
+
+
+    def intersects_segments(self, starts, ends):
+        '''Exact segment test (Cyrus-Beck clipping).'''
+        starts = np.atleast_2d(starts)
+        direction = np.atleast_2d(ends) - starts
+
+        # the segment is s + t * d for t in [0, 1]. Each halfspace requires
+        # (a . d) t <= b - a . s
+        num = self.b - np.dot(starts, self.A.T)
+        den = np.dot(direction, self.A.T)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = num / den
+
+        t_lower = np.max(np.where(den < 0, ratio, 0.0), axis=1, initial=0.0)
+        t_upper = np.min(np.where(den > 0, ratio, 1.0), axis=1, initial=1.0)
+        parallel_ok = np.all((den != 0) | (num >= 0), axis=1)
+
+        return parallel_ok & (t_lower <= t_upper)
+    # end intersects_segments
+
+# end PolytopeRegion
+
+
+class UnionRegion(Region):
+    '''Represents the union of regions.'''
+
+    def __init__(self, *regions):
+        assert len(regions) > 0
+        self.regions = regions
+        self.ndim = regions[0].ndim
+    # end __init__
+
+
+    def check_containment(self, pt):
+        return any(pt in r for r in self.regions)
+    # end check_containment
+
+
+    def contains_many(self, points):
+        return np.any([r.contains_many(points) for r in self.regions], axis=0)
+    # end contains_many
+
+
+    def sample(self):
+        return self.sample_many(1)[0]
+    # end sample
+
+
+    def sample_many(self, n):
+        return _rejection_sample(self, n)
+    # end sample_many
+
+
+    def bounds(self):
+        lowers, uppers = zip(*[r.bounds() for r in self.regions])
+        return np.min(lowers, axis=0), np.max(uppers, axis=0)
+    # end bounds
+
+
+    def intersects_segments(self, starts, ends):
+        return np.any([r.intersects_segments(starts, ends) for r in self.regions], axis=0)
+    # end intersects_segments
+
+# end UnionRegion
+
+
+class IntersectionRegion(Region):
+    '''Represents the intersection of regions.
+
+    Segment tests sample each segment at a fixed number of points, so a
+    segment that only clips a thin part of the intersection may be missed.
+    '''
+
+    def __init__(self, *regions, segment_samples=16):
+        assert len(regions) > 0
+        self.regions = regions
+        self.ndim = regions[0].ndim
+        self._segment_samples = segment_samples
+    # end __init__
+
+
+    def check_containment(self, pt):
+        return all(pt in r for r in self.regions)
+    # end check_containment
+
+
+    def contains_many(self, points):
+        return np.all([r.contains_many(points) for r in self.regions], axis=0)
+    # end contains_many
+
+
+    def sample(self):
+        return self.sample_many(1)[0]
+    # end sample
+
+
+    def sample_many(self, n):
+        return _rejection_sample(self, n)
+    # end sample_many
+
+
+    def bounds(self):
+        lowers, uppers = zip(*[r.bounds() for r in self.regions])
+        return np.max(lowers, axis=0), np.min(uppers, axis=0)
+    # end bounds
+
+
+    def intersects_segments(self, starts, ends):
+        return _sampled_segment_test(self, starts, ends, self._segment_samples)
+    # end intersects_segments
+
+# end IntersectionRegion
+
+
+class DifferenceRegion(Region):
+    '''Represents the points of a region that are not in any other regions.
+
+    Segment tests sample each segment at a fixed number of points, so a
+    segment that only clips a thin part of the difference may be missed.
+    '''
+
+    def __init__(self, region, *subtracted, segment_samples=16):
+        self.region = region
+        self.subtracted = subtracted
+        self.ndim = region.ndim
+        self._segment_samples = segment_samples
+    # end __init__
+
+
+    def check_containment(self, pt):
+        return (pt in self.region) and not any(pt in r for r in self.subtracted)
+    # end check_containment
+
+
+    def contains_many(self, points):
+        inside = self.region.contains_many(points)
+        for r in self.subtracted:
+            inside &= ~r.contains_many(points)
+
+        return inside
+    # end contains_many
+
+
+    def sample(self):
+        return self.sample_many(1)[0]
+    # end sample
+
+
+    def sample_many(self, n):
+        return _rejection_sample(self, n)
+    # end sample_many
+
+
+    def bounds(self):
+        return self.region.bounds()
+    # end bounds
+
+
+    def intersects_segments(self, starts, ends):
+        return _sampled_segment_test(self, starts, ends, self._segment_samples)
+    # end intersects_segments
+
+# end DifferenceRegion
+
+
+def _rejection_sample(region, n, batch=1024, max_batches=10000):
+    '''Sample uniformly from a region by rejection from its bounding box.'''
+    lower, upper = region.bounds()
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    assert np.all(upper >= lower), 'the region is empty'
+
+    samples = []
+    count = 0
+    batches = 0
+    while count < n:
+        if batches == max_batches:
+            raise ValueError('failed to sample from the region, it may be empty')
+
+        candidates = (upper - lower) * np.random.sample((max(batch, n - count), len(lower))) + lower
+        accepted = candidates[region.contains_many(candidates)]
+        samples.append(accepted)
+        count += len(accepted)
+        batches += 1
+
+    return np.vstack(samples)[:n] if samples else np.empty((0, len(lower)))
+# end _rejection_sample
+
+
+def _sampled_segment_test(region, starts, ends, samples):
+    '''Approximate segment test by checking points along each segment.'''
+    starts = np.atleast_2d(starts)
+    direction = np.atleast_2d(ends) - starts
+
+    t = np.linspace(0.0, 1.0, samples + 1)
+    points = starts[:, np.newaxis] + t[:, np.newaxis] * direction[:, np.newaxis]
+    inside = region.contains_many(points.reshape((-1, starts.shape[1])))
+
+    return np.any(inside.reshape((starts.shape[0], -1)), axis=1)
+# end _sampled_segment_test
+
+
+class CaptureRadius:
+    '''A capture predicate: the pursuer is within radius of the evader.
+
+    If half_angle is given, the pursuer must also be pointing at the evader:
+    the angle between its heading (the state of its vertex) and the direction
+    to the evader must be less than half_angle. This is the analog of Isaacs'
+    'Usable Part' for actors that only move forward, like a Dubins car.
+
+    Unlike a lambda, instances can be pickled, e.g. to run solvers in worker
+    processes.
+    '''
+
+    def __init__(self, radius, half_angle=None):
+        assert radius > 0
+        assert half_angle is None or half_angle > 0
+
+        self.radius = radius
+        self.half_angle = half_angle
+    # end __init__
+
+
+    def __call__(self, v_p, v_e):
+        diff = v_e.loc[:2] - v_p.loc[:2]
+        if np.linalg.norm(v_e.loc - v_p.loc) >= self.radius:
+            return False
+
+        if self.half_angle is None:
+            return True
+
+        angle = np.arctan2(diff[1], diff[0]) - v_p.state
+        return np.abs((angle + np.pi) % (2 * np.pi) - np.pi) < self.half_angle
+    # end __call__
+
+# end CaptureRadius
+
+
 class Vertex:
     '''Represents a location along all possible trajectories of an Actor.
 
@@ -161,9 +714,27 @@ class Vertex:
 
     Parent-child relationships are not available from this data structure. This
     structure just aggregates data at a particular state.
+
+    The axis-aligned bounding box of the trajectory (and the location of the
+    vertex) is computed when the vertex is created and whenever the trajectory
+    is replaced with update.
+
+    The trajectory can be spilled to a TrajectoryStore (see rufus.storage), in
+    which case it is read back from the store whenever it is accessed.
     '''
 
-    def __init__(self, loc, state, trajectory):
+    # the number of time steps from the parent vertex to this vertex, if the
+    # stored trajectory does not hold one sample per time step
+    cost = None
+
+    # (lower, upper) bounding box of the trajectory from the parent vertex
+    bounds = None
+
+    # the TrajectoryStore and key of a spilled trajectory
+    _store = None
+    _key = None
+
+    def __init__(self, loc, state, trajectory, cost=None, bounds=None):
         # the location of the actor at this vertex 
         self.loc = loc
 
@@ -172,11 +743,103 @@ class Vertex:
 
         # the trajectory from the parent vertex to this vertex
         self.trajectory = trajectory
+
+        self.cost = cost
+
+        # a known bounding box saves reading the trajectory, e.g. when it is
+        # memory-mapped from disk
+        if bounds is None:
+            self._update_bounds()
+        else:
+            self.bounds = bounds
      # end __init__
 
 
+    @property
+    def trajectory(self):
+        if self._store is not None:
+            return self._store.get(self._key)
+
+        return self._trajectory
+    # end trajectory
+
+
+    @trajectory.setter
+    def trajectory(self, trajectory):
+        self._release()
+        self._trajectory = trajectory
+    # end trajectory
+
+
+    def spill(self, store):
+        '''Move the trajectory out of memory and into a TrajectoryStore.'''
+        if self._store is store or self._trajectory is None:
+            return
+
+        trajectory = self.trajectory
+        self._release()
+        self._key = store.put(trajectory)
+        self._store = store
+        self._trajectory = None
+    # end spill
+
+
+    def _release(self):
+        '''Drop the reference to a spilled trajectory.'''
+        if self._store is not None:
+            self._store.discard(self._key)
+            self._store = None
+            self._key = None
+    # end _release
+
+
+    def __getstate__(self):
+        # a pickled vertex carries its trajectory, not the store
+        state = self.__dict__.copy()
+        if self._store is not None:
+            state['_trajectory'] = self.trajectory
+            state.pop('_store', None)
+            state.pop('_key', None)
+
+        return state
+    # end __getstate__
+
+
+    def __setstate__(self, state):
+        # vertices pickled before trajectories could be spilled
+        if 'trajectory' in state:
+            state['_trajectory'] = state.pop('trajectory')
+
+        self.__dict__.update(state)
+    # end __setstate__
+
+
+    def update(self, state, trajectory, cost=None):
+        '''Replace the trajectory that leads to this vertex.
+
+        Arguments:
+            state:      the state of the actor at this vertex
+            trajectory: the (possibly decimated) trajectory from the new parent
+            cost:       the number of time steps in the full trajectory. If
+                        None, len(trajectory) is used.
+        '''
+        self.state = state
+        self.trajectory = trajectory
+        self.cost = cost
+        self._update_bounds()
+    # end update
+
+
+    def _update_bounds(self):
+        if self.trajectory is None:
+            self.bounds = None
+        else:
+            self.bounds = trajectory_bounds(self.trajectory, self.loc)
+    # end _update_bounds
+
+
     def time(self):
-        return len(self.trajectory)
+        return len(self.trajectory) if self.cost is None else self.cost
     # end time
 
 # end Vertex
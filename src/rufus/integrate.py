@@ -0,0 +1,66 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module contains batched, fixed-step integrators for ordinary differential
+equations.
+
+The integrators advance many independent initial value problems at once. The
+dynamics must be vectorized over the batch:
+
+    f(x, u) -> xdot
+
+where x has shape (batch, dim), u has shape (batch, m), and xdot has shape
+(batch, dim).
+'''
+
+# Standard Imports
+
+# External Imports
+import numpy as np
+
+# Local Imports
+
+
+def rk4(f, x0, u, dt):
+    '''Integrate a batch of ODEs with the classic fourth-order Runge-Kutta method.
+
+    The control is held constant over each step.
+
+    Arguments:
+        f:      the vectorized dynamics, f(x, u) -> xdot
+        x0:     the initial states, shape (batch, dim)
+        u:      the controls applied at each step, shape (batch, steps, m).
+                Autonomous systems may use m = 0.
+        dt:     the step size
+
+    Returns:
+        np.ndarray of shape (batch, steps + 1, dim). Element [:, k] is the state
+        after k steps, so element [:, 0] is x0.
+    '''
+    x0 = np.atleast_2d(np.asarray(x0, dtype=float))
+    u = np.asarray(u, dtype=float)
+    assert u.ndim == 3 and u.shape[0] == x0.shape[0]
+
+    steps = u.shape[1]
+    x = np.empty((x0.shape[0], steps + 1, x0.shape[1]))
+    x[:, 0] = x0
+
+    half = dt / 2.0
+    for k in range(steps):
+        xk = x[:, k]
+        uk = u[:, k]
+
+        k1 = f(xk, uk)
+        k2 = f(xk + half * k1, uk)
+        k3 = f(xk + half * k2, uk)
+        k4 = f(xk + dt * k3, uk)
+
+        x[:, k + 1] = xk + (dt / 6.0) * (k1 + 2 * k2 + 2 * k3 + k4)
+
+    return x
+# end rk4
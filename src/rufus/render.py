@@ -0,0 +1,216 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module renders figures of saved game solutions without a display.
+
+Each figure is drawn on its own matplotlib Figure with the Agg canvas, so no
+pyplot state is shared and many solutions can be rendered in parallel:
+
+    python -m rufus.render -o figures -j 8 --format png svg runs/*.soln.pkl
+
+Solutions may be pickled GameSolution objects or saved with
+rufus.storage.save_solution.
+'''
+
+# Standard Imports
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import pickle
+import sys
+
+# External Imports
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Local Imports
+from rufus.storage import load_solution
+from rufus import visualization
+
+
+def load(path):
+    '''Load a pickled or saved GameSolution.'''
+    if os.path.isdir(path) or path.endswith('.npz'):
+        return load_solution(path)
+
+    with open(path, 'rb') as fid:
+        return pickle.load(fid)
+# end load
+
+
+def output_name(path):
+    '''The name of the figure of a solution file, without an extension.'''
+    name = os.path.basename(os.path.normpath(path))
+    for ext in ('.pkl', '.npz'):
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+
+    return name
+# end output_name
+
+
+def draw(soln, fig, samples=None, lod=1.0, density=False, targets=()):
+    '''Draw a solution on a figure.
+
+    Arguments:
+        soln:       the GameSolution
+        fig:        the matplotlib Figure
+        samples:    the number of pursuer branches to draw. If None, all are
+                    drawn
+        lod:        the level-of-detail tolerance in pixels, see
+                    visualization.plot_tree. None disables it.
+        density:    if True, draw the evader tree as a density raster. For 3D
+                    solutions, only the evader tree is drawn.
+        targets:    a list of BoxRegion to draw
+
+    Returns:
+        the axes
+    '''
+    g_e = soln.evader_tree()
+    ndim = g_e[g_e.root].data.loc.shape[0]
+
+    # a density raster is a 2D projection, so 3D overlays cannot be drawn on it
+    overlay = ndim == 2 or not density
+    if ndim == 3 and overlay:
+        ax = fig.add_subplot(projection='3d')
+    else:
+        ax = fig.add_subplot()
+
+    if density:
+        visualization.plot_density(g_e, ax=ax, cmap='Blues')
+    else:
+        visualization.plot_tree(g_e, ax=ax, lod=lod, c='b', alpha=0.5, s=1)
+
+    if not overlay:
+        ax.set_title('max time %g' % soln.max_time())
+        return ax
+
+    visualization.plot_tree(soln.pursuer_tree(), samples=samples, ax=ax, lod=lod, c='r', alpha=0.5, s=1)
+
+    path, trajectory = soln.max_time_trajectory()
+    visualization.plot_trajectory(path, trajectory, ax=ax, color='k')
+
+    for target in targets:
+        visualization.plot_region(target, ax=ax, color='g')
+
+    ax.set_title('max time %g' % soln.max_time())
+    return ax
+# end draw
+
+
+def render(path, output_dir, formats=('png',), dpi=100, size=(8.0, 8.0), **kwargs):
+    '''Render the figure of one solution file.
+
+    Arguments:
+        path:       the solution file
+        output_dir: the directory to write the figures to
+        formats:    the file formats to write, e.g. ('png', 'svg')
+        dpi:        the resolution of raster formats
+        size:       the figure size in inches
+        **kwargs:   keyword arguments to be passed to draw
+
+    Returns:
+        list of the written files
+    '''
+    soln = load(path)
+
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    draw(soln, fig, **kwargs)
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for fmt in formats:
+        filename = os.path.join(output_dir, '%s.%s' % (output_name(path), fmt))
+        fig.savefig(filename, dpi=dpi)
+        written.append(filename)
+
+    return written
+# end render
+
+
+def _render_or_error(args):
+    '''Render a solution in a worker, returning errors instead of raising.'''
+    path, output_dir, kwargs = args
+    try:
+        return path, render(path, output_dir, **kwargs), None
+    except Exception as e:
+        return path, [], '%s: %s' % (type(e).__name__, e)
+# end _render_or_error
+
+
+def _init_worker():
+    matplotlib.use('Agg')
+# end _init_worker
+
+
+def render_many(paths, output_dir, workers=None, **kwargs):
+    '''Render the figures of many solution files in parallel.
+
+    Arguments:
+        paths:      the solution files
+        output_dir: the directory to write the figures to
+        workers:    the number of worker processes. If None, one per CPU. If
+                    1, the figures are rendered in this process.
+        **kwargs:   keyword arguments to be passed to render
+
+    Returns:
+        list of (path, written files, error), in the order of paths. error is
+        None if the figure was rendered.
+    '''
+    jobs = [(path, output_dir, kwargs) for path in paths]
+    if workers == 1:
+        return list(map(_render_or_error, jobs))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(_render_or_error, jobs))
+# end render_many
+
+
+def main(argv=None):
+    '''Command line entry point.'''
+    parser = argparse.ArgumentParser(description='Render figures of saved game solutions.')
+    parser.add_argument('solutions', nargs='+', help='pickled or saved solution files')
+    parser.add_argument('-o', '--output-dir', default='.', help='the directory to write the figures to')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='the number of worker processes')
+    parser.add_argument('--format', nargs='+', default=['png'], help='the file formats to write')
+    parser.add_argument('--dpi', type=int, default=100, help='the resolution of raster formats')
+    parser.add_argument('--size', type=float, nargs=2, default=[8.0, 8.0], help='the figure size in inches')
+    parser.add_argument('--samples', type=int, default=None, help='the number of pursuer branches to draw')
+    parser.add_argument('--lod', type=float, default=1.0, help='the level-of-detail tolerance in pixels')
+    parser.add_argument('--density', action='store_true', help='draw the evader tree as a density raster')
+    args = parser.parse_args(argv)
+
+    matplotlib.use('Agg')
+    results = render_many(
+            args.solutions,
+            args.output_dir,
+            workers=args.jobs,
+            formats=args.format,
+            dpi=args.dpi,
+            size=tuple(args.size),
+            samples=args.samples,
+            lod=args.lod if args.lod > 0 else None,
+            density=args.density
+    )
+
+    failed = 0
+    for path, written, error in results:
+        if error is None:
+            print('%s -> %s' % (path, ', '.join(written)))
+        else:
+            failed += 1
+            print('%s failed: %s' % (path, error), file=sys.stderr)
+
+    return 1 if failed else 0
+# end main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,52 +7,220 @@ EN.605.714, Spring 2019
 ------------------------------------------------------------------------------
 
 This module contains the logic to solve differential games.
+
+Games are solved analytically with the method of characteristics [Isaacs, 4]:
+the Retrograde Path Equations (RPEs) are derived symbolically, their initial
+conditions are found on a sampled terminal surface, and all retrograde paths
+are integrated together as one batched system of ODEs.
+
+For example, the time for a point of speed w to reach the circle of radius r:
+
+    x, y, phi = sympy.symbols('x y phi')
+    game = Game('simple', [x, y], [w * sympy.cos(phi), w * sympy.sin(phi)])
+
+    # the control that minimizes the Hamiltonian, given the value gradient
+    v1, v2 = game.value_gradient
+    game.controls = {phi: sympy.atan2(-v2, -v1)}
+
+    s = sympy.Symbol('s')
+    terminal = TerminalSurface([s], [r * sympy.cos(s), r * sympy.sin(s)], [0], [2 * np.pi])
+
+    paths = solve(game, Payoff(G=1), terminal, samples=64, duration=10.0)
 '''
 
 # Standard Imports
 
 # Third Party Imports
-import sympy
+import numpy as np
 
 # Local Imports
-from rufus.game import *
+from rufus import codegen
+from rufus._lazy import lazy_import
+from rufus.integrate import rk4
+
+# only imported when a game is defined or solved
+sympy = lazy_import('sympy')
+
+
+class Game:
+    '''The symbolic kinematics of a differential game.
+
+    The kinematic equations give xdot = f(x, phi, psi) in terms of the state
+    symbols and the control symbols of both players. Before a game can be
+    solved, controls must map each control symbol to its optimal value (the
+    control that achieves the min-max of the Hamiltonian), in terms of the
+    state and the value_gradient symbols.
+    '''
+
+    def __init__(self, name, state, kinematic_equations, controls=None):
+        '''Constructor.
+
+        Arguments:
+            name:                   the name of the game, used to name symbols
+            state:                  the sympy symbols of the state, x_1..x_n
+            kinematic_equations:    the sympy expressions of xdot_1..xdot_n
+            controls:               a dict mapping each control symbol to the
+                                    expression of its optimal value
+        '''
+        assert len(state) == len(kinematic_equations)
+
+        self.name = name
+        self.state = list(state)
+        self.kinematic_equations = list(kinematic_equations)
+        self.controls = {} if controls is None else dict(controls)
+
+        # V_k, the partial derivatives of the value with respect to x_k
+        self.value_gradient = sympy.symarray(name + '_vdot', len(state))
+    # end __init__
+
+
+    def cardinality(self):
+        '''The dimension of the game space.'''
+        return len(self.state)
+    # end cardinality
+
+# end Game
+
+
+class Payoff:
+    '''The payoff of a game, the integral of G along the path plus H at its end.
+
+    G is an expression in the state symbols, H an expression in the state
+    symbols that is evaluated on the terminal surface.
+    '''
+
+    def __init__(self, G=0, H=0):
+        self.G = sympy.sympify(G)
+        self.H = sympy.sympify(H)
+    # end __init__
+
+# end Payoff
+
+
+class TerminalSurface:
+    '''A terminal surface, parameterized by n - 1 parameters.
+
+    The surface is x = h(s) for s in the box [lower, upper].
+    '''
+
+    def __init__(self, parameters, state, lower, upper, normal=None):
+        '''Constructor.
+
+        Arguments:
+            parameters: the sympy symbols s_1..s_{n-1}
+            state:      the sympy expressions of h_1(s)..h_n(s)
+            lower:      the lower bound of each parameter
+            upper:      the upper bound of each parameter
+            normal:     an optional expression in s of a vector normal to the
+                        surface, pointing into the playing space. It is the
+                        initial guess of the direction of the value gradient.
+                        If None, a normal of arbitrary sign is used.
+        '''
+        assert len(parameters) == len(state) - 1
+        assert len(lower) == len(upper) == len(parameters)
+        assert normal is None or len(normal) == len(state)
+
+        self.parameters = list(parameters)
+        self.state = [sympy.sympify(h) for h in state]
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.normal = None if normal is None else [sympy.sympify(v) for v in normal]
+    # end __init__
+
+
+    def sample(self, n):
+        '''Sample parameters on a regular grid over [lower, upper].
+
+        Arguments:
+            n:  the approximate number of samples. Each parameter is given
+                ceil(n ** (1 / (number of parameters))) values.
+
+        Returns:
+            np.ndarray of shape (m, number of parameters)
+        '''
+        k = len(self.parameters)
+        if k == 0:
+            return np.zeros((1, 0))
+
+        per_axis = int(np.ceil(n ** (1.0 / k) - 1e-9))
+        axes = [np.linspace(lo, hi, per_axis) for lo, hi in zip(self.lower, self.upper)]
+        return np.stack([a.ravel() for a in np.meshgrid(*axes, indexing='ij')], axis=1)
+    # end sample
+
+# end TerminalSurface
+
+
+class RetrogradePaths:
+    '''A batch of optimal paths, integrated backwards from the terminal surface.
+
+    Element [i, j] of states, gradients and values is the state, the value
+    gradient and the value of path i at retrograde time time[j], i.e. time[j]
+    before the path reaches the terminal surface.
+    '''
+
+    def __init__(self, parameters, time, states, gradients, values):
+        '''Constructor.
+
+        Arguments:
+            parameters: the terminal surface parameters of each path, (m, n - 1)
+            time:       the retrograde time of each step, (steps + 1,)
+            states:     the states, (m, steps + 1, n)
+            gradients:  the value gradients, (m, steps + 1, n)
+            values:     the values, (m, steps + 1)
+        '''
+        self.parameters = parameters
+        self.time = time
+        self.states = states
+        self.gradients = gradients
+        self.values = values
+    # end __init__
+
+
+    def __len__(self):
+        return self.states.shape[0]
+    # end __len__
+
+# end RetrogradePaths
 
 
 def _compute_value_rpe(game, payoff):
     '''Compute the RPE of the value function (Vdot_k).
 
     The RPEs needed to solve the differential game consist of two sets:
-        (1) the RPE of each component of the n-dimensional value function 
+        (1) the RPE of each component of the n-dimensional value function
             (where n = game.cardinality())
-        (2) the RPE of each componenet of the n-dimensional game space 
+        (2) the RPE of each componenet of the n-dimensional game space
             (where n = game.cardinality())
 
     This function computes (1) [Isaacs, Eqn 4.5.3]
 
+    The controls are held fixed while differentiating; by the envelope
+    theorem, the optimal controls may be substituted afterwards.
+
     Arguments:
         game:       the game to process
         payoff:     the payoff
 
     Returns:
         (symbols, rpe)
-        
-        symbols is a list of sympy symbols representing the components of the 
+
+        symbols is a list of sympy symbols representing the components of the
         Value RPE (i.e. Vdot_i)
 
         rpe is a list of sympy expressions representing the components of the
         Value RPE
     '''
-    vdot_x = sympy.symarray(game.name + '_vdot', game.cardinality())
+    vdot_x = game.value_gradient
     rpes = []
 
-    # [Isaacs, 4.6.2], 
+    # [Isaacs, 4.6.2],
     for k in range(game.cardinality()):
         eq = []
-        for v, ke in zip(vdot_x, game.kinematic_eqns): 
+        for v, ke in zip(vdot_x, game.kinematic_equations):
             # V_i * f_ik
             eq.append(v * sympy.diff(ke, game.state[k]))
 
-        rpes.append(sum(eq) + diff(payoff.G, game.state[k]))
+        rpes.append(sum(eq) + sympy.diff(payoff.G, game.state[k]))
 
     return vdot_x, rpes
 # end _compute_value_rpe
@@ -62,9 +230,9 @@ def _compute_state_rpe(game):
     '''Compute the RPE of the state variables (xdot_k)
 
     The RPEs needed to solve the differential game consist of two sets:
-        (1) the RPE of each component of the n-dimensional value function 
+        (1) the RPE of each component of the n-dimensional value function
             (where n = game.cardinality())
-        (2) the RPE of each componenet of the n-dimensional game space 
+        (2) the RPE of each componenet of the n-dimensional game space
             (where n = game.cardinality())
 
     Note that (2) is simply the negative of the kinematic equations.
@@ -76,7 +244,7 @@ def _compute_state_rpe(game):
 
     Returns:
         rpe
-        
+
         rpe is a list of sympy expressions representing the components of the
         state RPE
     '''
@@ -84,9 +252,139 @@ def _compute_state_rpe(game):
 # end _compute_state_rpe
 
 
-def solve(game, payoff, terminal):
+def _derive(game, payoff, terminal):
+    '''Derive the expressions of every function that solve evaluates.
+
+    All functions take a batch of arguments, see rufus.codegen:
+
+        surface(s)              x = h(s)
+        tangents(s)             dh_i/ds_j, flattened with j major
+        terminal_gradient(s)    dH/ds_j
+        terminal_value(s)       H(h(s))
+        normal(s)               the surface normal, if terminal.normal is given
+        main(x, V)              the main equation and its derivatives by V_i
+        rpe(x, V)               the RPEs of the state and the value gradient,
+                                and the rate of change of the value
+
+    Returns:
+        dict mapping the name of each function to (args, exprs)
+    '''
+    params = terminal.parameters
+    on_surface = dict(zip(game.state, terminal.state))
+    terminal_payoff = payoff.H.subs(on_surface)
+
+    # (1) Compute RPEs
+    vdot_k, value_rpes = _compute_value_rpe(game, payoff)
+    state_rpes = _compute_state_rpe(game)
+
+    V = list(vdot_k)
+    main = sum(v * ke for v, ke in zip(V, game.kinematic_equations)) + payoff.G
+    main = main.subs(game.controls)
+    args = list(game.state) + V
+
+    # the value grows by G in retrograde time, because of the main equation
+    rpes = [e.subs(game.controls) for e in state_rpes + value_rpes + [payoff.G]]
+
+    functions = {
+        'surface': (params, terminal.state),
+        'tangents': (params, [sympy.diff(h, p) for p in params for h in terminal.state]),
+        'terminal_gradient': (params, [sympy.diff(terminal_payoff, p) for p in params]),
+        'terminal_value': (params, [terminal_payoff]),
+        'main': (args, [main] + [sympy.diff(main, v) for v in V]),
+        'rpe': (args, rpes)
+    }
+
+    if terminal.normal is not None:
+        functions['normal'] = (params, terminal.normal)
+
+    return functions
+# end _derive
+
+
+def compile_game(game, payoff, terminal, cache=True, directory=None):
+    '''Generate the NumPy evaluators of a game, see _derive.
+
+    Arguments:
+        game:       the Game
+        payoff:     the Payoff
+        terminal:   the TerminalSurface
+        cache:      if True, the generated module is cached on disk, keyed by
+                    the definition of the game, so the symbolic work is only
+                    done once
+        directory:  the cache directory. If None, the default rufus cache
+                    directory is used.
+
+    Returns:
+        the generated module
+    '''
+    if not cache:
+        return codegen.load_module(codegen.generate(_derive(game, payoff, terminal)))
+
+    key = codegen.digest(
+            game.name,
+            game.state,
+            game.kinematic_equations,
+            sorted(game.controls.items(), key=lambda item: str(item[0])),
+            payoff.G,
+            payoff.H,
+            terminal.parameters,
+            terminal.state,
+            terminal.normal
+    )
+    return codegen.load_or_generate(key, lambda: _derive(game, payoff, terminal), directory)
+# end compile_game
+
+
+def _initial_conditions(compiled, s, n, tolerance=1e-10, max_iters=50):
+    '''Find the state, value gradient and value at sampled terminal points.
+
+    The value gradient V must satisfy, at each point x = h(s):
+
+        (1) sum_i V_i dh_i/ds_j = dH/ds_j, for each parameter s_j
+        (2) sum_i V_i f_i(x, optimal controls) + G = 0, the main equation
+
+    [Isaacs, 4.4]. (1) is linear in V, (2) usually is not, so all points are
+    solved together with Newton's method, one batched linear system per
+    iteration, starting from the solution of (1) plus the surface normal.
+
+    Returns:
+        (s, x, V, value) of the points where Newton's method converged
+    '''
+    x = compiled.surface(s)
+    T = compiled.tangents(s).reshape((len(s), s.shape[1], n))
+    dH = compiled.terminal_gradient(s)
+    value = compiled.terminal_value(s)[:, 0]
+
+    # the initial guess: the least-squares solution of (1) plus the normal
+    if hasattr(compiled, 'normal'):
+        normal = compiled.normal(s)
+    else:
+        normal = np.linalg.svd(np.concatenate([T, np.zeros((len(s), 1, n))], axis=1))[2][:, -1]
+
+    normal /= np.linalg.norm(normal, axis=1, keepdims=True)
+    grad = (np.linalg.pinv(T) @ dH[:, :, np.newaxis])[:, :, 0] + normal
+
+    converged = np.zeros(len(s), dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iters):
+            r = compiled.main(np.concatenate([x, grad], axis=1))
+            F = np.concatenate([np.einsum('bjn,bn->bj', T, grad) - dH, r[:, :1]], axis=1)
+            J = np.concatenate([T, r[:, np.newaxis, 1:]], axis=1)
+
+            converged = np.all(np.abs(F) <= tolerance, axis=1)
+            if np.all(converged | ~np.isfinite(F).all(axis=1)):
+                break
+
+            step = (np.linalg.pinv(J) @ F[:, :, np.newaxis])[:, :, 0]
+            grad = np.where(converged[:, np.newaxis], grad, grad - step)
+
+    return s[converged], x[converged], grad[converged], value[converged]
+# end _initial_conditions
+
+
+def solve(game, payoff, terminal, samples=64, duration=1.0, dt=0.01, cache=True, directory=None):
     '''Solve the differential game.
-   
+
     Solving the differential games consists of the following steps:
         (1) Computing the Retrograde Path Equations (RPEs)
         (2) Determining initial conditions for the RPEs based on the terminal
@@ -94,13 +392,37 @@ def solve(game, payoff, terminal):
         (3) Solving the set of differential equations
 
     See [Isaacs, 4] for details, and [Jensen, 3.1] for an example.
+
+    Arguments:
+        game:       the Game. Its controls must be set
+        payoff:     the Payoff
+        terminal:   the TerminalSurface
+        samples:    the approximate number of paths, see TerminalSurface.sample
+        duration:   the retrograde time to integrate each path for
+        dt:         the integration step
+        cache:      if True, the generated code is cached, see compile_game
+        directory:  the cache directory
+
+    Returns:
+        RetrogradePaths. Samples of the terminal surface where no initial
+        condition was found are omitted.
     '''
-    # (1) Compute RPEs
-    vdot_k, value_rpes = _compute_value_rpe(game, payoff)
-    state_rpes = _compute_state_rpe(game)
+    assert duration > 0 and dt > 0
+
+    # (1) Compute RPEs, as generated code
+    compiled = compile_game(game, payoff, terminal, cache, directory)
+    n = game.cardinality()
 
     # (2) Compute Initial Conditions
-    
+    s, x0, grad0, value0 = _initial_conditions(compiled, terminal.sample(samples), n)
 
-# end solve
+    # (3) Integrate all paths at once. The value does not feed back into the
+    # RPEs
+    f = lambda y, u: compiled.rpe(y[:, :2 * n])
+
+    steps = int(np.ceil(duration / dt - 1e-9))
+    y0 = np.concatenate([x0, grad0, value0[:, np.newaxis]], axis=1)
+    y = rk4(f, y0, np.zeros((len(y0), steps, 0)), dt)
 
+    return RetrogradePaths(s, dt * np.arange(steps + 1), y[:, :, :n], y[:, :, n:2 * n], y[:, :, -1])
+# end solve
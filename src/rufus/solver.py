@@ -10,6 +10,7 @@ This module contains the implementation of the solver for the differential game
 '''
 
 # Standard Imports
+import weakref
 
 # Third-Party Imports
 import numpy as np
@@ -18,12 +19,112 @@ from treelib.tree import Tree
 # Local Imports
 from rufus.analysis import GameSolution
 from rufus.game import Actor, Region, Vertex
+from rufus.trajectory import decimate
 import rufus.tree as t
 
 
+# pruning removes this fraction of a tree's budget at once, so that it runs
+# once every so many iterations rather than in every iteration
+PRUNE_SLACK = 0.1
+
+
+class Phase:
+    '''One phase of a multi-resolution solve schedule.
+
+    A schedule is a list of phases that are run in order by Solver.solve. A
+    typical coarse-to-fine schedule explores the game space quickly with a
+    coarse time increment and heuristic costs, then refines the most valuable
+    evader branches at a fine time increment with exact costs:
+
+        schedule = [
+            Phase(2000, dt=1.0, exact=False),
+            Phase(500, dt=0.1, refine=20, targets=[target])
+        ]
+    '''
+
+    def __init__(self, iters, dt=None, gamma=None, exact=True, refine=0, targets=None):
+        '''Constructor.
+
+        Arguments:
+            iters:      the number of iterations in this phase
+            dt:         the time increment of both actors during this phase. If
+                        None, the time increment of the previous phase is kept
+            gamma:      the scaling constant during this phase. If None, the
+                        solver's gamma is used
+            exact:      if False, candidate parents and rewirings are ranked by
+                        the actors' time heuristic and only the most promising
+                        ones are steered
+            refine:     the number of longest-surviving evader branches to
+                        re-steer at the start of this phase
+            targets:    a list of Region. Evader branches that reach any of the
+                        targets are re-steered at the start of this phase
+        '''
+        assert iters >= 0
+        assert dt is None or dt > 0
+        assert refine >= 0
+
+        self.iters = iters
+        self.dt = dt
+        self.gamma = gamma
+        self.exact = exact
+        self.refine = refine
+        self.targets = [] if targets is None else list(targets)
+    # end __init__
+
+# end Phase
+
+
+class ChangeLog:
+    '''The vertices whose edges changed since the log was last read.
+
+    See Solver.track_changes.
+    '''
+
+    def __init__(self):
+        '''Constructor.'''
+        self._changed = (set(), set())
+        self._reset = True
+    # end __init__
+
+
+    def pop(self):
+        '''Get the changes since the last call, and clear them.
+
+        Returns:
+            None if a solve has started since the last call, in which case every
+            vertex must be considered changed. Otherwise, a pair of sets
+            (evader, pursuer) of the identifiers of the vertices that were
+            added, whose edges were re-steered, or that were removed.
+        '''
+        changed = self._changed
+        self._changed = (set(), set())
+        if self._reset:
+            self._reset = False
+            return None
+
+        return changed
+    # end pop
+
+
+    def _add(self, k, identifiers):
+        '''Record changes to the evader (k = 0) or pursuer (k = 1) tree.'''
+        self._changed[k].update(identifiers)
+    # end _add
+
+
+    def _restart(self):
+        '''Forget the changes when a new solve starts.'''
+        self._changed = (set(), set())
+        self._reset = True
+    # end _restart
+
+# end ChangeLog
+
+
 class Solver:
 
-    def __init__(self, dt, space, pursuer, evader, check_capture, gamma=1.0):
+    def __init__(self, dt, space, pursuer, evader, check_capture, gamma=1.0, stride=1, tolerance=None,
+            store=None, max_nodes=None, stale_after=None, prune_radius=None, prune_tolerance=0.0):
         '''Constructor.
 
         Arguments:
@@ -34,29 +135,234 @@ class Solver:
             check_capture:  a predicate that checks if a pair of vertices
                             (v_p, v_e) are members of the capture set
             gamma:          scaling constant, as described in Karaman et al.
+            stride:         only every stride-th sample of each committed
+                            trajectory is stored
+            tolerance:      if not None, committed trajectories are further
+                            simplified so that no dropped sample is farther
+                            than tolerance from the stored polyline
+            store:          an optional TrajectoryStore. If given, committed
+                            trajectories are spilled to it, so that only the
+                            store's budget of trajectory data stays in memory
+                            alongside the tree topology, locations and costs
+            max_nodes:      an optional node budget, either one number for both
+                            trees or (evader, pursuer). When a tree exceeds
+                            its budget, leaves that cannot matter are pruned
+                            until it is back within PRUNE_SLACK of the budget.
+                            See _prune.
+            stale_after:    leaves that have not been chosen as a parent for
+                            this many iterations may be pruned. If None, leaves
+                            are never pruned for being stale
+            prune_radius:   evader leaves are dominated by vertices within
+                            this distance. If None, the radius of the near
+                            vertices used for rewiring is used
+            prune_tolerance: evader leaves are only dominated by vertices
+                            whose states differ from theirs by at most this
+                            much in every component
+
+        Note:
+            stride and tolerance only affect how trajectories are stored. Costs
+            are always computed from the full trajectories returned by the
+            Actors.
         '''
+        assert stride >= 1
+        assert tolerance is None or tolerance >= 0
+        assert prune_tolerance >= 0
+
         self._dt = dt
         self._space = space
         self._pursuer = pursuer
         self._evader = evader
         self._check_capture = check_capture
         self._gamma = gamma
+        self._stride = stride
+        self._tolerance = tolerance
+        self._trajectory_store = store
+        self._stale_after = stale_after
+        self._prune_radius = prune_radius
+        self._prune_tolerance = prune_tolerance
+
+        if max_nodes is None or np.isscalar(max_nodes):
+            max_nodes = (max_nodes, max_nodes)
+        assert all(n is None or n >= 1 for n in max_nodes)
+        self._max_nodes = tuple(max_nodes)
+
+        # the state of the current solve, see solution()
+        self._g_e = None
+        self._g_p = None
+        self._costs_e = None
+        self._costs_p = None
+        self._solution = None
+        self._changed = False
+
+        # the nodes of a shared pursuer tree, in order of cost-to-come, and
+        # their costs. See solve
+        self._fixed_nodes = None
+        self._fixed_costs = None
+
+        # the last iteration in which each vertex was chosen as a parent
+        self._iteration = 0
+        self._usage_e = {}
+        self._usage_p = {}
+
+        # the ChangeLogs of the current subscribers, see track_changes
+        self._subscribers = weakref.WeakSet()
     # end __init__
 
 
-    def extend(self, g, z, actor):
+    def __getstate__(self):
+        # change logs only follow the solver they were taken from
+        state = self.__dict__.copy()
+        del state['_subscribers']
+        return state
+    # end __getstate__
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._subscribers = weakref.WeakSet()
+    # end __setstate__
+
+
+    @property
+    def dt(self):
+        '''The time increment.'''
+        return self._dt
+    # end dt
+
+
+    @property
+    def space(self):
+        '''The GameSpace.'''
+        return self._space
+    # end space
+
+
+    def solution(self):
+        '''Get the solution of the current (or last) solve.
+
+        The solution can be inspected between iterations, e.g. from a progress
+        callback. Its spatial indexes are invalidated whenever the trees have
+        changed since the last call.
+
+        Returns:
+            GameSolution, or None if solve has not been called
+        '''
+        if self._g_e is None:
+            return None
+
+        if self._solution is None:
+            self._solution = GameSolution(self._g_e, self._g_p, self._costs_e)
+            self._changed = False
+        elif self._changed:
+            self._solution.invalidate()
+            self._changed = False
+
+        return self._solution
+    # end solution
+
+
+    def track_changes(self):
+        '''Start recording the vertices whose edges change.
+
+        Changes are only recorded while the returned log is referenced, so the
+        solver does no bookkeeping for them unless someone, e.g. a
+        visualization.LiveView, reads them.
+
+        Returns:
+            ChangeLog
+        '''
+        log = ChangeLog()
+        self._subscribers.add(log)
+        return log
+    # end track_changes
+
+
+    def _record(self, g, identifiers):
+        '''Record that the edges of identifiers in g changed, see track_changes.'''
+        if not self._subscribers:
+            return
+
+        if g is self._g_e:
+            k = 0
+        elif g is self._g_p:
+            k = 1
+        else:
+            return
+
+        for log in self._subscribers:
+            log._add(k, identifiers)
+    # end _record
+
+
+    def _store(self, trajectory):
+        '''Decimate a trajectory for storage in the tree.'''
+        return decimate(trajectory, self._stride, self._tolerance)
+    # end _store
+
+
+    def _spill(self, v):
+        '''Move the trajectory of Vertex v to the trajectory store, if any.'''
+        if self._trajectory_store is not None:
+            v.spill(self._trajectory_store)
+    # end _spill
+
+
+    def extend(self, g, z, actor, exact=True, gamma=None, costs=None):
+        '''Extend tree g towards z.
+
+        Arguments:
+            g:      the tree to extend
+            z:      the sampled location
+            actor:  the actor that g belongs to
+            exact:  if False, the cost through each nearby vertex is estimated
+                    from actor.time (scaled to match the steered trajectory from
+                    the nearest neighbor) and only vertices whose estimate
+                    improves on the best known cost are steered
+            gamma:  the scaling constant. If None, the solver's gamma is used
+            costs:  an optional CostToCome of g. If given, it is used to look
+                    up costs and is updated with the changes to g
+
+        Returns:
+            (vertex, time), the new vertex and its cost-to-come, or
+            (None, None) if the actor could not steer to z
+        '''
+        gamma = self._gamma if gamma is None else gamma
+        cost_to_come = (lambda v: t.time(g, v)) if costs is None else (lambda v: costs[v.identifier])
+
         v_nn = t.nearest_neighbor(g, z, actor.time)
         state, trajectory = actor.steer(v_nn.data.loc, z, v_nn.data.state)
 
         # TODO if obstacle free
-        nearby = t.near(g, z, actor.time, self._gamma)
+        nearby = t.near(g, z, actor.time, gamma)
 
-        v_min = v_nn
-        cost_min = t.time(g, v_min) + len(trajectory)
+        # actors may fail to steer, in which case the trajectory is None
+        if trajectory is None:
+            v_min = None
+            cost_min = np.inf
+        else:
+            v_min = v_nn
+            cost_min = cost_to_come(v_min) + len(trajectory)
 
-        for v in nearby:
+        # the factor that converts actor.time into time steps. Heuristic costs
+        # are only used if it can be calibrated against the nearest neighbor
+        scale = None
+        if not exact and trajectory is not None:
+            h = actor.time(v_nn.data.loc, z, v_nn.data.state)
+            scale = len(trajectory) / h if h > 0 else None
+
+        candidates = nearby
+        if scale is not None:
+            candidates = [
+                v for v in nearby
+                if cost_to_come(v) + scale * actor.time(v.data.loc, z, v.data.state) < cost_min
+            ]
+
+        for v in candidates:
             candidate_state, candidate_trajectory = actor.steer(v.data.loc, z, v.data.state)
-            cost = t.time(g, v) + len(candidate_trajectory)
+            if candidate_trajectory is None:
+                continue
+
+            cost = cost_to_come(v) + len(candidate_trajectory)
 
             if cost < cost_min: # TODO and obstacle free
                 v_min = v
@@ -64,58 +370,462 @@ class Solver:
                 state = candidate_state
                 cost_min = cost
 
-        v_new = g.create_node(parent=v_min, data=Vertex(z, state, trajectory))
-        t_v_new = t.time(g, v_new)
+        if v_min is None:
+            return None, None
+
+        v_new = g.create_node(
+                parent=v_min,
+                data=Vertex(z, state, self._store(trajectory), len(trajectory))
+        )
+        self._spill(v_new.data)
+        self._record(g, [v_new.identifier])
+        if costs is not None:
+            costs.insert(v_new.identifier, cost_min)
+        t_v_new = cost_to_come(v_new)
 
         for v in nearby:
             if v == v_min:
                 continue
 
+            if scale is not None:
+                estimate = t_v_new + scale * actor.time(v_new.data.loc, v.data.loc, v_new.data.state)
+                if cost_to_come(v) <= estimate:
+                    continue
+
             candidate_state, candidate_trajectory = actor.steer(v_new.data.loc, v.data.loc, v_new.data.state)
-            cost = t.time(g, v)
+            if candidate_trajectory is None:
+                continue
+
+            cost = cost_to_come(v)
             new_cost = t_v_new + len(candidate_trajectory)
-            if t.time(g, v) > new_cost: # TODO and obstacle free
-                v.data.trajectory = candidate_trajectory 
-                v.data.state = candidate_state
+            if cost_to_come(v) > new_cost: # TODO and obstacle free
+                v.data.update(candidate_state, self._store(candidate_trajectory), len(candidate_trajectory))
+                self._spill(v.data)
                 g.move_node(v.identifier, v_new.identifier)
+                self._record(g, [v.identifier])
+                if costs is not None:
+                    costs.update_subtree(g, v)
 
         return v_new, t_v_new
     # end extend
 
 
-    def solve(self, pursuer_init, evader_init, iters=1000, progress=None):
-        # initialization
+    def refine(self, g, nodes, actor):
+        '''Re-steer every edge on the paths from the root of g to nodes.
+
+        Edges are re-steered from the root outwards, so that each edge starts
+        from the refined state of its parent.
+
+        Arguments:
+            g:      the tree to refine
+            nodes:  the nodes at the end of the paths to refine
+            actor:  the actor to steer with
+
+        Returns:
+            list of the refined nodes
+        '''
+        on_path = {}
+        for n in nodes:
+            cur = n
+            while not cur.is_root() and cur.identifier not in on_path:
+                on_path[cur.identifier] = cur
+                cur = g.parent(cur.identifier)
+
+        refined = []
+        for n in sorted(on_path.values(), key=lambda n: g.depth(n)):
+            parent = g.parent(n.identifier)
+            state, trajectory = actor.steer(parent.data.loc, n.data.loc, parent.data.state)
+            if trajectory is None:
+                continue
+
+            n.data.update(state, self._store(trajectory), len(trajectory))
+            self._spill(n.data)
+            refined.append(n)
+
+        self._record(g, [n.identifier for n in refined])
+        return refined
+    # end refine
+
+
+    def grow(self, pursuer_init, iters=1000, progress=None, exact=True, gamma=None):
+        '''Grow a pursuer tree on its own.
+
+        The pursuer tree does not depend on the evader, so one tree can be
+        reused to solve the game from many evader starts, see solve.
+
+        Arguments:
+            pursuer_init:   the initial pursuer Vertex
+            iters:          the number of iterations
+            progress:       an optional callback, progress(iteration, iters)
+            exact:          see extend
+            gamma:          see extend
+
+        Returns:
+            the pursuer tree
+        '''
         g_p = Tree()
         g_p.create_node('origin', data=pursuer_init)
+        costs = t.CostToCome.from_tree(g_p)
+
+        for i in range(iters):
+            self.extend(g_p, self._space.sample(), self._pursuer, exact, gamma, costs)
+            if progress is not None:
+                progress(i, iters)
+
+        return g_p
+    # end grow
+
+
+    def solve(self, pursuer_init, evader_init, iters=1000, progress=None, schedule=None,
+            pursuer_tree=None):
+        '''Solve the game.
+
+        Arguments:
+            pursuer_init:   the initial pursuer Vertex. Ignored if pursuer_tree
+                            is given
+            evader_init:    the initial evader Vertex
+            iters:          the number of iterations. Ignored if schedule is
+                            given
+            progress:       an optional callback, progress(iteration, iters).
+                            See visualization.LiveView to watch the trees grow
+            schedule:       an optional list of Phase. If given, the phases are
+                            run in order, starting from the solver's dt
+            pursuer_tree:   an optional pursuer tree, e.g. from grow. If given,
+                            only the evader tree is grown, and each new
+                            evader vertex is checked for capture against the
+                            whole pursuer tree. The pursuer tree is not
+                            modified, so it can be shared between solves.
+
+        Returns:
+            GameSolution
+
+        Note:
+            When a phase changes the time increment, the costs of all
+            existing vertices are rescaled to the new time increment. Both
+            actors are assumed to share the solver's time increment.
+        '''
+        if schedule is None:
+            schedule = [Phase(iters)]
+
+        total = sum(phase.iters for phase in schedule)
+        fixed = pursuer_tree is not None
+        assert not fixed or all(phase.dt in (None, self._dt) for phase in schedule), \
+                'a shared pursuer tree cannot be rescaled'
+
+        # initialization
+        if fixed:
+            g_p = pursuer_tree
+        else:
+            g_p = Tree()
+            g_p.create_node('origin', data=pursuer_init)
 
         g_e = Tree()
         g_e.create_node('origin', data=evader_init)
 
+        self._g_e = g_e
+        self._g_p = g_p
+        self._costs_e = t.CostToCome.from_tree(g_e)
+        self._costs_p = t.CostToCome.from_tree(g_p)
+        self._solution = None
+        self._iteration = 0
+        self._usage_e = {}
+        self._usage_p = {}
+        for log in self._subscribers:
+            log._restart()
+
+        # a shared tree does not change, so only the pursuer vertices that are
+        # fast enough to capture an evader vertex need to be checked
+        self._fixed_nodes = self._fixed_costs = None
+        if fixed:
+            nodes = list(g_p.all_nodes_itr())
+            costs = np.array([self._costs_p[n.identifier] for n in nodes])
+            order = np.argsort(costs, kind='stable')
+            self._fixed_nodes = [nodes[i] for i in order]
+            self._fixed_costs = costs[order]
+
         if progress is not None:
-            progress(0, iters)
+            progress(0, total)
 
-        for i in range(iters):
-            z_e_rand = self._space.sample()
-            v_e_new, t_v_e_new = self.extend(g_e, z_e_rand, self._evader)
-
-            if v_e_new is not None:
-                for v_p in t.near_capture(g_p, v_e_new, self._check_capture, self._pursuer.time, False, self._gamma):
-                    if t.time(g_p, v_p) <= t_v_e_new:
-                        t.remove(g_e, v_e_new)
-                        break
-
-            z_p_rand = self._space.sample()
-            v_p_new, t_v_p_new = self.extend(g_p, z_p_rand, self._pursuer)
-            if v_p_new is not None:
-                for v_e in t.near_capture(g_e, v_p_new, self._check_capture, self._pursuer.time, True, self._gamma):
-                    if v_e in g_e and t_v_p_new <= t.time(g_e, v_e):
-                        t.remove(g_e, v_e)
+        pursuer = self._pursuer
+        evader = self._evader
+        dt = self._dt
 
-            if progress is not None:
-                progress(i, iters)
+        i = 0
+        for phase in schedule:
+            gamma = self._gamma if phase.gamma is None else phase.gamma
+
+            if phase.dt is not None and phase.dt != dt:
+                _rescale(g_e, dt / phase.dt)
+                _rescale(g_p, dt / phase.dt)
+                self._costs_e = t.CostToCome.from_tree(g_e)
+                self._costs_p = t.CostToCome.from_tree(g_p)
+                self._solution = None
+                pursuer = self._pursuer.with_dt(phase.dt)
+                evader = self._evader.with_dt(phase.dt)
+                dt = phase.dt
+
+            if phase.refine or phase.targets:
+                self._refine_evader(g_e, g_p, pursuer, evader, phase, gamma)
+
+            for _ in range(phase.iters):
+                self._iterate(g_e, g_p, pursuer, evader, phase.exact, gamma)
+                self._prune(g_e, gamma, pursuer=False)
+                if not fixed:
+                    self._prune(g_p, gamma, pursuer=True)
+                self._iteration += 1
+                self._changed = True
+
+                if progress is not None:
+                    progress(i, total)
+                i += 1
 
-        return GameSolution(g_e, g_p)
+        self._changed = True
+        return self.solution()
     # end solve
 
+
+    def _iterate(self, g_e, g_p, pursuer, evader, exact, gamma):
+        '''Perform a single iteration of the solver.
+
+        A shared pursuer tree (see solve) is not grown.
+        '''
+        costs_e = self._costs_e
+        costs_p = self._costs_p
+
+        z_e_rand = self._space.sample()
+        v_e_new, t_v_e_new = self.extend(g_e, z_e_rand, evader, exact, gamma, costs_e)
+
+        if v_e_new is not None:
+            self._use(g_e, v_e_new, self._usage_e)
+            nodes = None
+            if self._fixed_nodes is not None:
+                nodes = self._fixed_nodes[:np.searchsorted(self._fixed_costs, t_v_e_new, side='right')]
+
+            for v_p in t.near_capture(g_p, v_e_new, self._check_capture, pursuer.time, False, gamma, nodes):
+                if costs_p[v_p.identifier] <= t_v_e_new:
+                    self._remove(g_e, v_e_new, costs_e, self._usage_e)
+                    break
+
+        if self._fixed_nodes is not None:
+            return
+
+        z_p_rand = self._space.sample()
+        v_p_new, t_v_p_new = self.extend(g_p, z_p_rand, pursuer, exact, gamma, costs_p)
+        if v_p_new is not None:
+            self._use(g_p, v_p_new, self._usage_p)
+            for v_e in t.near_capture(g_e, v_p_new, self._check_capture, pursuer.time, True, gamma):
+                # v_e may have been removed along with an earlier ancestor
+                if v_e.identifier in g_e and t_v_p_new <= costs_e[v_e.identifier]:
+                    self._remove(g_e, v_e, costs_e, self._usage_e)
+    # end _iterate
+
+
+    def _use(self, g, v, usage):
+        '''Record that v and its parent were used in this iteration.'''
+        usage[v.identifier] = self._iteration
+        usage[g.parent(v.identifier).identifier] = self._iteration
+    # end _use
+
+
+    def _remove(self, g, v, costs, usage):
+        '''Remove v and its descendants from g and from the bookkeeping.
+
+        The spilled trajectories of the removed vertices are released from the
+        trajectory store, if any. Trajectories held in memory are left alone,
+        since callers may still hold the vertices.
+        '''
+        removed = list(g.expand_tree(v.identifier))
+        for identifier in removed:
+            usage.pop(identifier, None)
+            if self._trajectory_store is not None:
+                g[identifier].data._release()
+        self._record(g, removed)
+
+        costs.remove_subtree(g, v)
+        t.remove(g, v)
+    # end _remove
+
+
+    def _prune(self, g, gamma, pursuer):
+        '''Prune leaves of g that cannot matter, if g is over its budget.
+
+        Leaves are pruned in this order until g is within PRUNE_SLACK of its
+        budget, or no candidates are left:
+
+            1. evader leaves that are dominated by a faster vertex nearby, see
+               _dominated.
+            2. leaves that have not been chosen as a parent for stale_after
+               iterations, least recently used first.
+
+        Slow pursuer leaves are not pruned for being slow: the evader tree keeps
+        growing, and a later evader vertex may be slow enough for them to
+        capture.
+
+        The evader vertex with the largest cost-to-come is the value of the
+        game (see GameSolution.max_time), so it is never pruned.
+
+        Returns:
+            the number of pruned vertices
+        '''
+        budget = self._max_nodes[1 if pursuer else 0]
+        if budget is None or len(g) <= budget:
+            return 0
+
+        costs = self._costs_p if pursuer else self._costs_e
+        usage = self._usage_p if pursuer else self._usage_e
+        excess = len(g) - int(budget * (1 - PRUNE_SLACK))
+
+        leaves = [n for n in g.leaves() if not n.is_root()]
+        if not leaves:
+            return 0
+
+        cost = np.array([costs[n.identifier] for n in leaves])
+        candidates = []
+
+        if not pursuer:
+            candidates.extend(self._dominated(g, leaves, cost, gamma))
+
+        if self._stale_after is not None:
+            last = np.array([usage.get(n.identifier, -1) for n in leaves])
+            stale = np.flatnonzero(self._iteration - last > self._stale_after)
+            candidates.extend(stale[np.argsort(last[stale], kind='stable')])
+
+        kept = set()
+        if not pursuer:
+            identifier, _ = costs.max()
+            kept = {i for i, n in enumerate(leaves) if n.identifier == identifier}
+
+        removed = set()
+        for i in candidates:
+            if len(removed) == excess:
+                break
+
+            if i not in removed and i not in kept:
+                removed.add(i)
+                self._remove(g, leaves[i], costs, usage)
+
+        return len(removed)
+    # end _prune
+
+
+    def _dominated(self, g, leaves, cost, gamma):
+        '''Find the leaves that are dominated by a faster vertex nearby.
+
+        A vertex dominates a leaf if it is within prune_radius of the leaf,
+        its state is within prune_tolerance of the leaf's, and its
+        cost-to-come is strictly smaller. The leaf's ancestors are always
+        faster, only because the leaf is reached through them, so they never
+        dominate it.
+
+        Returns:
+            the indices of the dominated leaves, most dominated first
+        '''
+        nodes = list(g.all_nodes_itr())
+        index = {n.identifier: i for i, n in enumerate(nodes)}
+        parent = np.array([-1 if n.is_root() else index[g.parent(n.identifier).identifier] for n in nodes])
+
+        locs = np.array([np.atleast_1d(n.data.loc) for n in nodes], dtype=float)
+        states = _states(nodes)
+        node_cost = np.array([self._costs_e[n.identifier] for n in nodes])
+        leaf_index = np.array([index[n.identifier] for n in leaves])
+
+        r = self._prune_radius
+        if r is None:
+            r = t.logball(gamma, len(g), locs.shape[1])
+
+        # the margin by which the fastest dominating vertex beats each leaf
+        margin = np.zeros(len(leaves))
+        chunk = max(1, 2**22 // len(nodes))
+        for start in range(0, len(leaves), chunk):
+            block = leaf_index[start:start + chunk]
+            rows = np.arange(len(block))
+
+            d = np.sqrt(np.sum((locs[block, np.newaxis] - locs)**2, axis=2))
+            close = d < r
+            if states.shape[1]:
+                close &= np.all(np.abs(states[block, np.newaxis] - states) <= self._prune_tolerance, axis=2)
+
+            # walk up from every leaf of the block at once
+            ancestor = parent[block]
+            while np.any(ancestor >= 0):
+                up = ancestor >= 0
+                close[rows[up], ancestor[up]] = False
+                ancestor = np.where(up, parent[np.maximum(ancestor, 0)], -1)
+
+            nearby = np.where(close, node_cost, np.inf)
+            margin[start:start + chunk] = cost[start:start + chunk] - np.min(nearby, axis=1)
+
+        dominated = np.flatnonzero(margin > 0)
+        return dominated[np.argsort(-margin[dominated])]
+    # end _dominated
+
+
+    def _refine_evader(self, g_e, g_p, pursuer, evader, phase, gamma):
+        '''Refine the most valuable evader branches.
+
+        The valuable branches are those that reach any of the phase's targets
+        and the phase.refine leaves with the largest cost-to-come. Refined
+        vertices are checked for capture again, since their states and costs
+        changed, and so are their descendants whose costs increased. A later
+        arrival can only make capture possible, never prevent it.
+        '''
+        soln = GameSolution(g_e, g_p, self._costs_e)
+        nodes = [n for target in phase.targets for n in soln.reachable_nodes(target)]
+
+        if phase.refine:
+            leaves = sorted(g_e.leaves(), key=lambda n: self._costs_e[n.identifier], reverse=True)
+            nodes.extend(leaves[:phase.refine])
+
+        old = self._costs_e
+        refined = {n.identifier for n in self.refine(g_e, nodes, evader)}
+        self._costs_e = t.CostToCome.from_tree(g_e)
+        self._solution = None
+
+        # ancestors come first, so a captured subtree is removed only once
+        changed = [
+            k for k in g_e.expand_tree(mode=g_e.WIDTH)
+            if k in refined or self._costs_e[k] > old[k]
+        ]
+        for k in changed:
+            if k not in g_e:
+                continue
+
+            v_e = g_e[k]
+            t_v_e = self._costs_e[k]
+            for v_p in t.near_capture(g_p, v_e, self._check_capture, pursuer.time, False, gamma):
+                if self._costs_p[v_p.identifier] <= t_v_e:
+                    self._remove(g_e, v_e, self._costs_e, self._usage_e)
+                    break
+    # end _refine_evader
+
 # end Solver
 
+
+def _states(nodes):
+    '''Stack the states of nodes into an array, one row per node.
+
+    Stateless vertices (e.g. of a LinearActor) give an array with no columns.
+    Rows of states that do not share the most common size are nan, so they
+    are not comparable to any other state.
+    '''
+    states = [
+        np.ravel(np.asarray([] if n.data.state is None else n.data.state, dtype=float))
+        for n in nodes
+    ]
+    sizes = [len(s) for s in states]
+    size = max(set(sizes), key=sizes.count)
+
+    stacked = np.full((len(nodes), size), np.nan)
+    for i, s in enumerate(states):
+        if len(s) == size:
+            stacked[i] = s
+
+    return stacked
+# end _states
+
+
+def _rescale(g, ratio):
+    '''Rescale the cost of every vertex in g by ratio.'''
+    for n in g.all_nodes_itr():
+        n.data.cost = n.data.time() * ratio
+# end _rescale
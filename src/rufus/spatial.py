@@ -0,0 +1,174 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module contains spatial indexes over the edges of trajectory trees.
+'''
+
+# Standard Imports
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.trajectory import bounds as trajectory_bounds
+
+
+def edge_bounds(v):
+    '''Get the bounding box of the trajectory that leads to Vertex v.
+
+    Vertices created before bounding boxes were tracked compute it here.
+    '''
+    if v.bounds is not None:
+        return v.bounds
+
+    return trajectory_bounds(v.trajectory, v.loc)
+# end edge_bounds
+
+
+def _morton(points, bits=10):
+    '''Compute the Morton (z-order) code of points normalized to [0, 1].'''
+    ndim = min(points.shape[1], 3)
+    cells = np.clip((points[:, :ndim] * (2**bits - 1)).astype(np.int64), 0, 2**bits - 1)
+
+    code = np.zeros(points.shape[0], dtype=np.int64)
+    for b in range(bits):
+        for k in range(ndim):
+            code |= ((cells[:, k] >> b) & 1) << (b * ndim + k)
+
+    return code
+# end _morton
+
+
+class EdgeIndex:
+    '''A packed R-tree over the bounding boxes of tree edges.
+
+    Edges are sorted along a z-order curve through their bounding box centers
+    and packed into leaves of leaf_size edges. Leaves are packed into nodes of
+    fanout children, level by level, until a single root remains. Queries
+    descend one level at a time, testing all candidate boxes of a level at once.
+
+    The index is static: it must be rebuilt after the tree changes.
+    '''
+
+    def __init__(self, keys, lower, upper, leaf_size=16, fanout=16):
+        '''Constructor.
+
+        Arguments:
+            keys:       the key of each edge (e.g. node identifiers)
+            lower:      the lower corner of each edge's box, shape (n, dim)
+            upper:      the upper corner of each edge's box, shape (n, dim)
+            leaf_size:  the number of edges per leaf
+            fanout:     the number of children per interior node
+        '''
+        lower = np.atleast_2d(np.asarray(lower, dtype=float))
+        upper = np.atleast_2d(np.asarray(upper, dtype=float))
+        assert lower.shape == upper.shape
+        assert len(keys) == lower.shape[0]
+        assert leaf_size > 1 and fanout > 1
+
+        self._keys = np.empty(len(keys), dtype=object)
+        self._keys[:] = list(keys)
+
+        if len(keys):
+            centers = (lower + upper) / 2
+            lo, hi = np.min(centers, axis=0), np.max(centers, axis=0)
+            extent = np.where(hi > lo, hi - lo, 1.0)
+            order = np.argsort(_morton((centers - lo) / extent), kind='stable')
+        else:
+            order = np.arange(0)
+
+        self._order = order
+
+        # levels[0] holds the edge boxes, levels[-1] holds the root box
+        self._levels = [(lower[order], upper[order])]
+        self._group = []
+        group = leaf_size
+        while len(self._levels[-1][0]) > 1:
+            lo, hi = self._levels[-1]
+            starts = np.arange(0, len(lo), group)
+            self._levels.append((
+                np.minimum.reduceat(lo, starts, axis=0),
+                np.maximum.reduceat(hi, starts, axis=0)
+            ))
+            self._group.append(group)
+            group = fanout
+    # end __init__
+
+
+    @classmethod
+    def from_tree(cls, g, **kwargs):
+        '''Build an index over the edges (i.e. the vertices) of tree g.
+
+        The keys of the index are the node identifiers.
+        '''
+        keys = []
+        lower = []
+        upper = []
+        for n in g.all_nodes_itr():
+            lo, hi = edge_bounds(n.data)
+            keys.append(n.identifier)
+            lower.append(np.atleast_1d(lo))
+            upper.append(np.atleast_1d(hi))
+
+        return cls(keys, np.array(lower), np.array(upper), **kwargs)
+    # end from_tree
+
+
+    def __len__(self):
+        return len(self._keys)
+    # end __len__
+
+
+    def query(self, lower, upper):
+        '''Find the edges whose boxes overlap the box [lower, upper].
+
+        Arguments:
+            lower:  the lower corner of the query box
+            upper:  the upper corner of the query box
+
+        Returns:
+            list of the keys of the overlapping edges
+        '''
+        if not len(self._keys):
+            return []
+
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+
+        # start at the root and descend one level at a time
+        active = np.arange(len(self._levels[-1][0]))
+        for level in range(len(self._levels) - 1, -1, -1):
+            lo, hi = self._levels[level]
+            hit = np.all(lo[active] <= upper, axis=1) & np.all(hi[active] >= lower, axis=1)
+            active = active[hit]
+
+            if level == 0 or not len(active):
+                break
+
+            # expand to the children in the level below
+            group = self._group[level - 1]
+            n_below = len(self._levels[level - 1][0])
+            starts = active * group
+            counts = np.minimum(group, n_below - starts)
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+            active = offsets + np.arange(np.sum(counts))
+
+        if level != 0:
+            return []
+
+        return list(self._keys[self._order[active]])
+    # end query
+
+
+    def query_region(self, region):
+        '''Find the edges whose boxes overlap the bounding box of region.'''
+        lower, upper = region.bounds()
+        return self.query(lower, upper)
+    # end query_region
+
+# end EdgeIndex
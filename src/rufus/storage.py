@@ -0,0 +1,440 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module contains a columnar on-disk format for GameSolution.
+
+Each tree is flattened, in breadth-first order, into a handful of arrays:
+
+    <tree>_ids          the node identifiers
+    <tree>_parent       the index of each node's parent, -1 for the root
+    <tree>_loc          the location of each vertex, shape (n, dim)
+    <tree>_cost         the number of time steps of each edge
+    <tree>_lower        the bounding box of each edge, shape (n, dim)
+    <tree>_upper
+    <tree>_offsets      the trajectory of node i is
+    <tree>_trajectories trajectories[offsets[i]:offsets[i + 1]]
+    <tree>_state        the state of each vertex, nan if it has none
+    <tree>_has_state
+
+where <tree> is evader or pursuer. States that are not numeric, or that do
+not share a shape, are stored as a pickled object array instead.
+
+A solution is saved either as a directory of .npy files, which are memory
+mapped on load so that trajectories are only read from disk when they are
+used, or as a single .npz archive, optionally compressed.
+
+While solving, trajectories can instead be spilled to a TrajectoryStore, which
+keeps only a bounded number of bytes of them in memory.
+'''
+
+# Standard Imports
+from collections import OrderedDict
+import json
+import os
+import tempfile
+
+# External Imports
+import numpy as np
+from treelib.node import Node
+from treelib.tree import Tree
+
+# Local Imports
+from rufus.analysis import GameSolution
+from rufus.game import Vertex
+
+
+FORMAT = 'rufus-solution'
+VERSION = 1
+
+_TREES = ('evader', 'pursuer')
+
+# whether Nodes can be linked to a tree without Tree.create_node, see
+# _build_tree
+_BULK = hasattr(Node, 'set_initial_tree_id') and hasattr(Tree(), '_nodes')
+
+
+class TrajectoryStore:
+    '''An append-only file of trajectories with an in-memory LRU cache.
+
+    Trajectories are written to the file as soon as they are put, so evicting
+    one from the cache never writes. The cache holds at most budget bytes of
+    trajectory data; the least recently used trajectories are evicted first.
+
+    Trajectories returned by get are read-only and must not be modified.
+    Replaced and removed trajectories are not reclaimed from the file, which
+    lives as long as the store.
+    '''
+
+    def __init__(self, budget=64 * 2**20, directory=None):
+        '''Constructor.
+
+        Arguments:
+            budget:     the maximum number of bytes of trajectory data to keep
+                        in memory
+            directory:  the directory of the backing file. If None, the
+                        system's temporary directory is used.
+        '''
+        assert budget >= 0
+
+        self.budget = budget
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._end = 0
+
+        # key -> (offset, shape, dtype)
+        self._index = {}
+        self._next_key = 0
+
+        # key -> np.ndarray, in order of use
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+    # end __init__
+
+
+    def __len__(self):
+        return len(self._index)
+    # end __len__
+
+
+    def __contains__(self, key):
+        return key in self._index
+    # end __contains__
+
+
+    @property
+    def resident_bytes(self):
+        '''The number of bytes of trajectory data held in memory.'''
+        return self._cached_bytes
+    # end resident_bytes
+
+
+    @property
+    def file_bytes(self):
+        '''The size of the backing file.'''
+        return self._end
+    # end file_bytes
+
+
+    def put(self, trajectory):
+        '''Store a trajectory.
+
+        Returns:
+            the key of the trajectory
+        '''
+        trajectory = np.ascontiguousarray(trajectory)
+
+        self._file.seek(self._end)
+        self._file.write(trajectory.tobytes())
+
+        key = self._next_key
+        self._next_key += 1
+        self._index[key] = (self._end, trajectory.shape, trajectory.dtype)
+        self._end += trajectory.nbytes
+
+        trajectory = trajectory.view()
+        trajectory.flags.writeable = False
+        self._remember(key, trajectory)
+        return key
+    # end put
+
+
+    def get(self, key):
+        '''Get a trajectory, reading it from disk if it is not cached.'''
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        offset, shape, dtype = self._index[key]
+        self._file.seek(offset)
+        data = self._file.read(int(np.prod(shape)) * dtype.itemsize)
+
+        trajectory = np.frombuffer(data, dtype=dtype).reshape(shape)
+        self._remember(key, trajectory)
+        return trajectory
+    # end get
+
+
+    def discard(self, key):
+        '''Forget a trajectory that is no longer needed.'''
+        self._index.pop(key, None)
+        cached = self._cache.pop(key, None)
+        if cached is not None:
+            self._cached_bytes -= cached.nbytes
+    # end discard
+
+
+    def close(self):
+        '''Close and delete the backing file.'''
+        self._file.close()
+        self._cache.clear()
+        self._cached_bytes = 0
+    # end close
+
+
+    def _remember(self, key, trajectory):
+        '''Cache a trajectory, evicting others to stay within the budget.'''
+        if trajectory.nbytes > self.budget:
+            return
+
+        self._cache[key] = trajectory
+        self._cached_bytes += trajectory.nbytes
+        while self._cached_bytes > self.budget:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= evicted.nbytes
+    # end _remember
+
+# end TrajectoryStore
+
+
+def save_solution(soln, path, compress=False):
+    '''Save a GameSolution.
+
+    Arguments:
+        soln:       the GameSolution to save
+        path:       if path ends in .npz, the solution is saved as a single
+                    archive. Otherwise, path is a directory that receives one
+                    .npy file per array.
+        compress:   if True, compress the archive. Only supported for .npz.
+
+    Returns:
+        None
+    '''
+    archive = path.endswith('.npz')
+    assert archive or not compress, 'only .npz archives can be compressed'
+
+    arrays = {}
+    meta = {'format': FORMAT, 'version': VERSION, 'trees': {}}
+    for name, g in zip(_TREES, (soln.evader_tree(), soln.pursuer_tree())):
+        tree_arrays, tree_meta = _flatten(g)
+        meta['trees'][name] = tree_meta
+        arrays.update(('%s_%s' % (name, k), v) for k, v in tree_arrays.items())
+
+    if archive:
+        save = np.savez_compressed if compress else np.savez
+        save(path, meta=np.array(json.dumps(meta)), **arrays)
+        return
+
+    os.makedirs(path, exist_ok=True)
+    for k, v in arrays.items():
+        np.save(os.path.join(path, k + '.npy'), v, allow_pickle=v.dtype == object)
+
+    with open(os.path.join(path, 'meta.json'), 'w') as fid:
+        json.dump(meta, fid)
+# end save_solution
+
+
+def load_solution(path, mmap=True):
+    '''Load a GameSolution saved with save_solution.
+
+    Arguments:
+        path:   the .npz archive or directory to load
+        mmap:   if True, the arrays of a directory are memory mapped, so
+                trajectories are paged in from disk as they are used. The
+                loaded trajectories are then read-only views of the files.
+                Ignored for .npz archives.
+
+    Returns:
+        GameSolution
+    '''
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            objects = _objects(meta, path)
+            arrays = {k: data[k] for k in data.files if k not in objects}
+
+        # only the object arrays of states need to be unpickled
+        if objects:
+            with np.load(path, allow_pickle=True) as data:
+                arrays.update((k, data[k]) for k in objects)
+
+        load = lambda k: arrays[k]
+    else:
+        with open(os.path.join(path, 'meta.json')) as fid:
+            meta = json.load(fid)
+
+        # arrays of python objects cannot be memory mapped
+        objects = _objects(meta, path)
+        load = lambda k: np.load(
+                os.path.join(path, k + '.npy'),
+                mmap_mode='r' if mmap and k not in objects else None,
+                allow_pickle=k in objects
+        )
+
+    g_e, g_p = [
+        _unflatten(lambda k, name=name: load('%s_%s' % (name, k)), meta['trees'][name])
+        for name in _TREES
+    ]
+    return GameSolution(g_e, g_p)
+# end load_solution
+
+
+def _objects(meta, path):
+    '''Check the metadata of a saved solution, and get the keys of its arrays
+    that hold pickled objects.
+    '''
+    assert meta.get('format') == FORMAT, '%s is not a saved GameSolution' % path
+    assert meta.get('version') == VERSION, 'unsupported format version %s' % meta.get('version')
+
+    return {'%s_state' % name for name in _TREES if meta['trees'][name]['states'] == 'object'}
+# end _objects
+
+
+def _flatten(g):
+    '''Flatten a tree into arrays. See the module documentation.'''
+    keys = list(g.expand_tree(mode=g.WIDTH)) if g.root is not None else []
+    index = {k: i for i, k in enumerate(keys)}
+    nodes = [g[k] for k in keys]
+    vertices = [n.data for n in nodes]
+
+    parent = np.array(
+            [-1 if n.is_root() else index[g.parent(n.identifier).identifier] for n in nodes],
+            dtype=np.int64
+    )
+    loc = np.array([np.atleast_1d(v.loc) for v in vertices], dtype=float)
+    dim = loc.shape[1] if len(loc) else 0
+
+    trajectories = [_trajectory(v.trajectory, dim) for v in vertices]
+    offsets = np.concatenate([[0], np.cumsum([len(tr) for tr in trajectories])]).astype(np.int64)
+
+    lower, upper = zip(*[_bounds(v) for v in vertices]) if vertices else ((), ())
+
+    arrays = {
+        'parent': parent,
+        'loc': loc.reshape((len(nodes), dim)),
+        'cost': np.array([v.time() for v in vertices], dtype=float),
+        'lower': np.array(lower, dtype=float).reshape((len(nodes), dim)),
+        'upper': np.array(upper, dtype=float).reshape((len(nodes), dim)),
+        'offsets': offsets,
+        'trajectories': np.concatenate(trajectories) if trajectories else np.zeros((0, dim))
+    }
+
+    if all(isinstance(k, (int, np.integer)) for k in keys):
+        arrays['ids'] = np.array(keys, dtype=np.int64)
+    else:
+        arrays['ids'] = np.array([str(k) for k in keys])
+
+    meta = {'states': 'array'}
+    has_state = np.array([v.state is not None for v in vertices], dtype=bool)
+    try:
+        states = [np.asarray(v.state, dtype=float) for v in vertices if v.state is not None]
+        shape = states[0].shape if states else ()
+        assert all(s.shape == shape for s in states)
+
+        state = np.full((len(nodes),) + shape, np.nan)
+        if states:
+            state[has_state] = states
+    except (TypeError, ValueError, AssertionError):
+        meta['states'] = 'object'
+        state = np.empty(len(nodes), dtype=object)
+        state[:] = [v.state for v in vertices]
+
+    arrays['state'] = state
+    arrays['has_state'] = has_state
+    return arrays, meta
+# end _flatten
+
+
+def _unflatten(load, meta):
+    '''Rebuild a tree from the arrays written by _flatten.'''
+    # plain ndarray views of memory mapped files are much cheaper to index
+    # than np.memmap, and still only read pages as they are used
+    ids, parent, loc, cost, lower, upper, offsets, trajectories, state, has_state = [
+        np.asarray(load(k)) for k in (
+            'ids', 'parent', 'loc', 'cost', 'lower', 'upper', 'offsets', 'trajectories',
+            'state', 'has_state'
+        )
+    ]
+
+    keys = ids.tolist()
+    parents = parent.tolist()
+    costs = cost.tolist()
+    offsets = offsets.tolist()
+    objects = meta['states'] == 'object'
+
+    # one in-memory copy of the locations and states, viewed row by row
+    locs = list(np.array(loc))
+    if objects:
+        states = list(state)
+    else:
+        states = state.tolist() if state.ndim == 1 else list(np.array(state))
+        states = [s if h else None for s, h in zip(states, has_state.tolist())]
+
+    vertices = [
+        Vertex(locs[i], states[i], trajectories[offsets[i]:offsets[i + 1]], costs[i], (lower[i], upper[i]))
+        for i in range(len(keys))
+    ]
+    return _build_tree(keys, parents, vertices)
+# end _unflatten
+
+
+def _build_tree(keys, parents, data):
+    '''Build a Tree from nodes in breadth-first order.
+
+    Tree.create_node looks up and validates the parent of every node, which
+    dominates the time to load a large tree. The nodes are saved root first
+    and parents before children, so where treelib allows it (see _BULK) the
+    nodes are linked to each other directly and added to the tree at once.
+    Otherwise they are added one by one with Tree.create_node.
+
+    Arguments:
+        keys:       the node identifiers
+        parents:    the index of each node's parent, -1 for the root
+        data:       the data of each node
+
+    Returns:
+        Tree
+    '''
+    g = Tree()
+    if not keys:
+        return g
+
+    assert parents[0] < 0 and all(0 <= p < i for i, p in enumerate(parents[1:], 1)), \
+            'nodes are not in breadth-first order'
+
+    if not _BULK:
+        for k, p, d in zip(keys, parents, data):
+            g.create_node(identifier=k, parent=keys[p] if p >= 0 else None, data=d)
+
+        return g
+
+    children = [[] for _ in keys]
+    for i, p in enumerate(parents[1:], 1):
+        children[p].append(keys[i])
+
+    tree_id = g.identifier
+    nodes = {}
+    for k, p, d, c in zip(keys, parents, data, children):
+        n = Node(identifier=k, data=d)
+        n.set_predecessor(keys[p] if p >= 0 else None, tree_id)
+        n.set_successors(c, tree_id)
+        n.set_initial_tree_id(tree_id)
+        nodes[k] = n
+
+    g._nodes.update(nodes)
+    g.root = keys[0]
+    return g
+# end _build_tree
+
+
+def _trajectory(trajectory, dim):
+    '''View a stored trajectory as an (n, dim) array.'''
+    if trajectory is None or np.size(trajectory) == 0:
+        return np.zeros((0, dim))
+
+    return np.asarray(trajectory, dtype=float).reshape((len(trajectory), dim))
+# end _trajectory
+
+
+def _bounds(v):
+    '''The bounding box of a vertex's edge, or of its location alone.'''
+    if v.bounds is not None:
+        return v.bounds
+
+    loc = np.atleast_1d(np.asarray(v.loc, dtype=float))
+    return loc, loc
+# end _bounds
@@ -0,0 +1,171 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module estimates capture-probability maps by Monte Carlo.
+
+The game is solved from every evader start on a grid, for every initial
+pursuer heading and for several random seeds. The fraction of seeds in which
+the evader can reach the target estimates the probability that it gets through
+from that start, e.g.
+
+    starts = grid(space, (20, 20))
+    result = capture_map(solver, [0.0, 0.0], headings, starts, target, range(8), 500)
+    plt.imshow(result.probability[0].T, origin='lower')
+
+The pursuer tree only depends on the pursuer's initial conditions and the
+seed, so it is grown once per (heading, seed) and reused for every evader
+start. Each (heading, seed) pair is one task for the process pool.
+'''
+
+# Standard Imports
+from concurrent.futures import ProcessPoolExecutor
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.game import Vertex
+
+
+def grid(region, shape):
+    '''Get the centers of the cells of a regular grid over a BoxRegion.
+
+    Returns:
+        np.ndarray of shape shape + (dim,)
+    '''
+    lower, upper = (np.asarray(b, dtype=float) for b in region.bounds())
+    assert len(shape) == len(lower)
+
+    axes = [lo + (np.arange(n) + 0.5) * (hi - lo) / n for lo, hi, n in zip(lower, upper, shape)]
+    return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1)
+# end grid
+
+
+class CaptureMap:
+    '''The outcome of the game over pursuer headings and evader starts.
+
+    Every field has shape (headings,) + the shape of the evader starts.
+
+        probability     the fraction of seeds in which the evader can reach
+                        the target
+        time_mean       the mean and standard deviation of the least time to
+        time_std        reach the target, over the seeds where it is reached.
+                        nan where the target is never reached.
+        survival_mean   the mean of the longest time the evader can avoid
+                        capture, over all seeds
+
+    Times are in seconds, i.e. time steps multiplied by the solver's dt.
+    '''
+
+    def __init__(self, headings, starts, reached, times, survival):
+        '''Constructor.
+
+        Arguments:
+            headings:   the initial pursuer headings
+            starts:     the evader starts, shape (..., dim)
+            reached:    whether the target was reached, shape
+                        (headings, seeds, starts)
+            times:      the least time to the target, inf where it was not
+                        reached, with the shape of reached
+            survival:   the longest time to capture, with the shape of reached
+        '''
+        self.headings = np.asarray(headings)
+        self.starts = starts
+        self.seeds = reached.shape[1]
+
+        shape = (len(self.headings),) + starts.shape[:-1]
+        self.probability = np.mean(reached, axis=1).reshape(shape)
+
+        with np.errstate(invalid='ignore'):
+            finite = np.where(reached, times, np.nan)
+            count = np.sum(reached, axis=1)
+            mean = np.nansum(finite, axis=1) / count
+            var = np.nansum((finite - mean[:, np.newaxis])**2, axis=1) / count
+
+        self.time_mean = mean.reshape(shape)
+        self.time_std = np.sqrt(var).reshape(shape)
+        self.survival_mean = np.mean(survival, axis=1).reshape(shape)
+    # end __init__
+
+# end CaptureMap
+
+
+def _run_task(solver, pursuer_loc, heading, seed, starts, target, iters, pursuer_iters):
+    '''Grow one pursuer tree and solve the game from every evader start.
+
+    Returns:
+        (reached, times, survival), each of shape (starts,)
+    '''
+    np.random.seed(seed)
+    p_init = Vertex(np.array(pursuer_loc, dtype=float), heading, np.array([]))
+    g_p = solver.grow(p_init, pursuer_iters)
+
+    reached = np.zeros(len(starts), dtype=bool)
+    times = np.full(len(starts), np.inf)
+    survival = np.zeros(len(starts))
+    for i, start in enumerate(starts):
+        # every start gets its own stream, so results do not depend on the
+        # order in which the starts are solved
+        np.random.seed([seed, i])
+        e_init = Vertex(np.array(start, dtype=float), None, np.array([]))
+        soln = solver.solve(None, e_init, iters, pursuer_tree=g_p)
+
+        result = soln.query_targets([target])[0]
+        reached[i] = result['reachable']
+        times[i] = result['min_time']
+        survival[i] = soln.max_time()
+
+    return reached, times, survival
+# end _run_task
+
+
+def capture_map(solver, pursuer_loc, headings, starts, target, seeds, iters, pursuer_iters=None,
+        workers=None):
+    '''Estimate the capture-probability map of a game.
+
+    Arguments:
+        solver:         the Solver. It is sent to the worker processes, so its
+                        actors and capture predicate must be picklable (see
+                        rufus.game.CaptureRadius)
+        pursuer_loc:    the initial pursuer location
+        headings:       the initial pursuer headings (the pursuer state)
+        starts:         the evader starts, shape (..., dim), e.g. from grid
+        target:         the Region the evader tries to reach
+        seeds:          the random seeds
+        iters:          the number of evader iterations of each solve
+        pursuer_iters:  the number of iterations of each pursuer tree. If None,
+                        iters is used
+        workers:        the number of worker processes. If None, one per CPU.
+                        If 1, everything is solved in this process.
+
+    Returns:
+        CaptureMap
+    '''
+    starts = np.asarray(starts, dtype=float)
+    flat = starts.reshape((-1, starts.shape[-1]))
+    seeds = list(seeds)
+    pursuer_iters = iters if pursuer_iters is None else pursuer_iters
+    assert len(seeds) > 0 and len(headings) > 0
+
+    tasks = [
+        (solver, pursuer_loc, heading, seed, flat, target, iters, pursuer_iters)
+        for heading in headings for seed in seeds
+    ]
+
+    if workers == 1:
+        results = [_run_task(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_task, *zip(*tasks)))
+
+    # (headings * seeds, starts) -> (headings, seeds, starts)
+    reached, times, survival = [
+        np.array(field).reshape((len(headings), len(seeds), len(flat))) for field in zip(*results)
+    ]
+    return CaptureMap(headings, starts, reached, times * solver.dt, survival * solver.dt)
+# end capture_map
@@ -0,0 +1,77 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the actors module.
+'''
+
+# Standard Imports
+import unittest
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.actors import ODEActor, PiecewiseConstantControls
+
+
+def _car(x, u):
+    '''A car with limited turn rate (u[:, 0]) and acceleration (u[:, 1]).'''
+    return np.column_stack([
+        x[:, 3] * np.cos(x[:, 2]),
+        x[:, 3] * np.sin(x[:, 2]),
+        u[:, 0],
+        u[:, 1]
+    ])
+# end _car
+
+
+class ODEActorTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self._controls = PiecewiseConstantControls([-1.0, -0.5], [1.0, 0.5], pieces=2)
+    # end setUp
+
+
+    def test_controls(self):
+        u = self._controls.sample(10, 7)
+        self.assertEqual((10, 7, 2), u.shape)
+        self.assertTrue(np.all(u[:, :, 0] >= -1.0) and np.all(u[:, :, 0] <= 1.0))
+        self.assertTrue(np.all(u[:, :, 1] >= -0.5) and np.all(u[:, :, 1] <= 0.5))
+
+        # two constant pieces
+        np.testing.assert_array_equal(u[:, 0], u[:, 3])
+        np.testing.assert_array_equal(u[:, 4], u[:, 6])
+    # end test_controls
+
+
+    def test_steer(self):
+        actor = ODEActor(0.1, _car, self._controls, 2, 200, candidates=512, tolerance=0.5)
+
+        start = np.array([0.0, 0.0])
+        end = np.array([5.0, 2.0])
+        state, trajectory = actor.steer(start, end, np.array([0.0, 1.0]))
+
+        self.assertEqual(2, trajectory.shape[1])
+        self.assertEqual(2, state.shape[0])
+        np.testing.assert_array_equal(start, trajectory[0])
+        self.assertTrue(np.linalg.norm(trajectory[-1] - end) < 0.5 + 0.1 * 2.0)
+    # end test_steer
+
+
+    def test_unsteerable(self):
+        # a stationary car with no acceleration cannot move
+        controls = PiecewiseConstantControls([-1.0, 0.0], [1.0, 0.0])
+        actor = ODEActor(0.1, _car, controls, 2, 50, tolerance=0.5)
+
+        state, trajectory = actor.steer(np.array([0.0, 0.0]), np.array([5.0, 0.0]), np.array([0.0, 0.0]))
+        self.assertIsNone(state)
+        self.assertIsNone(trajectory)
+    # end test_unsteerable
+
+# end ODEActorTest
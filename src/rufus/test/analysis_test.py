@@ -11,6 +11,7 @@ Unit tests for the analysis module.
 
 # Standard Imports
 import unittest
+from unittest import mock
 
 # External Imports
 import numpy as np
@@ -18,7 +19,25 @@ from treelib.tree import Tree
 
 # Local Imports
 from rufus.analysis import GameSolution
-from rufus.game import Vertex, Region, BoxRegion
+from rufus.game import Vertex, Region, BoxRegion, BallRegion
+from rufus.trajectory import segments
+
+
+class CountingBox(BoxRegion):
+    '''A BoxRegion that counts the edges tested against it.'''
+
+    def __init__(self, lower, upper):
+        super().__init__(lower, upper)
+        self.tested = 0
+    # end __init__
+
+
+    def intersects_segments(self, starts, ends):
+        self.tested += 1
+        return super().intersects_segments(starts, ends)
+    # end intersects_segments
+
+# end CountingBox
 
 
 class TestGameSolution(unittest.TestCase):
@@ -33,6 +52,10 @@ class TestGameSolution(unittest.TestCase):
 
         # contains non-leaf node 7 (endpoint)
         self._target3 = BoxRegion(np.array([30.0, 10.0]), np.array([60.0, 30.0]))
+
+        # contains no samples, but is crossed by the trajectories of nodes 3
+        # and 7 between samples
+        self._target4 = BoxRegion(np.array([48.0, 0.0]), np.array([52.0, 100.0]))
         
         self._g = Tree()
       
@@ -223,9 +246,114 @@ class TestGameSolution(unittest.TestCase):
         self.assertTrue(self._soln.can_reach(self._target1))
         self.assertFalse(self._soln.can_reach(self._target2))
         self.assertTrue(self._soln.can_reach(self._target3))
+        self.assertTrue(self._soln.can_reach(self._target4))
     # end test_can_reach
 
 
+    def test_can_reach_first_hit(self):
+        target = CountingBox(self._target4.lower, self._target4.upper)
+        self.assertEqual({3, 7}, {n.identifier for n in self._soln.reachable_nodes(target)})
+        tested = target.tested
+
+        # can_reach stops at the first node that reaches the target
+        target.tested = 0
+        self.assertTrue(self._soln.can_reach(target))
+        self.assertLess(target.tested, tested)
+    # end test_can_reach_first_hit
+
+
+    def test_query_edges(self):
+        nodes = self._soln.query_edges(np.array([29.0, 44.0]), np.array([31.0, 46.0]))
+        self.assertEqual({2, 3, 6}, {n.identifier for n in nodes})
+
+        # the index is rebuilt after invalidation
+        index = self._soln.edge_index()
+        self._soln.invalidate()
+        self.assertIsNot(index, self._soln.edge_index())
+    # end test_query_edges
+
+
+    def test_query_targets(self):
+        ball = BallRegion(np.array([50.0, 18.5]), 1.0)
+        targets = [self._target1, self._target2, self._target3, self._target4, ball]
+        result = self._soln.query_targets(targets)
+        self.assertEqual(len(targets), len(result))
+
+        for target, row in zip(targets, result):
+            self.assertEqual(self._soln.can_reach(target), row['reachable'])
+            self.assertEqual(len(self._soln.all_trajectories_to_target(target)), row['count'])
+
+            path, _ = self._soln.min_trajectory_to_target(target)
+            if path is None:
+                self.assertEqual(np.inf, row['min_time'])
+                self.assertIsNone(row['node'])
+            else:
+                self.assertEqual(sum(v.time() for v in path), row['min_time'])
+                self.assertIs(self._g[row['node']].data, path[-1])
+    # end test_query_targets
+
+
+    def test_query_targets_candidates(self):
+        targets = [self._target1, self._target3]
+        with mock.patch('rufus.analysis.segments', wraps=segments) as built:
+            result = self._soln.query_targets(targets)
+
+        np.testing.assert_array_equal([True, True], result['reachable'])
+
+        # segments are only built for the edges whose boxes overlap a target
+        candidates = set()
+        for target in targets:
+            candidates |= {n.identifier for n in self._soln.query_edges(target.lower, target.upper)}
+        candidates.discard(self._g.root)
+
+        self.assertEqual(len(candidates), built.call_count)
+        self.assertLess(built.call_count, len(self._g) - 1)
+    # end test_query_targets_candidates
+
+
+    def test_value_map(self):
+        space = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        vmap = self._soln.value_map(space, (1000, 1000))
+        self.assertEqual((1000, 1000), vmap.evader.shape)
+
+        # every vertex is reached at its cost-to-come
+        costs = self._soln.costs_to_come()
+        nodes = list(self._g.all_nodes_itr())
+        locs = np.array([n.data.loc for n in nodes])
+        np.testing.assert_array_equal([costs[n.identifier] for n in nodes], vmap.lookup(locs, 'evader'))
+
+        # the same tree plays both sides
+        np.testing.assert_array_equal(np.zeros(len(nodes)), vmap.lookup(locs))
+        self.assertTrue(np.isnan(vmap.lookup(np.array([[1.0, 99.0], [-1.0, 0.0]]))).all())
+
+        # samples between vertices are interpolated along the edge
+        self.assertAlmostEqual(costs[1] / 3, vmap.lookup(np.array([5.0, 5.0]), 'evader')[0])
+        self.assertEqual(np.inf, vmap.lookup(np.array([90.0, 10.0]), 'evader')[0])
+    # end test_value_map
+
+
+    def test_segment_crossing(self):
+        results = self._soln.all_trajectories_to_target(self._target4)
+        self.assertEqual(2, len(results))
+
+        ends = [path[-1] for path, _ in results]
+        self.assertTrue(any(v is self._n3.data for v in ends))
+        self.assertTrue(any(v is self._n7.data for v in ends))
+    # end test_segment_crossing
+
+
+    def test_decimated_costs(self):
+        # store node 8's trajectory with fewer samples than time steps. The
+        # cost of the path through node 8 must not change
+        self._n8.data.update(None, self._n8.data.trajectory[::3], 7)
+
+        path, trajectory = self._soln.max_time_trajectory()
+        self.assertEqual(4, len(path))
+        self.assertIs(self._n8.data, path[-1])
+        self.assertEqual(11, len(trajectory))
+    # end test_decimated_costs
+
+
     def test_all_trajectories_to_target(self):
         results = self._soln.all_trajectories_to_target(self._target1)
         self.assertEqual(2, len(results))
@@ -305,6 +433,28 @@ class TestGameSolution(unittest.TestCase):
         np.testing.assert_array_equal(path[2].loc, self._n7.data.loc)
         np.testing.assert_array_equal(path[3].loc, self._n8.data.loc)
         np.testing.assert_array_equal(trajectory, self._path_0178_trajectory)
+
+        self.assertEqual(sum(v.time() for v in path), self._soln.max_time())
     # end test_max_time_trajectory
 
+
+    def test_iter_trajectories(self):
+        leaves = {n.identifier for n in self._g.leaves()}
+        results = list(self._soln.iter_trajectories())
+        self.assertEqual(len(leaves), len(results))
+
+        for path, trajectory in results:
+            expected = np.vstack([v.trajectory for v in path if v.trajectory.size] + [path[-1].loc])
+            np.testing.assert_array_equal(expected, trajectory)
+
+        # views into the shared buffer are valid until the generator advances
+        for (path, trajectory), (_, view) in zip(results, self._soln.iter_trajectories(copy=False)):
+            np.testing.assert_array_equal(trajectory, view)
+
+        # interior nodes
+        (path, trajectory), = self._soln.iter_trajectories([7])
+        self.assertIs(self._n7.data, path[-1])
+        np.testing.assert_array_equal(trajectory, self._path_017_trajectory)
+    # end test_iter_trajectories
+
 # end TestGameSolution
@@ -0,0 +1,116 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the cli module.
+'''
+
+# Standard Imports
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+# External Imports
+
+# Local Imports
+from rufus.cli import expand, main, run, run_scenario
+from rufus.storage import save_solution
+
+
+SCENARIO = {
+    'name': 'test',
+    'dt': 1.0,
+    'iterations': 30,
+    'seeds': 2,
+    'space': {'lower': [0.0, 0.0], 'upper': [100.0, 100.0]},
+    'pursuer': {'type': 'LinearActor', 'loc': [0.0, 0.0], 'speed': 2.0},
+    'evader': {'type': 'LinearActor', 'loc': [50.0, 50.0], 'speed': 1.0},
+    'capture': {'radius': 5.0},
+    'solver': {'gamma': 100.0, 'stride': 3},
+    'targets': [{'lower': [60.0, 60.0], 'upper': [80.0, 80.0]}],
+    'sweep': {'evader.speed': [1.0, 1.5]}
+}
+
+
+class CliTest(unittest.TestCase):
+
+    def test_expand(self):
+        runs = expand(SCENARIO)
+        self.assertEqual(4, len(runs))
+        self.assertEqual(4, len(set(name for name, _, _ in runs)))
+
+        speeds = [(config['evader']['speed'], config['seed']) for _, config, _ in runs]
+        self.assertEqual([(1.0, 0), (1.0, 1), (1.5, 0), (1.5, 1)], speeds)
+        self.assertEqual({'evader.speed': 1.5, 'seed': 1}, runs[3][2])
+
+        # names only depend on the config of the run
+        self.assertEqual([r[0] for r in runs], [r[0] for r in expand(SCENARIO)])
+    # end test_expand
+
+
+    def test_run_scenario(self):
+        with tempfile.TemporaryDirectory() as directory:
+            rows, failed = run_scenario(SCENARIO, directory, jobs=1)
+            self.assertEqual({}, failed)
+            self.assertEqual(4, len(rows))
+
+            with open(os.path.join(directory, 'summary.csv')) as fid:
+                summary = list(csv.DictReader(fid))
+            self.assertEqual([r['run'] for r in rows], [r['run'] for r in summary])
+            self.assertIn('reach_0', summary[0])
+
+            # a run without a marker is solved again, the others are skipped
+            first = rows[0]['run']
+            os.remove(os.path.join(directory, 'runs', first + '.json'))
+
+            logged = []
+            rows, failed = run_scenario(SCENARIO, directory, jobs=1, log=logged.append)
+            self.assertEqual(4, len(rows))
+            self.assertEqual('4 runs, 3 done, 1 to run', logged[0])
+            self.assertTrue(logged[1].startswith(first))
+
+            # the scenario file is read by the console entry point
+            path = os.path.join(directory, 'scenario.json')
+            with open(path, 'w') as fid:
+                json.dump(SCENARIO, fid)
+            self.assertEqual(0, main(['run', path, '-o', directory, '-j', '1']))
+    # end test_run_scenario
+
+
+    def test_render(self):
+        _, config, _ = expand(SCENARIO)[0]
+        soln, results = run(config)
+        self.assertEqual(float(soln.max_time()) * SCENARIO['dt'], results['max_time'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'soln.npz')
+            save_solution(soln, path)
+            output = os.path.join(directory, 'figures')
+
+            # the arguments of render are passed through to rufus.render
+            with contextlib.redirect_stdout(io.StringIO()):
+                status = main(['render', path, '-o', output, '-j', '1', '--dpi', '50', '--format', 'png'])
+            self.assertEqual(0, status)
+            self.assertEqual(1, len(os.listdir(output)))
+
+            # including --help, which is the help of rufus.render
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out), self.assertRaises(SystemExit) as cm:
+                main(['render', '--help'])
+            self.assertEqual(0, cm.exception.code)
+            self.assertIn('--density', out.getvalue())
+    # end test_render
+
+# end CliTest
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the codegen module.
+'''
+
+# Standard Imports
+import os
+import tempfile
+import unittest
+
+# External Imports
+import numpy as np
+import sympy
+
+# Local Imports
+from rufus.codegen import digest, generate, load_module, load_or_generate
+
+
+class CodegenTest(unittest.TestCase):
+
+    def setUp(self):
+        x, y = sympy.symbols('x y')
+        self._args = [x, y]
+        self._exprs = [sympy.sin(x + y) * sympy.cos(x + y), (x + y)**2, sympy.Integer(3)]
+        self._expected = lambda z: np.column_stack([
+            np.sin(z[:, 0] + z[:, 1]) * np.cos(z[:, 0] + z[:, 1]),
+            (z[:, 0] + z[:, 1])**2,
+            np.full(len(z), 3.0)
+        ])
+    # end setUp
+
+
+    def test_generate(self):
+        module = load_module(generate({'f': (self._args, self._exprs)}))
+
+        z = np.random.sample((10, 2))
+        np.testing.assert_allclose(self._expected(z), module.f(z))
+    # end test_generate
+
+
+    def test_load_or_generate(self):
+        key = digest(self._args, self._exprs)
+        self.assertEqual(key, digest(self._args, self._exprs))
+        self.assertNotEqual(key, digest(self._args, self._exprs[:2]))
+
+        built = []
+        def build():
+            built.append(True)
+            return {'f': (self._args, self._exprs)}
+
+        with tempfile.TemporaryDirectory() as directory:
+            first = load_or_generate(key, build, directory)
+            second = load_or_generate(key, build, directory)
+            self.assertEqual(1, len(built))
+            self.assertEqual(1, len(os.listdir(directory)))
+
+            z = np.random.sample((10, 2))
+            np.testing.assert_allclose(first.f(z), second.f(z))
+    # end test_load_or_generate
+
+# end CodegenTest
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the dubins_car module.
+'''
+
+# Standard Imports
+import os
+import tempfile
+import unittest
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.dubins_car import (
+        DubinsCostTable,
+        path_lengths,
+        sample_path,
+        sample_paths,
+        shortest_paths
+)
+
+try:
+    import dubins
+except ImportError:
+    dubins = None
+
+
+def _random_configurations(n, seed):
+    rng = np.random.RandomState(seed)
+    return np.column_stack([
+        rng.uniform(-30.0, 30.0, (n, 2)),
+        rng.uniform(-np.pi, np.pi, n)
+    ])
+# end _random_configurations
+
+
+class DubinsCarTest(unittest.TestCase):
+
+    def setUp(self):
+        self._q0 = _random_configurations(500, 0)
+        self._q1 = _random_configurations(500, 1)
+        self._rho = 3.0
+    # end setUp
+
+
+    @unittest.skipIf(dubins is None, 'dubins is not installed')
+    def test_shortest_paths(self):
+        types, params = shortest_paths(self._q0, self._q1, self._rho)
+
+        for q0, q1, ty, p in zip(self._q0, self._q1, types, params):
+            path = dubins.shortest_path(q0, q1, self._rho)
+            self.assertEqual(path.path_type(), ty)
+            np.testing.assert_allclose(
+                    [path.segment_length_normalized(i) for i in range(3)],
+                    p,
+                    atol=1e-9
+            )
+    # end test_shortest_paths
+
+
+    @unittest.skipIf(dubins is None, 'dubins is not installed')
+    def test_sample_paths(self):
+        step = 0.1
+        types, params = shortest_paths(self._q0, self._q1, self._rho)
+        samples, offsets = sample_paths(self._q0, types, params, self._rho, step)
+
+        self.assertEqual((offsets[-1], 3), samples.shape)
+        for i, (q0, q1) in enumerate(zip(self._q0, self._q1)):
+            expected, _ = dubins.shortest_path(q0, q1, self._rho).sample_many(step)
+            np.testing.assert_allclose(np.array(expected), samples[offsets[i]:offsets[i + 1]], atol=1e-9)
+
+        # single path
+        np.testing.assert_array_equal(
+                samples[offsets[1]:offsets[2]],
+                sample_path(self._q0[1], types[1], params[1], self._rho, step)
+        )
+    # end test_sample_paths
+
+
+    def test_path_lengths(self):
+        # straight line
+        lengths = path_lengths(np.array([0.0, 0.0, 0.0]), np.array([10.0, 0.0, 0.0]), 1.0)
+        np.testing.assert_allclose(lengths, [10.0])
+
+        # half circle
+        lengths = path_lengths(np.array([0.0, 0.0, 0.0]), np.array([0.0, 2.0, np.pi]), 1.0)
+        np.testing.assert_allclose(lengths, [np.pi])
+    # end test_path_lengths
+
+
+    def test_cost_table(self):
+        table = DubinsCostTable.build((41, 41, 24), extent=5.0)
+        exact = path_lengths(self._q0, self._q1, self._rho)
+
+        lengths, error = table.path_length(self._q0, self._q1, self._rho, return_error=True)
+        self.assertTrue(np.all(np.abs(lengths - exact) <= error + 1e-6))
+        self.assertTrue(np.all(table.lower_bound(self._q0, self._q1, self._rho) <= exact + 1e-6))
+
+        # scalar queries
+        length = table.path_length(self._q0[0], self._q1[0], self._rho)
+        self.assertIsInstance(length, float)
+        self.assertAlmostEqual(lengths[0], length)
+    # end test_cost_table
+
+
+    def test_cost_table_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            table = DubinsCostTable.load_or_build((11, 11, 8), 2.0, directory)
+            self.assertEqual(1, len(os.listdir(directory)))
+
+            cached = DubinsCostTable.load_or_build((11, 11, 8), 2.0, directory)
+            np.testing.assert_array_equal(table.lengths, cached.lengths)
+            np.testing.assert_array_equal(table.error, cached.error)
+
+            DubinsCostTable.load_or_build((11, 11, 16), 2.0, directory)
+            self.assertEqual(2, len(os.listdir(directory)))
+    # end test_cost_table_cache
+
+# end DubinsCarTest
@@ -10,13 +10,24 @@ Unit tests for the tree module.
 '''
 
 # Standard Imports
+import pickle
 import unittest
 
 # External Imports
 import numpy as np
 
 # Local Imports
-from rufus.game import BoxRegion, LinearActor
+from rufus.actors import LinearActor
+from rufus.game import (
+        BallRegion,
+        BoxRegion,
+        CaptureRadius,
+        DifferenceRegion,
+        IntersectionRegion,
+        PolytopeRegion,
+        UnionRegion,
+        Vertex
+)
 
 
 class GameTest(unittest.TestCase):
@@ -95,6 +106,88 @@ class GameTest(unittest.TestCase):
         self.assertTrue(vol >= 0.9 * expected_vol)
     # end test_3d_region
 
-# end GameTest
 
+    def test_contains_many(self):
+        box = BoxRegion(np.array([0.0, 0.0]), np.array([10.0, 10.0]))
+        ball = BallRegion(np.array([10.0, 10.0]), 5.0)
+        triangle = PolytopeRegion.from_vertices([[0.0, 0.0], [0.0, 10.0], [10.0, 0.0]])
+
+        points = np.random.sample((1000, 2)) * 20.0 - 2.5
+        for region in [
+                box,
+                ball,
+                triangle,
+                box | ball,
+                box & ball,
+                box - triangle,
+                UnionRegion(ball, triangle),
+                IntersectionRegion(box, ball, triangle),
+                DifferenceRegion(box, ball, triangle)]:
+
+            expected = np.array([pt in region for pt in points])
+            np.testing.assert_array_equal(expected, region.contains_many(points))
+
+        # the triangle is clockwise, so its orientation must be corrected
+        self.assertTrue(np.array([1.0, 1.0]) in triangle)
+        self.assertFalse(np.array([6.0, 6.0]) in triangle)
+        self.assertTrue(np.array([6.0, 6.0]) in box - triangle)
+    # end test_contains_many
+
+
+    def test_sample_many(self):
+        box = BoxRegion(np.array([0.0, 0.0, 0.0]), np.array([10.0, 10.0, 10.0]))
+        ball = BallRegion(np.array([10.0, 10.0, 10.0]), 5.0)
+        polytope = PolytopeRegion(
+                np.vstack([np.eye(3), -np.eye(3)]),
+                np.array([1.0, 2.0, 3.0, 1.0, 2.0, 3.0]),
+                np.array([-1.0, -2.0, -3.0]),
+                np.array([1.0, 2.0, 3.0])
+        )
+
+        for region in [box, ball, polytope, box | ball, box & ball, box - ball]:
+            samples = region.sample_many(500)
+            self.assertEqual((500, 3), samples.shape)
+            self.assertTrue(np.all(region.contains_many(samples)))
+
+            lower, upper = region.bounds()
+            self.assertTrue(np.all(samples >= lower) and np.all(samples <= upper))
+
+            self.assertTrue(region.sample() in region)
+    # end test_sample_many
+
+
+    def test_intersects_segments(self):
+        # segments that cross each region between their endpoints
+        starts = np.array([[-5.0, 5.0], [-5.0, 5.0], [-5.0, 20.0]])
+        ends = np.array([[15.0, 5.0], [-1.0, 5.0], [15.0, 20.0]])
+        expected = np.array([True, False, False])
+
+        box = BoxRegion(np.array([0.0, 0.0]), np.array([10.0, 10.0]))
+        ball = BallRegion(np.array([5.0, 5.0]), 2.0)
+        square = PolytopeRegion.from_vertices([[0.0, 0.0], [10.0, 0.0], [10.0, 10.0], [0.0, 10.0]])
+
+        for region in [box, ball, square, ball | square, box & ball, box - ball]:
+            np.testing.assert_array_equal(expected, region.intersects_segments(starts, ends))
+    # end test_intersects_segments
+
+
+    def test_capture_radius(self):
+        v_p = Vertex(np.array([0.0, 0.0]), 0.0, np.array([]))
+        near = Vertex(np.array([3.0, 0.0]), None, np.array([]))
+        behind = Vertex(np.array([-3.0, 0.0]), None, np.array([]))
+        far = Vertex(np.array([6.0, 0.0]), None, np.array([]))
+
+        capture = CaptureRadius(5.0)
+        self.assertTrue(capture(v_p, near))
+        self.assertTrue(capture(v_p, behind))
+        self.assertFalse(capture(v_p, far))
+
+        pointing = CaptureRadius(5.0, half_angle=np.pi / 2)
+        self.assertTrue(pointing(v_p, near))
+        self.assertFalse(pointing(v_p, behind))
+
+        # the predicate must survive being sent to a worker process
+        self.assertTrue(pickle.loads(pickle.dumps(pointing))(v_p, near))
+    # end test_capture_radius
 
+# end GameTest
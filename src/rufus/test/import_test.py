@@ -0,0 +1,82 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Regression tests for the import-time cost of rufus.
+
+Heavy, optional dependencies must only be imported when the feature that needs
+them is used. Each check runs in a fresh interpreter, since this process has
+likely imported them already.
+'''
+
+# Standard Imports
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# External Imports
+
+# Local Imports
+import rufus
+from rufus._lazy import lazy_import
+
+
+HEAVY = ['matplotlib', 'sympy', 'dubins', 'rufus.third_party.dubins_airplane']
+
+
+def _loaded_after(code):
+    '''Run code in a fresh interpreter and return the heavy modules it loaded.'''
+    script = code + '\nimport sys, json\nprint(json.dumps([m for m in %r if m in sys.modules]))' % HEAVY
+
+    env = dict(os.environ)
+    src = os.path.dirname(os.path.dirname(os.path.abspath(rufus.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([src] + [p for p in [env.get('PYTHONPATH')] if p])
+
+    output = subprocess.run(
+            [sys.executable, '-c', script],
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE
+    ).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+# end _loaded_after
+
+
+class ImportTest(unittest.TestCase):
+
+    def test_no_heavy_imports(self):
+        loaded = _loaded_after(
+                'import rufus.actors, rufus.analysis, rufus.codegen, rufus.game, '
+                'rufus.solution, rufus.solver, rufus.storage, rufus.visualization'
+        )
+        self.assertEqual([], loaded)
+    # end test_no_heavy_imports
+
+
+    def test_loaded_on_use(self):
+        loaded = _loaded_after(
+                'import numpy as np\n'
+                'from rufus.actors import DubinsCar\n'
+                'DubinsCar(0.1, 1.0).steer(np.array([0.0, 0.0]), np.array([5.0, 5.0]), 0.0)'
+        )
+        self.assertEqual(['dubins'], loaded)
+    # end test_loaded_on_use
+
+
+    def test_lazy_import(self):
+        json_proxy = lazy_import('json')
+        self.assertIs(json.dumps, json_proxy.dumps)
+        self.assertIn('loads', dir(json_proxy))
+    # end test_lazy_import
+
+# end ImportTest
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the integrate module.
+'''
+
+# Standard Imports
+import unittest
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.integrate import rk4
+
+
+class IntegrateTest(unittest.TestCase):
+
+    def test_rk4(self):
+        # xdot = -k * x, with a different rate k (the control) for each problem
+        f = lambda x, u: -u * x
+
+        x0 = np.array([[1.0], [2.0], [3.0]])
+        k = np.array([0.5, 1.0, 2.0])
+        u = np.tile(k.reshape((-1, 1, 1)), (1, 100, 1))
+
+        x = rk4(f, x0, u, 0.01)
+        self.assertEqual((3, 101, 1), x.shape)
+        np.testing.assert_array_equal(x0, x[:, 0])
+
+        t = 0.01 * np.arange(101)
+        expected = x0 * np.exp(-k.reshape((-1, 1)) * t)
+        np.testing.assert_allclose(expected, x[:, :, 0], rtol=1e-8)
+    # end test_rk4
+
+
+    def test_rk4_autonomous(self):
+        # harmonic oscillator, no controls
+        f = lambda x, u: np.column_stack([x[:, 1], -x[:, 0]])
+
+        x = rk4(f, np.array([[1.0, 0.0]]), np.zeros((1, 628, 0)), 0.01)
+        np.testing.assert_allclose([np.cos(6.28), -np.sin(6.28)], x[0, -1], atol=1e-8)
+    # end test_rk4_autonomous
+
+# end IntegrateTest
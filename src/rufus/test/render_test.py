@@ -0,0 +1,74 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the render module.
+'''
+
+# Standard Imports
+import os
+import pickle
+import tempfile
+import unittest
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.actors import LinearActor
+from rufus.game import BoxRegion, Vertex
+from rufus.render import render_many
+from rufus.solver import Solver
+from rufus.storage import save_solution
+
+
+class RenderTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        space = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        check_capture = lambda v_p, v_e: np.linalg.norm(v_e.loc - v_p.loc) < 5.0
+
+        solver = Solver(1.0, space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), check_capture, gamma=100.0, stride=3)
+        self._soln = solver.solve(
+                Vertex(np.array([0.0, 0.0]), 0.5, np.array([])),
+                Vertex(np.array([50.0, 50.0]), None, np.array([])),
+                50
+        )
+    # end setUp
+
+
+    def test_render_many(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pickled = os.path.join(directory, 'a.pkl')
+            with open(pickled, 'wb') as fid:
+                pickle.dump(self._soln, fid)
+
+            saved = os.path.join(directory, 'b.npz')
+            save_solution(self._soln, saved)
+
+            missing = os.path.join(directory, 'missing.pkl')
+            output = os.path.join(directory, 'figures')
+
+            results = render_many([pickled, saved, missing], output, workers=1, formats=('png', 'svg'), dpi=50)
+
+            self.assertEqual([r[0] for r in results], [pickled, saved, missing])
+            for path, written, error in results[:2]:
+                self.assertIsNone(error)
+                self.assertEqual(len(written), 2)
+                for filename in written:
+                    self.assertGreater(os.path.getsize(filename), 0)
+
+            self.assertEqual(results[2][1], [])
+            self.assertIsNotNone(results[2][2])
+    # end test_render_many
+
+# end RenderTest
+
+
+if __name__ == '__main__':
+    unittest.main()
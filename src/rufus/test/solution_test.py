@@ -0,0 +1,65 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the solution module.
+'''
+
+# Standard Imports
+import tempfile
+import unittest
+
+# External Imports
+import numpy as np
+import sympy
+
+# Local Imports
+from rufus.solution import Game, Payoff, TerminalSurface, solve
+
+
+class SolutionTest(unittest.TestCase):
+
+    def test_solve(self):
+        # the time for a point of speed w to reach the circle of radius r. The
+        # optimal paths are radial, and the value is (|x| - r) / w
+        w, r = 2.0, 1.0
+        x, y, phi, s = sympy.symbols('x y phi s')
+
+        game = Game('simple', [x, y], [w * sympy.cos(phi), w * sympy.sin(phi)])
+        v1, v2 = game.value_gradient
+        game.controls = {phi: sympy.atan2(-v2, -v1)}
+
+        terminal = TerminalSurface(
+                [s],
+                [r * sympy.cos(s), r * sympy.sin(s)],
+                [0.0],
+                [2 * np.pi],
+                normal=[sympy.cos(s), sympy.sin(s)]
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = solve(game, Payoff(G=1), terminal, samples=16, duration=2.0, dt=0.05, directory=directory)
+            cached = solve(game, Payoff(G=1), terminal, samples=16, duration=2.0, dt=0.05, directory=directory)
+
+        np.testing.assert_array_equal(paths.states, cached.states)
+        self.assertEqual(16, len(paths))
+        self.assertEqual((16, 41, 2), paths.states.shape)
+
+        radius = np.linalg.norm(paths.states, axis=2)
+        np.testing.assert_allclose(r + w * paths.time, radius[0], rtol=1e-8)
+        np.testing.assert_allclose(np.tile(paths.time, (16, 1)), paths.values, atol=1e-8)
+
+        # the value gradient points away from the circle with magnitude 1 / w
+        outward = paths.states / radius[:, :, np.newaxis]
+        np.testing.assert_allclose(outward / w, paths.gradients, atol=1e-8)
+    # end test_solve
+
+# end SolutionTest
+
+
+if __name__ == '__main__':
+    unittest.main()
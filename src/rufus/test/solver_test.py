@@ -0,0 +1,388 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the solver module.
+'''
+
+# Standard Imports
+import pickle
+import unittest
+
+# External Imports
+import numpy as np
+from treelib.tree import Tree
+
+# Local Imports
+from rufus.actors import LinearActor
+from rufus.game import BoxRegion, Vertex
+from rufus.solver import Phase, Solver
+import rufus.tree as t
+
+
+def _capture(v_p, v_e):
+    '''A capture check that, unlike a lambda, can be pickled.'''
+    return np.linalg.norm(v_e.loc - v_p.loc) < 5.0
+# end _capture
+
+
+class CountingActor(LinearActor):
+    '''A LinearActor that counts the trajectories it steers.'''
+
+    def __init__(self, dt, speed):
+        super().__init__(dt, speed)
+        self.steered = 0
+    # end __init__
+
+
+    def steer(self, start, end, state):
+        self.steered += 1
+        return super().steer(start, end, state)
+    # end steer
+
+# end CountingActor
+
+
+class PruneRecorder(Solver):
+    '''A Solver that records the value of the game around each evader prune.'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pruned = 0
+        self.values = []
+    # end __init__
+
+
+    def _prune(self, g, gamma, pursuer):
+        before = self._costs_e.max()[1]
+        pruned = super()._prune(g, gamma, pursuer)
+        if pruned and not pursuer:
+            self.pruned += pruned
+            self.values.append((before, self._costs_e.max()[1]))
+
+        return pruned
+    # end _prune
+
+# end PruneRecorder
+
+
+class SolverTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self._space = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        self._check_capture = lambda v_p, v_e: np.linalg.norm(v_e.loc - v_p.loc) < 5.0
+    # end setUp
+
+
+    def _solve(self, iters, progress=None, schedule=None, evader=None, **kwargs):
+        solver = Solver(
+                1.0,
+                self._space,
+                LinearActor(1.0, 2.0),
+                LinearActor(1.0, 1.0) if evader is None else evader,
+                self._check_capture,
+                gamma=100.0,
+                **kwargs
+        )
+        soln = solver.solve(
+                Vertex(np.array([0.0, 0.0]), None, np.array([])),
+                Vertex(np.array([50.0, 50.0]), None, np.array([])),
+                iters,
+                progress=lambda i, n: progress(solver, i) if progress else None,
+                schedule=schedule
+        )
+        return solver, soln
+    # end _solve
+
+
+    def _assert_costs(self, soln):
+        g = soln.evader_tree()
+        costs = soln.costs_to_come()
+        self.assertEqual(len(g), len(costs))
+        for n in g.all_nodes_itr():
+            self.assertAlmostEqual(t.time(g, n), costs[n.identifier])
+    # end _assert_costs
+
+
+    def test_costs(self):
+        _, soln = self._solve(150)
+
+        g = soln.evader_tree()
+        costs = soln.costs_to_come()
+        self.assertEqual(len(g), len(costs))
+        for n in g.all_nodes_itr():
+            self.assertEqual(t.time(g, n), costs[n.identifier])
+
+        leaf = max(g.leaves(), key=lambda n: t.time(g, n))
+        self.assertEqual(t.time(g, leaf), soln.max_time())
+    # end test_costs
+
+
+    def test_budget(self):
+        sizes = []
+        solver, soln = self._solve(
+                300,
+                progress=lambda s, i: sizes.append(len(s.solution().evader_tree())),
+                max_nodes=(50, None),
+                stale_after=50
+        )
+
+        self.assertLessEqual(max(sizes), 50)
+        self.assertGreater(len(soln.pursuer_tree()), 50)
+
+        # the bookkeeping follows the pruned tree
+        g = soln.evader_tree()
+        costs = soln.costs_to_come()
+        self.assertEqual(len(g), len(costs))
+        for n in g.all_nodes_itr():
+            self.assertEqual(t.time(g, n), costs[n.identifier])
+
+        target = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        self.assertEqual(len(g), len(soln.query_edges(target.lower, target.upper)))
+    # end test_budget
+
+
+    def test_budget_value(self):
+        solver = PruneRecorder(
+                1.0,
+                self._space,
+                LinearActor(1.0, 2.0),
+                LinearActor(1.0, 1.0),
+                self._check_capture,
+                gamma=100.0,
+                max_nodes=(50, None),
+                stale_after=20
+        )
+        soln = solver.solve(
+                Vertex(np.array([0.0, 0.0]), None, np.array([])),
+                Vertex(np.array([50.0, 50.0]), None, np.array([])),
+                300
+        )
+
+        # pruning never removes the vertex that holds the value of the game
+        self.assertGreater(solver.pruned, 100)
+        for before, after in solver.values:
+            self.assertEqual(before, after)
+        self.assertLessEqual(len(soln.evader_tree()), 50)
+    # end test_budget_value
+
+
+    def test_budget_pursuer(self):
+        # slow pursuer leaves may still capture later evader vertices, so only
+        # stale ones are pruned
+        _, soln = self._solve(150, max_nodes=(None, 20))
+        self.assertEqual(151, len(soln.pursuer_tree()))
+
+        sizes = []
+        _, soln = self._solve(
+                150,
+                progress=lambda s, i: sizes.append(len(s.solution().pursuer_tree())),
+                max_nodes=(None, 20),
+                stale_after=10
+        )
+        self.assertLess(max(sizes), 40)
+    # end test_budget_pursuer
+
+
+    def test_removed_vertices(self):
+        seen = {}
+        _, soln = self._solve(
+                100,
+                progress=lambda s, i: seen.update(
+                    (n.identifier, n.data) for n in s.solution().evader_tree().all_nodes_itr()),
+                max_nodes=(50, None),
+                stale_after=20
+        )
+
+        # without a trajectory store, removed vertices keep their trajectories
+        removed = [v for k, v in seen.items() if k not in soln.evader_tree()]
+        self.assertGreater(len(removed), 0)
+        for v in removed:
+            self.assertEqual(2, v.trajectory.shape[1])
+    # end test_removed_vertices
+
+
+    def test_dominated(self):
+        solver = Solver(1.0, self._space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), self._check_capture,
+                prune_radius=2.0, prune_tolerance=0.1)
+
+        # 0 -> 1 -> 2 and 0 -> 3 -> 4, where 2 is only near its parent and 4 is
+        # near the faster vertex 1 on the other branch
+        g = Tree()
+        g.create_node(identifier=0, data=Vertex(np.array([0.0, 0.0]), 0.0, np.array([]), 0))
+        g.create_node(identifier=1, parent=0, data=Vertex(np.array([10.0, 0.0]), 0.0, np.zeros((1, 2)), 10))
+        g.create_node(identifier=2, parent=1, data=Vertex(np.array([11.0, 0.0]), 0.0, np.zeros((1, 2)), 1))
+        g.create_node(identifier=3, parent=0, data=Vertex(np.array([20.0, 5.0]), 0.0, np.zeros((1, 2)), 21))
+        g.create_node(identifier=4, parent=3, data=Vertex(np.array([10.5, 0.0]), 0.05, np.zeros((1, 2)), 11))
+        solver._costs_e = t.CostToCome.from_tree(g)
+
+        leaves = [g[2], g[4]]
+        cost = np.array([solver._costs_e[n.identifier] for n in leaves])
+        self.assertEqual([1], list(solver._dominated(g, leaves, cost, 1.0)))
+
+        # a vertex in a different state does not dominate
+        g[4].data.state = 0.5
+        self.assertEqual([], list(solver._dominated(g, leaves, cost, 1.0)))
+    # end test_dominated
+
+
+    def test_heuristic(self):
+        exact = CountingActor(1.0, 1.0)
+        np.random.seed(0)
+        _, soln = self._solve(0, schedule=[Phase(150)], evader=exact)
+        self._assert_costs(soln)
+
+        heuristic = CountingActor(1.0, 1.0)
+        np.random.seed(0)
+        _, soln = self._solve(0, schedule=[Phase(150, exact=False)], evader=heuristic)
+        self._assert_costs(soln)
+
+        # the same samples are extended with far fewer trajectories steered
+        self.assertGreater(len(soln.evader_tree()), 100)
+        self.assertLess(heuristic.steered, exact.steered / 2)
+    # end test_heuristic
+
+
+    def test_rescale(self):
+        _, coarse = self._solve(100)
+        np.random.seed(0)
+        _, fine = self._solve(0, schedule=[Phase(100), Phase(0, dt=0.5)])
+
+        # halving the time increment doubles the number of time steps
+        expected = sorted(coarse.costs_to_come()[k] for k in coarse.evader_tree().nodes)
+        actual = sorted(fine.costs_to_come()[k] for k in fine.evader_tree().nodes)
+        np.testing.assert_allclose(2 * np.array(expected), actual)
+        self._assert_costs(fine)
+    # end test_rescale
+
+
+    def test_refine(self):
+        solver, soln = self._solve(100)
+        g = soln.evader_tree()
+        leaf = max(g.leaves(), key=lambda n: t.time(g, n))
+
+        evader = LinearActor(1.0, 1.0)
+        fine = evader.with_dt(0.25)
+        self.assertEqual(1.0, evader._dt)
+
+        refined = solver.refine(g, [leaf], fine)
+        self.assertEqual(g.depth(leaf), len(refined))
+        self.assertIs(leaf, refined[-1])
+        for n in refined:
+            parent = g.parent(n.identifier)
+            _, trajectory = fine.steer(parent.data.loc, n.data.loc, parent.data.state)
+            self.assertEqual(len(trajectory), n.data.time())
+
+        # the tracked costs are consistent once rebuilt
+        costs = t.CostToCome.from_tree(g)
+        for n in g.all_nodes_itr():
+            self.assertEqual(t.time(g, n), costs[n.identifier])
+    # end test_refine
+
+
+    def test_schedule(self):
+        target = BoxRegion(np.array([70.0, 70.0]), np.array([80.0, 80.0]))
+        reached = []
+        schedule = [
+            Phase(150, exact=False),
+            Phase(50, dt=0.5, refine=5, targets=[target])
+        ]
+        _, soln = self._solve(
+                0,
+                progress=lambda s, i: reached.append(s.solution().can_reach(target)) if i == 149 else None,
+                schedule=schedule
+        )
+
+        # refining the branches that reach the target keeps them
+        self.assertEqual([True], reached)
+        self.assertTrue(soln.can_reach(target))
+        self._assert_costs(soln)
+
+        # the branch that reaches the target was steered at the fine time
+        # increment, not just rescaled
+        fine = LinearActor(0.5, 1.0)
+        g = soln.evader_tree()
+        n = soln.reachable_nodes(target)[0]
+        while not n.is_root():
+            parent = g.parent(n.identifier)
+            _, trajectory = fine.steer(parent.data.loc, n.data.loc, parent.data.state)
+            self.assertEqual(len(trajectory), n.data.time())
+            n = parent
+    # end test_schedule
+
+
+    def test_pursuer_tree(self):
+        solver = Solver(
+                1.0,
+                self._space,
+                LinearActor(1.0, 2.0),
+                LinearActor(1.0, 1.0),
+                self._check_capture,
+                gamma=100.0
+        )
+        g_p = solver.grow(Vertex(np.array([0.0, 0.0]), None, np.array([])), 100)
+        self.assertEqual(101, len(g_p))
+        nodes = set(g_p.nodes)
+
+        for start in ([50.0, 50.0], [90.0, 10.0]):
+            soln = solver.solve(None, Vertex(np.array(start), None, np.array([])), 50, pursuer_tree=g_p)
+
+            # the shared tree is used as-is
+            self.assertIs(g_p, soln.pursuer_tree())
+            self.assertEqual(nodes, set(g_p.nodes))
+            self.assertGreater(len(soln.evader_tree()), 1)
+    # end test_pursuer_tree
+
+
+    def test_track_changes(self):
+        solver = Solver(1.0, self._space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), self._check_capture,
+                gamma=100.0, max_nodes=(50, None), stale_after=20)
+        log = solver.track_changes()
+
+        # a copy of the trees' edges that is only updated from the log
+        mirror = [{}, {}]
+
+        def progress(i, n):
+            trees = (solver.solution().evader_tree(), solver.solution().pursuer_tree())
+            changed = log.pop()
+            for k, g in enumerate(trees):
+                identifiers = g.nodes.keys() if changed is None else changed[k]
+                for identifier in identifiers:
+                    if identifier in g:
+                        mirror[k][identifier] = g[identifier].data.trajectory.copy()
+                    else:
+                        mirror[k].pop(identifier, None)
+
+                self.assertEqual(set(g.nodes), set(mirror[k]))
+                for identifier, trajectory in mirror[k].items():
+                    np.testing.assert_array_equal(g[identifier].data.trajectory, trajectory)
+        # end progress
+
+        for start in ([50.0, 50.0], [90.0, 10.0]):
+            mirror = [{}, {}]
+            solver.solve(
+                    Vertex(np.array([0.0, 0.0]), None, np.array([])),
+                    Vertex(np.array(start), None, np.array([])),
+                    100,
+                    progress=progress
+            )
+
+        # changes are only recorded while the log is referenced
+        self.assertEqual(1, len(solver._subscribers))
+        del log
+        self.assertEqual(0, len(solver._subscribers))
+
+        # nor do they follow a pickled solver
+        solver = Solver(1.0, self._space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), _capture)
+        log = solver.track_changes()
+        copy = pickle.loads(pickle.dumps(solver))
+        self.assertEqual(0, len(copy._subscribers))
+        self.assertEqual(1, len(solver._subscribers))
+    # end test_track_changes
+
+# end SolverTest
@@ -0,0 +1,55 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the spatial module.
+'''
+
+# Standard Imports
+import unittest
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.spatial import EdgeIndex
+
+
+class EdgeIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self._lower = rng.uniform(0.0, 100.0, (1000, 2))
+        self._upper = self._lower + rng.uniform(0.0, 5.0, (1000, 2))
+        self._keys = ['e%d' % i for i in range(1000)]
+        self._index = EdgeIndex(self._keys, self._lower, self._upper, leaf_size=8, fanout=4)
+    # end setUp
+
+
+    def test_query(self):
+        rng = np.random.RandomState(1)
+        for _ in range(50):
+            lower = rng.uniform(0.0, 100.0, 2)
+            upper = lower + rng.uniform(0.0, 20.0, 2)
+
+            expected = {
+                k for k, lo, hi in zip(self._keys, self._lower, self._upper)
+                if np.all(lo <= upper) and np.all(hi >= lower)
+            }
+            self.assertEqual(expected, set(self._index.query(lower, upper)))
+    # end test_query
+
+
+    def test_query_empty(self):
+        self.assertEqual([], self._index.query([200.0, 200.0], [300.0, 300.0]))
+        self.assertEqual([], EdgeIndex([], np.zeros((0, 2)), np.zeros((0, 2))).query([0, 0], [1, 1]))
+
+        index = EdgeIndex(['a'], [[0.0, 0.0]], [[1.0, 1.0]])
+        self.assertEqual(['a'], index.query([0.5, 0.5], [2.0, 2.0]))
+    # end test_query_empty
+
+# end EdgeIndexTest
@@ -0,0 +1,234 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the storage module.
+'''
+
+# Standard Imports
+import mmap
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.actors import LinearActor
+from rufus.game import BoxRegion, Vertex
+from rufus.solver import Solver
+import rufus.storage as storage
+from rufus.storage import TrajectoryStore, load_solution, save_solution
+
+
+def _is_mapped(a):
+    '''Check if an array is a view of a memory mapped file.'''
+    while a is not None:
+        if isinstance(a, mmap.mmap):
+            return True
+        a = getattr(a, 'base', None)
+
+    return False
+# end _is_mapped
+
+
+class StorageTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        space = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        check_capture = lambda v_p, v_e: np.linalg.norm(v_e.loc - v_p.loc) < 5.0
+
+        solver = Solver(1.0, space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), check_capture, gamma=100.0, stride=3)
+        self._soln = solver.solve(
+                Vertex(np.array([0.0, 0.0]), 0.5, np.array([])),
+                Vertex(np.array([50.0, 50.0]), None, np.array([])),
+                100
+        )
+        self._target = BoxRegion(np.array([60.0, 60.0]), np.array([80.0, 80.0]))
+    # end setUp
+
+
+    def _assert_equal(self, loaded):
+        for expected, actual in [
+                (self._soln.evader_tree(), loaded.evader_tree()),
+                (self._soln.pursuer_tree(), loaded.pursuer_tree())]:
+            self.assertEqual(expected.root, actual.root)
+            self.assertEqual(set(expected.nodes), set(actual.nodes))
+
+            for n in expected.all_nodes_itr():
+                m = actual[n.identifier]
+                if not n.is_root():
+                    self.assertEqual(expected.parent(n.identifier).identifier, actual.parent(m.identifier).identifier)
+
+                np.testing.assert_array_equal(n.data.loc, m.data.loc)
+                np.testing.assert_array_equal(n.data.state, m.data.state)
+                self.assertEqual(n.data.time(), m.data.time())
+                self.assertEqual(n.data.trajectory.size, m.data.trajectory.size)
+                if n.data.trajectory.size:
+                    np.testing.assert_array_equal(n.data.trajectory, m.data.trajectory)
+
+        self.assertEqual(self._soln.max_time(), loaded.max_time())
+        self.assertEqual(self._soln.can_reach(self._target), loaded.can_reach(self._target))
+        np.testing.assert_array_equal(self._soln.max_time_trajectory()[1], loaded.max_time_trajectory()[1])
+    # end _assert_equal
+
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'soln')
+            save_solution(self._soln, path)
+            self.assertTrue(os.path.exists(os.path.join(path, 'meta.json')))
+
+            loaded = load_solution(path)
+            leaf = loaded.evader_tree().leaves()[0]
+            self.assertFalse(leaf.data.trajectory.flags.writeable)
+            self._assert_equal(loaded)
+            self._assert_equal(load_solution(path, mmap=False))
+    # end test_directory
+
+
+    def test_mmap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'soln')
+            save_solution(self._soln, path)
+
+            # trajectories stay views of the files until they are used
+            for mapped in (True, False):
+                loaded = load_solution(path, mmap=mapped)
+                for g in (loaded.evader_tree(), loaded.pursuer_tree()):
+                    for n in g.all_nodes_itr():
+                        self.assertEqual(mapped, _is_mapped(n.data.trajectory))
+                        self.assertFalse(_is_mapped(n.data.loc))
+    # end test_mmap
+
+
+    def test_build_tree(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'soln')
+            save_solution(self._soln, path)
+
+            # trees linked in bulk and trees built with Tree.create_node are
+            # the same, and can be modified like any other
+            for bulk in (storage._BULK, False):
+                with mock.patch.object(storage, '_BULK', bulk):
+                    loaded = load_solution(path)
+                self._assert_equal(loaded)
+
+                g = loaded.evader_tree()
+                leaf = g.leaves()[0]
+                parent = g.parent(leaf.identifier)
+                g.create_node(identifier='new', parent=leaf.identifier, data=Vertex(np.zeros(2), None, np.zeros((0, 2))))
+                self.assertEqual(leaf.identifier, g.parent('new').identifier)
+                self.assertEqual(g.depth(leaf) + 1, g.depth(g['new']))
+
+                g.remove_node(leaf.identifier)
+                self.assertNotIn('new', g)
+                self.assertNotIn(leaf.identifier, [c.identifier for c in g.children(parent.identifier)])
+    # end test_build_tree
+
+
+    def test_archive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for compress in (False, True):
+                path = os.path.join(directory, 'soln%d.npz' % compress)
+                save_solution(self._soln, path, compress=compress)
+                self._assert_equal(load_solution(path))
+    # end test_archive
+
+
+    def test_object_states(self):
+        g = self._soln.pursuer_tree()
+        g[g.root].data.state = {'heading': 0.5}
+
+        # states that are not numeric are pickled, in both formats
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('soln', 'soln.npz'):
+                path = os.path.join(directory, name)
+                save_solution(self._soln, path)
+                loaded = load_solution(path).pursuer_tree()
+                self.assertEqual({'heading': 0.5}, loaded[loaded.root].data.state)
+    # end test_object_states
+
+# end StorageTest
+
+
+class TrajectoryStoreTest(unittest.TestCase):
+
+    def test_put_get(self):
+        store = TrajectoryStore(budget=1000)
+        trajectories = [np.random.sample((10, 2)) for _ in range(20)]
+        keys = [store.put(tr) for tr in trajectories]
+
+        # 160 bytes each, so only the 6 most recent fit in the cache
+        self.assertEqual(960, store.resident_bytes)
+        self.assertEqual(3200, store.file_bytes)
+
+        for k, tr in zip(keys, trajectories):
+            np.testing.assert_array_equal(tr, store.get(k))
+            self.assertFalse(store.get(k).flags.writeable)
+        self.assertLessEqual(store.resident_bytes, 1000)
+
+        store.discard(keys[0])
+        self.assertNotIn(keys[0], store)
+        self.assertEqual(19, len(store))
+        store.close()
+    # end test_put_get
+
+
+    def test_vertex(self):
+        store = TrajectoryStore(budget=0)
+        trajectory = np.array([[0.0, 0.0], [1.0, 1.0]])
+        v = Vertex(np.array([2.0, 2.0]), None, trajectory)
+
+        v.spill(store)
+        self.assertEqual(0, store.resident_bytes)
+        np.testing.assert_array_equal(trajectory, v.trajectory)
+
+        # pickled vertices carry their trajectory
+        np.testing.assert_array_equal(trajectory, pickle.loads(pickle.dumps(v)).trajectory)
+
+        # replacing the trajectory releases the stored one
+        v.update(None, trajectory[:1])
+        self.assertEqual(0, len(store))
+        np.testing.assert_array_equal(trajectory[:1], v.trajectory)
+    # end test_vertex
+
+
+    def test_solver(self):
+        space = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        check_capture = lambda v_p, v_e: np.linalg.norm(v_e.loc - v_p.loc) < 5.0
+        init = lambda: (
+                Vertex(np.array([0.0, 0.0]), None, np.array([])),
+                Vertex(np.array([50.0, 50.0]), None, np.array([]))
+        )
+
+        solutions = []
+        store = TrajectoryStore(budget=4096)
+        for s in (None, store):
+            np.random.seed(1)
+            solver = Solver(1.0, space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), check_capture, gamma=100.0, store=s)
+            solutions.append(solver.solve(*init(), 100))
+
+        self.assertLessEqual(store.resident_bytes, 4096)
+        self.assertGreater(len(store), 0)
+
+        expected, actual = solutions
+
+        # captured vertices were removed, and the store only holds the
+        # trajectories of the vertices that are left (every one but the roots)
+        self.assertLess(len(actual.evader_tree()), 101)
+        self.assertEqual(len(actual.evader_tree()) + len(actual.pursuer_tree()) - 2, len(store))
+
+        self.assertEqual(expected.max_time(), actual.max_time())
+        np.testing.assert_array_equal(expected.max_time_trajectory()[1], actual.max_time_trajectory()[1])
+    # end test_solver
+
+# end TrajectoryStoreTest
@@ -0,0 +1,124 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the sweep module.
+'''
+
+# Standard Imports
+import unittest
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.actors import LinearActor
+from rufus.game import BoxRegion, CaptureRadius
+from rufus.solver import Solver
+from rufus.sweep import capture_map, grid
+
+
+class CountingSolver(Solver):
+    '''A Solver that counts the pursuer trees it grows and the games it solves.'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.grown = 0
+        self.solved = []
+    # end __init__
+
+
+    def grow(self, *args, **kwargs):
+        self.grown += 1
+        return super().grow(*args, **kwargs)
+    # end grow
+
+
+    def solve(self, *args, pursuer_tree=None, **kwargs):
+        self.solved.append(pursuer_tree)
+        return super().solve(*args, pursuer_tree=pursuer_tree, **kwargs)
+    # end solve
+
+# end CountingSolver
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        self._space = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        self._target = BoxRegion(np.array([70.0, 70.0]), np.array([100.0, 100.0]))
+    # end setUp
+
+
+    def _solver(self):
+        return CountingSolver(1.0, self._space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), CaptureRadius(5.0),
+                gamma=100.0)
+    # end _solver
+
+
+    def test_grid(self):
+        points = grid(BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 50.0])), (4, 2))
+        self.assertEqual((4, 2, 2), points.shape)
+        np.testing.assert_array_equal([12.5, 12.5], points[0, 0])
+        np.testing.assert_array_equal([87.5, 37.5], points[3, 1])
+    # end test_grid
+
+
+    def test_capture_map(self):
+        solver = self._solver()
+        starts = grid(self._space, (2, 2))
+        result = capture_map(solver, [0.0, 0.0], [0.0], starts, self._target, [0, 1], 30, workers=1)
+
+        self.assertEqual(2, result.seeds)
+        for field in (result.probability, result.time_mean, result.time_std, result.survival_mean):
+            self.assertEqual((1, 2, 2), field.shape)
+
+        self.assertTrue(np.all((result.probability >= 0) & (result.probability <= 1)))
+
+        # the evader starts inside the target in cell (1, 1)
+        self.assertEqual(1.0, result.probability[0, 1, 1])
+        self.assertEqual(0.0, result.time_mean[0, 1, 1])
+        self.assertEqual(0.0, result.time_std[0, 1, 1])
+
+        # cells where the target is never reached have no time statistics
+        never = result.probability == 0
+        self.assertTrue(np.all(np.isnan(result.time_mean[never])))
+    # end test_capture_map
+
+
+    def test_shared_trees(self):
+        solver = self._solver()
+        starts = grid(self._space, (2, 2))
+        capture_map(solver, [0.0, 0.0], [0.0, 1.0], starts, self._target, [0, 1, 2], 20, workers=1)
+
+        # one pursuer tree per (heading, seed), shared by all 4 evader starts
+        self.assertEqual(6, solver.grown)
+        self.assertEqual(24, len(solver.solved))
+        trees = [solver.solved[i:i + 4] for i in range(0, 24, 4)]
+        for shared in trees:
+            self.assertIsNotNone(shared[0])
+            self.assertTrue(all(g is shared[0] for g in shared))
+        self.assertEqual(6, len(set(id(shared[0]) for shared in trees)))
+    # end test_shared_trees
+
+
+    def test_workers(self):
+        # the solver, its capture predicate and the pursuer trees are sent to
+        # the worker processes, and the results do not depend on them
+        starts = grid(self._space, (2, 2))
+        expected = capture_map(self._solver(), [0.0, 0.0], [0.0, 1.0], starts, self._target, [0, 1], 20, workers=1)
+        actual = capture_map(self._solver(), [0.0, 0.0], [0.0, 1.0], starts, self._target, [0, 1], 20, workers=2)
+
+        for field in ('probability', 'time_mean', 'time_std', 'survival_mean'):
+            np.testing.assert_array_equal(getattr(expected, field), getattr(actual, field))
+    # end test_workers
+
+# end SweepTest
+
+
+if __name__ == '__main__':
+    unittest.main()
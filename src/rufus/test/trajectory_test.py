@@ -0,0 +1,85 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the trajectory module.
+'''
+
+# Standard Imports
+import unittest
+
+# External Imports
+import numpy as np
+
+# Local Imports
+from rufus.trajectory import decimate, segments, simplify
+
+
+class TrajectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        # a straight line followed by a quarter circle
+        line = np.column_stack([np.arange(0.0, 10.0, 0.1), np.zeros(100)])
+        theta = np.linspace(-np.pi / 2, 0.0, 50)
+        arc = np.column_stack([10.0 + 5.0 * np.cos(theta), 5.0 + 5.0 * np.sin(theta)])
+        self._trajectory = np.vstack([line, arc])
+    # end setUp
+
+
+    def test_simplify(self):
+        idx = simplify(self._trajectory, 0.05)
+        self.assertEqual(0, idx[0])
+        self.assertEqual(len(self._trajectory) - 1, idx[-1])
+        self.assertTrue(len(idx) < 20)
+
+        # every removed sample is within tolerance of the simplified polyline
+        kept = self._trajectory[idx]
+        for pt in self._trajectory:
+            d = np.min([
+                _distance(pt, a, b) for a, b in zip(kept[:-1], kept[1:])
+            ])
+            self.assertTrue(d <= 0.05 + 1e-12)
+
+        # a straight line needs only its endpoints
+        np.testing.assert_array_equal([0, 99], simplify(self._trajectory[:100], 1e-9))
+    # end test_simplify
+
+
+    def test_decimate(self):
+        # no decimation
+        self.assertIs(self._trajectory, decimate(self._trajectory))
+
+        stored = decimate(self._trajectory, stride=10)
+        self.assertEqual(16, len(stored))
+        np.testing.assert_array_equal(self._trajectory[0], stored[0])
+        np.testing.assert_array_equal(self._trajectory[-1], stored[-1])
+
+        stored = decimate(self._trajectory, stride=2, tolerance=0.05)
+        np.testing.assert_array_equal(self._trajectory[0], stored[0])
+        np.testing.assert_array_equal(self._trajectory[-1], stored[-1])
+        self.assertTrue(len(stored) < 20)
+    # end test_decimate
+
+
+    def test_segments(self):
+        starts, ends = segments(self._trajectory[:3], np.array([0.3, 0.0]))
+        np.testing.assert_array_equal(self._trajectory[:3], starts)
+        np.testing.assert_array_equal(np.vstack([self._trajectory[1:3], [[0.3, 0.0]]]), ends)
+
+        # root vertices have an empty trajectory
+        starts, ends = segments(np.array([]), np.array([1.0, 2.0]))
+        np.testing.assert_array_equal([[1.0, 2.0]], starts)
+        np.testing.assert_array_equal([[1.0, 2.0]], ends)
+    # end test_segments
+
+# end TrajectoryTest
+
+
+def _distance(pt, a, b):
+    t = np.clip(np.dot(pt - a, b - a) / np.dot(b - a, b - a), 0.0, 1.0)
+    return np.linalg.norm(pt - (a + t * (b - a)))
+# end _distance
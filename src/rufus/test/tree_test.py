@@ -125,6 +125,32 @@ class TreeTest(unittest.TestCase):
     # end test_remove
 
 
+    def test_cost_to_come(self):
+        costs = CostToCome.from_tree(self.g)
+        self.assertEqual(5, len(costs))
+        for n in self.g.all_nodes_itr():
+            self.assertEqual(time(self.g, n), costs[n.identifier])
+        self.assertEqual((3, 20), costs.max())
+
+        # rewire 2 below 4
+        self.g.move_node(2, 4)
+        costs.update_subtree(self.g, self._n2)
+        self.assertEqual(10, costs[2])
+        self.assertEqual((3, 20), costs.max())
+
+        # remove 1 and 3
+        costs.remove_subtree(self.g, self._n1)
+        remove(self.g, self._n1)
+        self.assertNotIn(3, costs)
+        self.assertEqual((2, 10), costs.max())
+
+        # insert a new leaf below 2
+        self.g.create_node('f', 5, parent=2, data=Vertex(np.array([0.0]), None, np.arange(5.0, 0.0, -1.0)))
+        costs.insert(5, costs[2] + 5)
+        self.assertEqual((5, 15), costs.max())
+    # end test_cost_to_come
+
+
     def test_logball(self):
         self.assertEqual(0, logball(1.0, 1)) 
         self.assertAlmostEqual(0.38, logball(1.0, 10), places=3)
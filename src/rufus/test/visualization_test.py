@@ -0,0 +1,331 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+Unit tests for the visualization module.
+
+Everything is drawn on figures with the Agg canvas, so no display is needed.
+'''
+
+# Standard Imports
+import unittest
+
+# External Imports
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.figure import Figure
+import numpy as np
+from treelib.tree import Tree
+
+# Local Imports
+from rufus.actors import LinearActor
+from rufus.game import BoxRegion, Vertex
+from rufus.solver import Solver
+from rufus.spatial import edge_bounds
+from rufus.tree import CostToCome
+from rufus.visualization import LiveView, _simplify_lines, plot_density, plot_tree
+
+
+def _axes(projection=None):
+    '''Create axes on a new figure with an Agg canvas.'''
+    fig = Figure(figsize=(4, 4), dpi=100)
+    FigureCanvasAgg(fig)
+    return fig.add_subplot(projection=projection)
+# end _axes
+
+
+def _lines(ax):
+    '''Get the only line collection of ax.'''
+    lines = [c for c in ax.collections if isinstance(c, LineCollection)]
+    assert len(lines) == 1
+    return lines[0]
+# end _lines
+
+
+def _points(ax):
+    '''Get the only scatter of ax.'''
+    points = [c for c in ax.collections if isinstance(c, PathCollection)]
+    assert len(points) == 1
+    return points[0]
+# end _points
+
+
+class VisualizationTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+
+        # 0 -> 1 -> 2 and 0 -> 3, with two samples per edge
+        self._g = Tree()
+        self._g.create_node(identifier=0, data=Vertex(np.array([0.0, 0.0]), None, np.array([])))
+        self._g.create_node(identifier=1, parent=0, data=Vertex(
+                np.array([10.0, 0.0]), None, np.array([[0.0, 0.0], [5.0, 0.0]])))
+        self._g.create_node(identifier=2, parent=1, data=Vertex(
+                np.array([10.0, 10.0]), None, np.array([[10.0, 0.0], [10.0, 5.0]])))
+        self._g.create_node(identifier=3, parent=0, data=Vertex(
+                np.array([0.0, 10.0]), None, np.array([[0.0, 0.0], [0.0, 5.0]])))
+
+        space = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        check_capture = lambda v_p, v_e: np.linalg.norm(v_e.loc - v_p.loc) < 5.0
+        solver = Solver(1.0, space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), check_capture, gamma=100.0)
+        self._soln = solver.solve(
+                Vertex(np.array([0.0, 0.0]), None, np.array([])),
+                Vertex(np.array([50.0, 50.0]), None, np.array([])),
+                100
+        )
+    # end setUp
+
+
+    def _solver(self):
+        space = BoxRegion(np.array([0.0, 0.0]), np.array([100.0, 100.0]))
+        check_capture = lambda v_p, v_e: np.linalg.norm(v_e.loc - v_p.loc) < 5.0
+        return Solver(1.0, space, LinearActor(1.0, 2.0), LinearActor(1.0, 1.0), check_capture, gamma=100.0,
+                max_nodes=(50, None), stale_after=20)
+    # end _solver
+
+
+    def _assert_drawn(self, view, soln):
+        '''Check that view draws exactly the vertices of soln.'''
+        trees = (soln.evader_tree(), soln.pursuer_tree())
+        for k, (g, (lines, points)) in enumerate(zip(trees, view._artists)):
+            segments = lines.get_segments()
+            offsets = points.get_offsets()
+            self.assertEqual(len(g), len(segments))
+            self.assertEqual(len(g), len(offsets))
+            self.assertEqual(set(g.nodes), set(view._slots[k]))
+
+            for identifier, slot in view._slots[k].items():
+                v = g[identifier].data
+                np.testing.assert_array_equal(v.trajectory.reshape((-1, 2)), segments[slot].reshape((-1, 2)))
+                np.testing.assert_array_equal(v.loc, offsets[slot])
+    # end _assert_drawn
+
+
+    def test_plot_tree(self):
+        ax = _axes()
+        plot_tree(self._g, ax=ax, color='g', linewidth=2.0, s=4)
+
+        # one collection for the edges and one scatter for the vertices
+        lines = _lines(ax)
+        self.assertEqual(3, len(lines.get_segments()))
+        self.assertEqual(2.0, lines.get_linewidths()[0])
+        for segment in lines.get_segments():
+            self.assertEqual((2, 2), segment.shape)
+        self.assertEqual((4, 2), _points(ax).get_offsets().shape)
+        np.testing.assert_array_equal(to_rgba_array('g'), np.unique(lines.get_colors(), axis=0))
+
+        # without a color, the edges cycle through the property cycle
+        ax = _axes()
+        plot_tree(self._g, ax=ax)
+        cycle = rcParams['axes.prop_cycle'].by_key()['color']
+        np.testing.assert_array_equal(to_rgba_array(cycle[:3]), _lines(ax).get_colors())
+
+        # every edge of a solved tree
+        g = self._soln.evader_tree()
+        ax = _axes()
+        plot_tree(g, ax=ax)
+        self.assertEqual(len(g) - 1, len(_lines(ax).get_segments()))
+        self.assertEqual(len(g), len(_points(ax).get_offsets()))
+        ax.figure.canvas.draw()
+    # end test_plot_tree
+
+
+    def test_color_by_cost(self):
+        ax = _axes()
+        plot_tree(self._g, ax=ax, color_by_cost=True, cmap='viridis')
+
+        costs = CostToCome.from_tree(self._g)
+        np.testing.assert_array_equal(sorted(costs[k] for k in (1, 2, 3)), sorted(_lines(ax).get_array()))
+        self.assertEqual((0, 4), _lines(ax).get_clim())
+        self.assertEqual(4, len(_points(ax).get_array()))
+    # end test_color_by_cost
+
+
+    def test_samples(self):
+        g = self._soln.evader_tree()
+        ax = _axes()
+        plot_tree(g, samples=3, ax=ax)
+
+        # the branches to 3 leaves, which share at least the root
+        segments = len(_lines(ax).get_segments())
+        self.assertGreaterEqual(segments, 3)
+        self.assertLess(segments, len(g) - 1)
+        self.assertEqual(segments + 1, len(_points(ax).get_offsets()))
+    # end test_samples
+
+
+    def test_plot_tree_3d(self):
+        g = Tree()
+        g.create_node(identifier=0, data=Vertex(np.array([0.0, 0.0, 0.0]), None, np.array([])))
+        g.create_node(identifier=1, parent=0, data=Vertex(
+                np.array([1.0, 1.0, 1.0]), None, np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.5]])))
+
+        # 3D segments are projected when they are drawn
+        ax = _axes('3d')
+        plot_tree(g, ax=ax)
+        ax.figure.canvas.draw()
+        self.assertEqual(1, len(_lines(ax).get_segments()))
+    # end test_plot_tree_3d
+
+
+    def test_simplify_lines(self):
+        lines = [
+            np.array([[0.0, 0.0], [0.1, 0.0], [0.2, 0.0], [1.5, 0.0], [1.6, 0.0], [3.0, 0.0]]),
+            np.array([[0.0, 0.0], [0.1, 0.0]])
+        ]
+        simplified = _simplify_lines(lines, 1.0)
+
+        # one sample per grid cell, and always the ends of each line
+        np.testing.assert_array_equal([[0.0, 0.0], [1.5, 0.0], [3.0, 0.0]], simplified[0])
+        np.testing.assert_array_equal(lines[1], simplified[1])
+        self.assertEqual([], _simplify_lines([], 1.0))
+    # end test_simplify_lines
+
+
+    def test_level_of_detail(self):
+        g = self._soln.evader_tree()
+
+        full = _axes()
+        plot_tree(g, ax=full)
+        segments = _lines(full).get_segments()
+
+        # a coarse tolerance drops samples, but no edges
+        simplified = _axes()
+        plot_tree(g, ax=simplified, lod=10)
+        lod_segments = _lines(simplified).get_segments()
+        self.assertEqual(len(segments), len(lod_segments))
+        self.assertLess(sum(len(s) for s in lod_segments), sum(len(s) for s in segments) / 2)
+        for s, lod_s in zip(segments, lod_segments):
+            np.testing.assert_array_equal(s[0], lod_s[0])
+            np.testing.assert_array_equal(s[-1], lod_s[-1])
+
+        # no samples are dropped at a tolerance of zero
+        exact = _axes()
+        plot_tree(g, ax=exact, lod=0)
+        self.assertEqual(sum(len(s) for s in segments), sum(len(s) for s in _lines(exact).get_segments()))
+    # end test_level_of_detail
+
+
+    def test_culling(self):
+        g = self._soln.evader_tree()
+
+        # fixed limits cull the edges whose bounding boxes lie outside them
+        ax = _axes()
+        ax.set_xlim(0.0, 50.0)
+        ax.set_ylim(0.0, 50.0)
+        plot_tree(g, ax=ax, lod=1)
+
+        visible = 0
+        for n in g.all_nodes_itr():
+            lower, upper = edge_bounds(n.data)
+            if n.data.trajectory.size and np.all(lower <= 50.0) and np.all(upper >= 0.0):
+                visible += 1
+
+        self.assertEqual(visible, len(_lines(ax).get_segments()))
+        self.assertLess(visible, len(g) - 1)
+        self.assertEqual((0.0, 50.0), ax.get_xlim())
+        self.assertEqual((0.0, 50.0), ax.get_ylim())
+    # end test_culling
+
+
+    def test_plot_density(self):
+        # every stored sample and the end of every edge is counted once. The
+        # root is an edge of no length, from its location to itself
+        ax = _axes()
+        image = plot_density(self._g, shape=(10, 10), ax=ax)
+        self.assertEqual((10, 10), image.get_array().shape)
+        self.assertEqual(11, image.get_array().sum())
+        np.testing.assert_allclose((0.0, 10.0, 0.0, 10.0), image.get_extent())
+
+        g = self._soln.evader_tree()
+        image = plot_density(g, shape=(64, 64), ax=_axes())
+        self.assertEqual(sum(len(n.data.trajectory) + 1 for n in g.all_nodes_itr()) + 1, image.get_array().sum())
+
+        # samples outside of the region are dropped
+        region = BoxRegion(np.array([0.0, 0.0]), np.array([6.0, 6.0]))
+        image = plot_density(self._g, shape=(6, 6), region=region, ax=_axes())
+        self.assertEqual(6, image.get_array().sum())
+        self.assertEqual(4, image.get_array()[0, 0])
+
+        # interpolated edges fill the cells between samples
+        image = plot_density(self._g, shape=(10, 10), interpolate=True, ax=_axes())
+        self.assertGreater(image.get_array().sum(), 10)
+        self.assertEqual(28, image.get_array().count())
+    # end test_plot_density
+
+
+    def test_plot_density_cost(self):
+        image = plot_density(self._g, shape=(10, 10), color_by='cost', ax=_axes())
+        values = image.get_array()
+
+        # each cell holds the earliest arrival time of any sample in it, and
+        # cells without samples are masked
+        self.assertEqual(0, values[0, 0])
+        self.assertEqual(4, values[-1, -1])
+        self.assertEqual(2, values[0, -1])
+        self.assertEqual(7, values.count())
+    # end test_plot_density_cost
+
+
+    def test_live_view(self):
+        solver = self._solver()
+        ax = _axes()
+        view = LiveView(solver, ax=ax, fps=1e6, fraction=1.0)
+
+        sizes = []
+
+        def progress(i, n):
+            view(i, n)
+            g_e, g_p = solver.solution().evader_tree(), solver.solution().pursuer_tree()
+            sizes.append(len(g_e) + len(g_p))
+        # end progress
+
+        soln = solver.solve(
+                Vertex(np.array([0.0, 0.0]), None, np.array([])),
+                Vertex(np.array([50.0, 50.0]), None, np.array([])),
+                200,
+                progress=progress
+        )
+
+        # every iteration is drawn, but only the changed vertices are updated
+        self.assertEqual(201, view.refreshes)
+        self.assertLess(view.updates, sum(sizes) / 10)
+        self._assert_drawn(view, soln)
+        self.assertEqual((0.0, 100.0), ax.get_xlim())
+        ax.figure.canvas.draw()
+
+        # a new solve is drawn from scratch
+        soln = solver.solve(
+                Vertex(np.array([0.0, 0.0]), None, np.array([])),
+                Vertex(np.array([90.0, 10.0]), None, np.array([])),
+                50,
+                progress=view
+        )
+        self._assert_drawn(view, soln)
+    # end test_live_view
+
+
+    def test_live_view_throttle(self):
+        # at most one refresh every 1000 s, or a draw time of 1e-9 of the wall
+        # time, leaves only the first and the last iteration
+        for fps, fraction in ((1e-3, 1.0), (1e6, 1e-9)):
+            solver = self._solver()
+            view = LiveView(solver, ax=_axes(), fps=fps, fraction=fraction)
+            soln = solver.solve(
+                    Vertex(np.array([0.0, 0.0]), None, np.array([])),
+                    Vertex(np.array([50.0, 50.0]), None, np.array([])),
+                    50,
+                    progress=view
+            )
+
+            self.assertEqual(2, view.refreshes)
+            self._assert_drawn(view, soln)
+    # end test_live_view_throttle
+
+# end VisualizationTest
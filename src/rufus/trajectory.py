@@ -0,0 +1,149 @@
+'''
+------------------------------------------------------------------------------
+rufus - modeling and analysis of differential games
+
+Jeffrey Wallace
+EN.605.714, Spring 2019
+------------------------------------------------------------------------------
+
+This module contains utilities for working with sampled trajectories.
+
+A trajectory is a np.ndarray of shape (n, dim) holding the locations of an
+Actor at successive time steps. The trajectory of an edge in a tree starts at
+the parent vertex and ends just short of the child vertex, so the path that an
+edge covers is the polyline through the trajectory followed by the location of
+the child vertex.
+'''
+
+# Standard Imports
+
+# External Imports
+import numpy as np
+
+# Local Imports
+
+
+def _as_points(trajectory):
+    '''View a trajectory as an (n, dim) array.'''
+    trajectory = np.asarray(trajectory, dtype=float)
+    return trajectory.reshape((trajectory.shape[0], -1)) if trajectory.size else trajectory.reshape((0, 0))
+# end _as_points
+
+
+def _segment_distances(points, a, b):
+    '''Distance from each of points to the segment from a to b.'''
+    ab = b - a
+    denom = np.dot(ab, ab)
+    if denom == 0:
+        return np.sqrt(np.sum((points - a)**2, axis=1))
+
+    t = np.clip(np.dot(points - a, ab) / denom, 0.0, 1.0)
+    return np.sqrt(np.sum((points - (a + t[:, np.newaxis] * ab))**2, axis=1))
+# end _segment_distances
+
+
+def simplify(trajectory, tolerance):
+    '''Simplify a trajectory with the Douglas-Peucker algorithm.
+
+    Arguments:
+        trajectory: the trajectory to simplify
+        tolerance:  the maximum distance between a removed sample and the
+                    simplified polyline
+
+    Returns:
+        np.ndarray, the (sorted) indices of the samples to keep. The first and
+        last samples are always kept.
+    '''
+    assert tolerance >= 0
+    points = _as_points(trajectory)
+    n = points.shape[0]
+    if n < 3:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+
+        d = _segment_distances(points[i + 1:j], points[i], points[j])
+        k = np.argmax(d)
+        if d[k] > tolerance:
+            m = i + 1 + k
+            keep[m] = True
+            stack.append((i, m))
+            stack.append((m, j))
+
+    return np.flatnonzero(keep)
+# end simplify
+
+
+def decimate(trajectory, stride=1, tolerance=None):
+    '''Reduce the number of samples used to store a trajectory.
+
+    Arguments:
+        trajectory: the trajectory to decimate
+        stride:     keep every stride-th sample
+        tolerance:  if not None, the samples left after applying the stride are
+                    further simplified with the given tolerance. See simplify.
+
+    Returns:
+        np.ndarray, the decimated trajectory. The first and last samples of the
+        trajectory are always kept.
+    '''
+    assert stride >= 1
+    n = len(trajectory)
+    if n < 3 or (stride == 1 and tolerance is None):
+        return trajectory
+
+    idx = np.arange(0, n, stride)
+    if idx[-1] != n - 1:
+        idx = np.append(idx, n - 1)
+
+    if tolerance is not None:
+        idx = idx[simplify(trajectory[idx], tolerance)]
+
+    return trajectory[idx]
+# end decimate
+
+
+def segments(trajectory, loc):
+    '''Get the line segments of the polyline covered by an edge.
+
+    Arguments:
+        trajectory: the trajectory of the edge
+        loc:        the location of the vertex at the end of the edge
+
+    Returns:
+        (starts, ends), each of shape (m, dim). If the trajectory is empty, a
+        single degenerate segment at loc is returned.
+    '''
+    loc = np.asarray(loc, dtype=float).reshape((1, -1))
+    points = _as_points(trajectory)
+    if points.size == 0:
+        return loc, loc
+
+    points = np.vstack([points, loc])
+    return points[:-1], points[1:]
+# end segments
+
+
+def bounds(trajectory, loc):
+    '''Get the axis-aligned bounding box of the polyline covered by an edge.
+
+    Arguments:
+        trajectory: the trajectory of the edge
+        loc:        the location of the vertex at the end of the edge
+
+    Returns:
+        (lower, upper), each of shape (dim,)
+    '''
+    starts, ends = segments(trajectory, loc)
+    return (
+            np.minimum(np.min(starts, axis=0), ends[-1]),
+            np.maximum(np.max(starts, axis=0), ends[-1])
+    )
+# end bounds
@@ -10,6 +10,8 @@ This module contains utilities for tree algorithms needed to solve RRT*.
 '''
 
 # Standard Imports
+import heapq
+import itertools
 from operator import itemgetter
 
 # Third-Party Imports
@@ -42,7 +44,7 @@ def time(g, v):
 # end time
 
 
-def near_capture(g, v, check_capture, dist, v_pursuer, gamma=1.0):
+def near_capture(g, v, check_capture, dist, v_pursuer, gamma=1.0, nodes=None):
     '''Check what vertices in g are near capture from v.
 
     Arguments:
@@ -52,6 +54,8 @@ def near_capture(g, v, check_capture, dist, v_pursuer, gamma=1.0):
                         capture
         dist:           the pursuer distance function
         v_pursuer:      True, if v is a pursuer node
+        nodes:          the nodes of g to check. If None, all nodes are
+                        checked
 
     Note:
         check_capture should be a function with the following signature:
@@ -73,7 +77,10 @@ def near_capture(g, v, check_capture, dist, v_pursuer, gamma=1.0):
             (dist(n.data.loc, v.data.loc, n.data.state) < r) and check_capture(n.data, v.data)
         )
 
-    return list(g.filter_nodes(_filter))
+    if nodes is None:
+        return list(g.filter_nodes(_filter))
+
+    return [n for n in nodes if _filter(n)]
 # end near_capture
 
 
@@ -116,3 +123,101 @@ def remove(g, v):
     g.remove_node(v.identifier)
 # end remove
 
+
+class CostToCome:
+    '''Tracks the cost-to-come of every vertex in a tree.
+
+    The costs are kept in a dictionary keyed by node identifier, so they can be
+    looked up in O(1) instead of walking to the root as time does. The vertex
+    with the largest cost is kept in a max-heap whose stale entries are
+    discarded lazily, so it is available at any time.
+
+    The tracker must be told about every change to the tree: insert after a
+    node is created, update_subtree after a node's edge or parent changes, and
+    remove_subtree before a node is removed.
+    '''
+
+    def __init__(self):
+        '''Constructor.'''
+        self._costs = {}
+        self._heap = []
+        self._counter = itertools.count()
+    # end __init__
+
+
+    @classmethod
+    def from_tree(cls, g):
+        '''Create a tracker for the current costs of every vertex in g.'''
+        costs = cls()
+        if g.root is not None:
+            costs.update_subtree(g, g[g.root])
+
+        return costs
+    # end from_tree
+
+
+    def __len__(self):
+        return len(self._costs)
+    # end __len__
+
+
+    def __contains__(self, identifier):
+        return identifier in self._costs
+    # end __contains__
+
+
+    def __getitem__(self, identifier):
+        return self._costs[identifier]
+    # end __getitem__
+
+
+    def insert(self, identifier, cost):
+        '''Set the cost-to-come of a node.'''
+        self._costs[identifier] = cost
+        heapq.heappush(self._heap, (-cost, next(self._counter), identifier))
+
+        # compact the heap once stale entries outnumber the live ones
+        if len(self._heap) > 2 * len(self._costs) + 64:
+            self._heap = [(-c, next(self._counter), k) for k, c in self._costs.items()]
+            heapq.heapify(self._heap)
+    # end insert
+
+
+    def update_subtree(self, g, v):
+        '''Recompute the cost-to-come of v and all of its descendants.'''
+        base = 0 if v.is_root() else self._costs[g.parent(v.identifier).identifier]
+
+        stack = [(v, base)]
+        while stack:
+            n, parent_cost = stack.pop()
+            cost = parent_cost + (n.data.time() if not n.is_root() else 0)
+            self.insert(n.identifier, cost)
+            stack.extend((c, cost) for c in g.children(n.identifier))
+    # end update_subtree
+
+
+    def remove_subtree(self, g, v):
+        '''Forget v and all of its descendants. Call before removing v from g.'''
+        for identifier in g.expand_tree(v.identifier):
+            self._costs.pop(identifier, None)
+    # end remove_subtree
+
+
+    def max(self):
+        '''Get the vertex with the largest cost-to-come.
+
+        Returns:
+            (identifier, cost), or (None, None) if no vertices are tracked
+        '''
+        heap = self._heap
+        while heap:
+            cost, _, identifier = heap[0]
+            if self._costs.get(identifier) == -cost:
+                return identifier, -cost
+
+            heapq.heappop(heap)
+
+        return None, None
+    # end max
+
+# end CostToCome
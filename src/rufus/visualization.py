@@ -11,15 +11,23 @@ Visualization tools for rufus.
 
 # Standard Imports
 import random
+import time
 
 # External Imports
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits import mplot3d
 
 # Local Imports
-from rufus.analysis import GameSolution
+from rufus._lazy import lazy_import
+from rufus.analysis import GameSolution, edge_samples, rasterize
 from rufus.game import BoxRegion
+from rufus.spatial import edge_bounds
+from rufus.tree import CostToCome
+
+# matplotlib is only imported when something is plotted
+plt = lazy_import('matplotlib.pyplot')
+mcollections = lazy_import('matplotlib.collections')
+mpatches = lazy_import('matplotlib.patches')
+mplot3d = lazy_import('mpl_toolkits.mplot3d')
 
 
 def plot_vector(loc, direction, **kwargs):
@@ -55,16 +63,23 @@ def plot_region(region, **kwargs):
     assert isinstance(region, BoxRegion)
 
     if region.ndim == 2:
-        _plot_region_2d(region, **kwargs)
+        return _plot_region_2d(region, **kwargs)
     elif region.ndim == 3:
-        _plot_region_3d(region, **kwargs)
+        return _plot_region_3d(region, **kwargs)
     else:
         raise NotImplementedError('>3D not supported')
 # end plot_region
 
 
-def _plot_region_2d(region, **kwargs):
-    pass
+def _plot_region_2d(region, ax=None, **kwargs):
+    axes = plt.gca() if ax is None else ax
+    kwargs.setdefault('fill', False)
+
+    patch = mpatches.Rectangle(region.lower, *(region.upper - region.lower), **kwargs)
+    axes.add_patch(patch)
+    axes.autoscale_view()
+
+    return axes
 # end _plot_region_2d
 
 
@@ -118,22 +133,42 @@ def _plot_region_3d(region, ax=None, **kwargs):
 # end _plot_region_3d
 
 
-def plot_trajectory(path, trajectory, **kwargs):
-    '''Plot a single trajectory.'''
+def plot_trajectory(path, trajectory, lod=None, **kwargs):
+    '''Plot a single trajectory.
+
+    If lod is not None, the trajectory is simplified to a tolerance of lod
+    pixels before it is drawn. See plot_tree.
+    '''
+    if lod is not None and trajectory.shape[1] in (2, 3):
+        if 'ax' in kwargs:
+            ax = kwargs['ax']
+        elif trajectory.shape[1] == 2:
+            ax = plt.gca()
+        else:
+            ax = kwargs.setdefault('ax', plt.axes(projection='3d'))
+
+        lower, upper = np.min(trajectory, axis=0), np.max(trajectory, axis=0)
+        _, lines = _level_of_detail(ax, [trajectory], lower[np.newaxis], upper[np.newaxis], lod)
+        trajectory = lines[0]
+
     if trajectory.shape[1] == 2:
-        _plot_trajectory_2d(path, trajectory, **kwargs)
+        return _plot_trajectory_2d(path, trajectory, **kwargs)
     elif trajectory.shape[1] == 3:
-        _plot_trajectory_3d(path, trajectory, **kwargs)
+        return _plot_trajectory_3d(path, trajectory, **kwargs)
     else:
         raise NotImplementedError('> 3D is not supported')
 # end plot_trajectory
 
 
-def _plot_trajectory_2d(path, trajectory, vertexweight=0.25, **kwargs):
+def _plot_trajectory_2d(path, trajectory, ax=None, vertexweight=0.25, **kwargs):
     '''Plot a single 2d trajectory'''
+    axes = plt.gca() if ax is None else ax
+
     vertices = np.vstack([p.loc for p in path])
-    plt.scatter(vertices[:, 0], vertices[:, 1], vertexweight, **kwargs)
-    plt.plot(trajectory[:, 0], trajectory[:, 1], **kwargs)
+    axes.scatter(vertices[:, 0], vertices[:, 1], vertexweight, **kwargs)
+    axes.plot(trajectory[:, 0], trajectory[:, 1], **kwargs)
+
+    return axes
 # end _plot_trajectory_2d
 
 
@@ -154,34 +189,50 @@ def _plot_trajectory_3d(path, trajectory, ax=None, vertexweight=1, **kwargs):
     )
     axes.plot3D(trajectory[:, 0], trajectory[:, 1], trajectory[:, 2], **kwargs)
 
-    return ax
+    return axes
 # end _plot_trajectory_3d
 
 
-def plot_tree(tree, samples=None, **kwargs):
+def plot_tree(tree, samples=None, ax=None, color_by_cost=False, lod=None, **kwargs):
     '''Plot a tree.
 
     If samples is None, all branches will be plotted. Otherwise, ``samples``
     branches of the tree will be randomly selected and plotted.
 
+    All edges are drawn as a single LineCollection (Line3DCollection in 3D)
+    and all vertices as a single scatter, so large trees render quickly.
+
     Arguments:
-        tree:       the tree to plot
-        samples:    the number of branches to plot
-        **kwargs:   keyword arguments to be passed to matplotlib
+        tree:           the tree to plot
+        samples:        the number of branches to plot
+        ax:             the axes to plot on. If None, the current axes are used
+                        in 2D, and new 3D axes are created in 3D
+        color_by_cost:  if True, color each edge by the cost-to-come of the
+                        vertex it leads to. Use cmap and norm to control the
+                        colors.
+        lod:            if not None, a tolerance in pixels. Edges are
+                        simplified so that no dropped sample is more than about
+                        lod pixels from the drawn line, given the current size
+                        and DPI of the figure, and if the axes limits are fixed,
+                        edges whose bounding boxes lie outside them are culled.
+        **kwargs:       keyword arguments to be passed to matplotlib. Line
+                        properties (c, color, linewidth, linestyle, ...) are
+                        translated to their collection equivalents.
 
     Returns:
-        None
+        the axes
 
     Postcondition:
         the active matplotlib plot will be populated with the tree
         visualization.
     '''
+    costs = CostToCome.from_tree(tree) if color_by_cost else None
+
     if samples is None:
-        _plot_nodes(tree.all_nodes_itr(), **kwargs)
-        return
+        return _plot_nodes(tree.all_nodes_itr(), ax=ax, costs=costs, lod=lod, **kwargs)
 
     leaves = list(tree.leaves())
-    random.shuffle(list(tree.leaves()))
+    random.shuffle(leaves)
 
     selected = leaves[:samples]
     nodes = []
@@ -194,40 +245,442 @@ def plot_tree(tree, samples=None, **kwargs):
     nodes.append(tree[tree.root])
     nodes = set(nodes)
 
-    _plot_nodes(nodes, **kwargs)
+    return _plot_nodes(nodes, ax=ax, costs=costs, lod=lod, **kwargs)
 # end plot_tree
 
 
-def _plot_nodes(nodes, **kwargs):
-    vertices = []
-    is_3d = None
-    ax = None
+# plt.plot keyword arguments and their LineCollection equivalents
+_LINE_KWARGS = {
+    'c': 'colors',
+    'color': 'colors',
+    'lw': 'linewidths',
+    'linewidth': 'linewidths',
+    'ls': 'linestyles',
+    'linestyle': 'linestyles'
+}
 
-    for node in nodes:
-        if is_3d is None:
-            if node.data.loc.shape[0] == 2:
-                is_3d = False
-            elif node.data.loc.shape[0] == 3:
-                is_3d = True
-                ax = kwargs.get('ax', plt.axes(projection='3d'))
-            else:
-                raise NotImplementedError(">3D not supported")
+# keyword arguments that only apply to the vertices
+_SCATTER_KWARGS = {'s', 'marker', 'edgecolors', 'facecolors'}
 
-        trajectory = node.data.trajectory
-        if trajectory.size:
-            if is_3d:
-                ax.plot3D(trajectory[:, 0], trajectory[:, 1], trajectory[:, 2], **kwargs)
-            else:
-                plt.plot(trajectory[:, 0], trajectory[:, 1], **kwargs)
 
-        vertices.append(node.data.loc)
+def _plot_nodes(nodes, ax=None, costs=None, lod=None, **kwargs):
+    '''Plot the edges and vertices of nodes as two artists.'''
+    nodes = list(nodes)
+    if not nodes:
+        return ax
+
+    ndim = nodes[0].data.loc.shape[0]
+    if ndim not in (2, 3):
+        raise NotImplementedError(">3D not supported")
 
-    vertices = np.vstack(vertices)
+    is_3d = ndim == 3
+    if ax is None:
+        ax = plt.axes(projection='3d') if is_3d else plt.gca()
+
+    edges = [n for n in nodes if n.data.trajectory.size]
+    lines = [n.data.trajectory[:, :ndim] for n in edges]
+
+    if lod is not None and edges:
+        lower, upper = map(np.array, zip(*[edge_bounds(n.data) for n in edges]))
+        visible, lines = _level_of_detail(ax, lines, lower[:, :ndim], upper[:, :ndim], lod)
+        edges = [edges[i] for i in visible]
+
+        # keep the vertices at the ends of the visible edges
+        shown = set(n.identifier for n in edges)
+        nodes = [n for n in nodes if n.identifier in shown or n.is_root()]
+
+    vertices = np.vstack([n.data.loc for n in nodes])
+
+    line_kwargs = {
+        _LINE_KWARGS.get(k, k): v for k, v in kwargs.items() if k not in _SCATTER_KWARGS
+    }
+
+    # like one plot call per edge, the edges cycle through the colors of the
+    # property cycle unless they are given a color
+    if costs is None and 'colors' not in line_kwargs and lines:
+        cycle = plt.rcParams['axes.prop_cycle'].by_key().get('color')
+        if cycle:
+            line_kwargs['colors'] = [cycle[i % len(cycle)] for i in range(len(lines))]
+
+    # edges and vertices share one color scale
+    if costs is not None:
+        for k in ('c', 'color'):
+            kwargs.pop(k, None)
+        line_kwargs.pop('colors', None)
+
+        vertex_costs = np.array([costs[n.identifier] for n in nodes])
+        kwargs['c'] = vertex_costs
+        if 'norm' not in kwargs:
+            kwargs.setdefault('vmin', np.min(vertex_costs))
+            kwargs.setdefault('vmax', np.max(vertex_costs))
+
+    collection_type = mplot3d.art3d.Line3DCollection if is_3d else mcollections.LineCollection
+    collection = collection_type(lines, **{k: v for k, v in line_kwargs.items() if k not in ('vmin', 'vmax')})
+    if costs is not None:
+        collection.set_array(np.array([costs[n.identifier] for n in edges]))
+        if 'norm' not in kwargs:
+            collection.set_clim(kwargs['vmin'], kwargs['vmax'])
 
     if is_3d:
+        ax.add_collection3d(collection)
         ax.scatter(vertices[:, 0], vertices[:, 1], vertices[:, 2], **kwargs)
-        return ax
+
+        points = np.vstack(lines + [vertices])
+        lower, upper = np.min(points, axis=0), np.max(points, axis=0)
+        ax.auto_scale_xyz(*zip(lower, upper), had_data=ax.has_data())
+    else:
+        ax.add_collection(collection)
+        ax.scatter(vertices[:, 0], vertices[:, 1], **kwargs)
+        ax.autoscale_view()
+
+    return ax
+# end _plot_nodes
+
+
+def _level_of_detail(ax, lines, lower, upper, lod):
+    '''Cull and simplify polylines for drawing on ax.
+
+    Arguments:
+        ax:     the axes the lines will be drawn on
+        lines:  the polylines, each of shape (k, dim)
+        lower:  the lower corner of each line's bounding box, shape (n, dim)
+        upper:  the upper corner of each line's bounding box, shape (n, dim)
+        lod:    the tolerance in pixels
+
+    Returns:
+        (visible, lines), the indices of the lines that were kept and the
+        simplified lines
+    '''
+    ndim = lower.shape[1]
+    names = 'xyz'[:ndim]
+
+    # if the limits are fixed, lines outside of them are culled. Otherwise the
+    # view will grow to fit the lines.
+    fixed = not any(getattr(ax, 'get_autoscale%s_on' % k)() for k in names)
+    if fixed:
+        view_lower, view_upper = np.array([getattr(ax, 'get_%slim' % k)() for k in names]).T
+        visible = np.flatnonzero(np.all(lower <= view_upper, axis=1) & np.all(upper >= view_lower, axis=1))
+    else:
+        view_lower, view_upper = np.min(lower, axis=0), np.max(upper, axis=0)
+        if ax.has_data():
+            limits = np.array([getattr(ax, 'get_%slim' % k)() for k in names]).T
+            view_lower = np.minimum(view_lower, limits[0])
+            view_upper = np.maximum(view_upper, limits[1])
+        visible = np.arange(len(lines))
+
+    # the size of a pixel in data units, at the current figure size and DPI
+    bbox = ax.get_window_extent()
+    extent = view_upper - view_lower
+    if ndim == 2:
+        pixel = min(extent[0] / max(bbox.width, 1), extent[1] / max(bbox.height, 1))
+    else:
+        pixel = np.max(extent) / max(bbox.width, bbox.height, 1)
+
+    tolerance = lod * pixel
+    if tolerance <= 0:
+        return visible, [lines[i] for i in visible]
+
+    return visible, _simplify_lines([lines[i] for i in visible], tolerance)
+# end _level_of_detail
+
+
+def _simplify_lines(lines, tolerance):
+    '''Simplify many polylines at once by snapping them to a grid.
+
+    Consecutive samples of a line that fall in the same grid cell of width
+    tolerance are merged, keeping the first. The first and last samples of
+    each line are always kept.
+    '''
+    if not lines:
+        return []
+
+    counts = np.array([len(l) for l in lines])
+    first = np.cumsum(counts) - counts
+    points = np.concatenate(lines)
+    cells = np.floor(points / tolerance)
+
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = np.any(cells[1:] != cells[:-1], axis=1)
+    keep[first] = True
+    keep[first + counts - 1] = True
+
+    kept = np.add.reduceat(keep.astype(np.int64), first)
+    return np.split(points[keep], np.cumsum(kept)[:-1])
+# end _simplify_lines
+
+
+def plot_value_map(value_map, field='difference', ax=None, **kwargs):
+    '''Plot one field of a 2D ValueMap as an image.
+
+    Arguments:
+        value_map:  the ValueMap, see GameSolution.value_map
+        field:      one of 'evader', 'pursuer' or 'difference'
+        ax:         the axes to plot on. If None, the current axes are used
+        **kwargs:   keyword arguments to be passed to imshow
+
+    Returns:
+        the AxesImage
+    '''
+    assert len(value_map.shape) == 2, 'only 2D value maps are supported'
+
+    axes = plt.gca() if ax is None else ax
+    kwargs.setdefault('origin', 'lower')
+    kwargs.setdefault('extent', value_map.extent())
+    if field == 'difference':
+        kwargs.setdefault('cmap', 'RdBu')
+
+    # fields are indexed [x, y], images are indexed [row, column]
+    values = np.ma.masked_invalid(getattr(value_map, field).T)
+    return axes.imshow(values, **kwargs)
+# end plot_value_map
+
+
+def plot_density(tree, shape=(512, 512), region=None, color_by='density', interpolate=False,
+        axes=(0, 1), ax=None, **kwargs):
+    '''Plot a tree as a raster image rather than as lines.
+
+    The stored samples of every edge are accumulated into a 2D grid, and the
+    grid is shown with a single imshow. The cost of rendering depends on the
+    number of samples and the grid size, not on the number of edges. Trees of
+    more than two dimensions are projected onto two of their axes.
+
+    Arguments:
+        tree:           the tree to plot
+        shape:          the number of cells along each axis of the image
+        region:         the BoxRegion covered by the image. If None, the
+                        bounding box of the samples is used
+        color_by:       'density' colors each cell by the number of samples in
+                        it. 'cost' colors each cell by the smallest
+                        cost-to-come of any sample in it.
+        interpolate:    if True, edges are subdivided so that consecutive
+                        samples are no farther apart than a cell, so that
+                        sparsely sampled edges are drawn without gaps
+        axes:           the two axes of the tree to project onto
+        ax:             the axes to plot on. If None, the current axes are used
+        **kwargs:       keyword arguments to be passed to imshow
+
+    Returns:
+        the AxesImage
+    '''
+    assert color_by in ('density', 'cost')
+    assert len(shape) == 2 and len(axes) == 2
+
+    axes = list(axes)
+    if region is None:
+        lower, upper = map(np.array, zip(*[edge_bounds(n.data) for n in tree.all_nodes_itr()]))
+        lower, upper = np.min(lower, axis=0)[axes], np.max(upper, axis=0)[axes]
+
+        # grid cells are half-open, so the farthest samples would fall outside
+        upper = np.nextafter(upper, np.inf)
     else:
-        plt.scatter(vertices[:, 0], vertices[:, 1], **kwargs)
-# end plot_nodes
+        lower, upper = (np.asarray(b, dtype=float)[axes] for b in region.bounds())
+
+    upper = np.where(upper > lower, upper, lower + 1.0)
+    spacing = np.min((upper - lower) / np.array(shape)) if interpolate else None
+    points, times = edge_samples(tree, CostToCome.from_tree(tree), spacing)
+    points = points[:, axes]
+
+    if color_by == 'density':
+        image, _ = np.histogramdd(points, bins=shape, range=list(zip(lower, upper)))
+        image = np.ma.masked_equal(image, 0)
+    else:
+        image = np.ma.masked_invalid(rasterize(points, times, lower, upper, shape))
+
+    axes = plt.gca() if ax is None else ax
+    kwargs.setdefault('origin', 'lower')
+    kwargs.setdefault('extent', (lower[0], upper[0], lower[1], upper[1]))
+    kwargs.setdefault('aspect', 'auto')
 
+    # the grid is indexed [x, y], images are indexed [row, column]
+    return axes.imshow(image.T, **kwargs)
+# end plot_density
+
+
+class LiveView:
+    '''A progress callback that draws the trees while the solver runs.
+
+    Each tree is drawn as one persistent LineCollection and one scatter, with
+    one segment and one point per vertex. On a refresh, only the vertices that
+    the solver reports as added, rewired or removed since the last refresh
+    (see Solver.track_changes) are updated, so no refresh walks the trees.
+
+    Refreshes are throttled so that they happen at most fps times a second,
+    and so that drawing takes no more than about fraction of the wall time.
+    The last iteration is always drawn.
+
+    Usage:
+
+        view = LiveView(solver)
+        soln = solver.solve(pursuer_init, evader_init, 5000, progress=view)
+    '''
+
+    def __init__(self, solver, ax=None, fps=5.0, fraction=0.1, axes=(0, 1), progress=None):
+        '''Constructor.
+
+        Arguments:
+            solver:     the Solver to watch
+            ax:         the axes to draw on. If None, the current axes are used
+            fps:        the largest number of refreshes per second
+            fraction:   the largest fraction of the wall time to spend drawing
+            axes:       the two axes of the trees to project onto
+            progress:   an optional progress callback to call as well
+        '''
+        assert fps > 0
+        assert 0 < fraction <= 1
+        assert len(axes) == 2
+
+        self._solver = solver
+        self._ax = plt.gca() if ax is None else ax
+        self._interval = 1.0 / fps
+        self._fraction = fraction
+        self._axes = list(axes)
+        self._progress = progress
+
+        self._artists = None
+        self._path = None
+        self._changes = solver.track_changes()
+
+        # per tree, identifier -> slot of its segment and point, the identifier
+        # in each slot, the segments, and the locations of the points. See
+        # _update
+        self._slots = ({}, {})
+        self._keys = ([], [])
+        self._segments = ([], [])
+        self._locs = [np.zeros((0, 2)), np.zeros((0, 2))]
+
+        self._next = 0.0
+        self.refreshes = 0
+        self.updates = 0
+        self.draw_time = 0.0
+    # end __init__
+
+
+    def __call__(self, iteration, total):
+        if self._progress is not None:
+            self._progress(iteration, total)
+
+        now = time.perf_counter()
+        if now < self._next and iteration < total - 1:
+            return
+
+        self.refresh(iteration, total)
+
+        # wait long enough that drawing stays within its fraction of the time
+        elapsed = time.perf_counter() - now
+        self.draw_time += elapsed
+        self._next = now + max(self._interval, elapsed / self._fraction)
+    # end __call__
+
+
+    def refresh(self, iteration=None, total=None):
+        '''Bring the artists up to date with the solver and redraw.'''
+        soln = self._solver.solution()
+        if soln is None:
+            return
+
+        ax = self._ax
+        if self._artists is None:
+            self._artists = self._create()
+
+        changed = self._changes.pop()
+
+        trees = (soln.evader_tree(), soln.pursuer_tree())
+        for k, g in enumerate(trees):
+            if changed is None:
+                # a new solve, so everything is drawn from scratch
+                self._slots[k].clear()
+                del self._keys[k][:]
+                del self._segments[k][:]
+                identifiers = g.nodes.keys()
+            else:
+                identifiers = changed[k]
+
+            if identifiers:
+                self._update(k, g, identifiers)
+
+        path, trajectory = soln.max_time_trajectory()
+        if trajectory is not None and len(trajectory):
+            self._path.set_data(trajectory[:, self._axes[0]], trajectory[:, self._axes[1]])
+
+        if iteration is not None:
+            ax.set_title('iteration %d/%d, %d evader and %d pursuer vertices' % (
+                    iteration + 1, total, len(trees[0]), len(trees[1])))
+
+        ax.figure.canvas.draw_idle()
+        ax.figure.canvas.flush_events()
+        self.refreshes += 1
+    # end refresh
+
+
+    def _create(self):
+        '''Create the persistent artists, scaled to the solver's space.'''
+        ax = self._ax
+        artists = []
+        for color in ('b', 'r'):
+            lines = mcollections.LineCollection([], colors=color, alpha=0.5)
+            ax.add_collection(lines)
+            points = ax.scatter([], [], s=1, c=color)
+            artists.append((lines, points))
+
+        self._path, = ax.plot([], [], color='k')
+
+        lower, upper = self._solver.space.bounds()
+        ax.set_xlim(lower[self._axes[0]], upper[self._axes[0]])
+        ax.set_ylim(lower[self._axes[1]], upper[self._axes[1]])
+        return artists
+    # end _create
+
+
+    def _update(self, k, g, identifiers):
+        '''Update the segments and points of the given vertices of tree k.
+
+        New vertices are appended. The slot of a removed vertex is filled with
+        the last one, so the segments and points stay packed.
+
+        Arguments:
+            k:              0 for the evader tree, 1 for the pursuer tree
+            g:              the tree
+            identifiers:    the identifiers of the vertices to update
+        '''
+        lines, points = self._artists[k]
+        segments = self._segments[k]
+        slots = self._slots[k]
+        keys = self._keys[k]
+        locs = self._locs[k]
+
+        for identifier in identifiers:
+            slot = slots.get(identifier)
+            if identifier not in g:
+                if slot is not None:
+                    last = keys.pop()
+                    del slots[identifier]
+                    if last != identifier:
+                        segments[slot] = segments[-1]
+                        locs[slot] = locs[len(keys)]
+                        keys[slot] = last
+                        slots[last] = slot
+                    segments.pop()
+                continue
+
+            v = g[identifier].data
+            trajectory = v.trajectory
+            line = trajectory[:, self._axes] if trajectory.size else np.zeros((0, 2))
+
+            if slot is None:
+                slot = len(keys)
+                slots[identifier] = slot
+                keys.append(identifier)
+                segments.append(None)
+                if slot == len(locs):
+                    locs = np.resize(locs, (max(16, 2 * len(locs)), 2))
+
+            segments[slot] = line
+            locs[slot] = np.atleast_1d(v.loc)[self._axes]
+            self.updates += 1
+
+        self._locs[k] = locs
+        lines.set_segments(segments)
+        points.set_offsets(locs[:len(keys)])
+    # end _update
+
+# end LiveView